@@ -1,71 +1,107 @@
-import os, sys, math, re, csv, pypdf, datetime, shutil
+import os, sys
 
 from _101_download_to_device import download_file, delete_pycache
+from _127_memory_profile import MemoryProfile
 
 # from crewai_toolkits_gem_2point0_flash._002_article_summarizer import gen_summary
 
-from _002_article_summarizer import gen_summary
-from _003_article_generator import gen_article
+# the generators (and crewai with them) are imported only once a choice needs them, so "Exit" stays instant
 
 l_only_line_demarcator = "\n{}".format("~" * 120)
 r_only_line_demarcator = "{}\n".format("~" * 120)
 l_and_r_line_demarcator = "\n{}\n".format("~" * 120)
 
-def main():
+CHOICES = {1: "Article Title Generator", 2: "Article Generator", 3: "Theme to Articles"}
+
+def use_daemon():
+  # USE_DAEMON=1 sends runs to the warm background process of _126_daemon instead of loading everything here
+  return os.environ.get("USE_DAEMON", "0") == "1"
+
+def ask_choice():
   print("\nWhat are you here to do?")
   print("1. Article Title Generator")
   print("2. Article Generator")
-  print("3. Exit \n")
+  print("3. Theme to Articles (a summary, then an article for each of its topics)")
+  print("4. Exit \n")
 
   repeat = 'yes'
   purpose_of_visit = 0
-  while repeat == 'yes' or purpose_of_visit < 1 or purpose_of_visit > 3:
+  while repeat == 'yes' or purpose_of_visit < 1 or purpose_of_visit > 4:
     try:
-      purpose_of_visit = int(input(f"Enter a valid choice (1-3): "))
+      purpose_of_visit = int(input(f"Enter a valid choice (1-4): "))
       repeat = 'no'
     except ValueError as ve:
       repeat = 'yes'
       print("\nInvalid input. Please enter a valid integer choice.")
 
   print(l_and_r_line_demarcator)
+  return purpose_of_visit
+
+def run_choice(purpose_of_visit, progress = None):
+  # nothing a run makes is returned or kept here, so it's all released when the run ends
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-  if purpose_of_visit == 1:
-    gen_summary()
-    print(l_only_line_demarcator)
+  if purpose_of_visit == 1 and use_daemon():
+    from _126_daemon import run_remote
+    run_remote("summary", os.environ.get("THEME") or input("Enter the theme: "))
+
+  elif purpose_of_visit == 1:
+    from _002_article_summarizer import gen_summary
+    gen_summary(progress = progress)
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
+  elif purpose_of_visit == 2 and use_daemon():
+    from _126_daemon import run_remote
+    run_remote("article", os.environ.get("TOPIC") or input("Enter the topic: "))
+
   elif purpose_of_visit == 2:
-    gen_article()
-    print(l_only_line_demarcator)
+    from _003_article_generator import gen_article
+    gen_article(progress = progress)
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-  # Exit
   elif purpose_of_visit == 3:
-    delete_pycache()
-    print("Exiting...")
-    sys.exit(1)
+    from _119_theme_articles import gen_theme_articles
+    gen_theme_articles(progress = progress)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+  print(l_only_line_demarcator)
+
+def main():
+  # one run per pass of the loop: a finished run leaves nothing on the stack for the next one to keep alive
+  while True:
+    purpose_of_visit = ask_choice()
+
+    # Exit
+    if purpose_of_visit == 4:
+      delete_pycache()
+      print("Exiting...")
+      sys.exit(1)
+
+    with MemoryProfile(CHOICES[purpose_of_visit]) as memory:
+      run_choice(purpose_of_visit, memory.listener)
+    memory.report()
+    del memory
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-  continue_or_not = 'd'
-  while continue_or_not.lower()[0] != 'y' and continue_or_not.lower()[0] != 'n':
-    continue_or_not = input("\nWould you like to make more changes? Enter 'y' for yes and 'n' for no: ")
+    continue_or_not = 'd'
+    while continue_or_not.lower()[0] != 'y' and continue_or_not.lower()[0] != 'n':
+      continue_or_not = input("\nWould you like to make more changes? Enter 'y' for yes and 'n' for no: ")
 
-  c_or_e = continue_or_not.lower()[0]
+    c_or_e = continue_or_not.lower()[0]
 
-  if c_or_e == 'y':
-    print(l_only_line_demarcator)
-    delete_pycache()
-    main()
-  else:
-    delete_pycache()
-    print("\nExiting...")
-    sys.exit(1)
+    if c_or_e == 'y':
+      print(l_only_line_demarcator)
+      delete_pycache()
+    else:
+      delete_pycache()
+      print("\nExiting...")
+      sys.exit(1)
 
 if __name__ == "__main__":
   main()
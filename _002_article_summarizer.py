@@ -3,62 +3,17 @@
 Make an article topic generator, based on a 'theme' provided by the user
 """
 
-import importlib.util
-import sys
-
-# Check Python version compatibility
-if not (sys.version_info >= (3, 10) and sys.version_info < (3, 14)):
-  print("Error: CrewAI requires Python >=3.10 and <3.14")
-  print(f"Your Python version: {sys.version}")
-  sys.exit(1)
-
-import subprocess
-
-# Install CrewAI if missing
-try:
-  import crewai
-except ImportError:
-  print("CrewAI not found. Installing...")
-  try:
-    # Use pip to install CrewAI
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "crewai"])
-    import crewai
-    print("CrewAI installed successfully")
-  except subprocess.CalledProcessError as e:
-    print(f"Installation failed: {e}")
-    sys.exit(1)
-
-# this tells the code to ignore/disregard any warnings that appear
-import warnings
-warnings.filterwarnings('ignore')
-
 import os
-from crewai import Agent, Task, Crew, LLM
-
-def gen_summary():
-  GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-  if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable not set. Please set it as a secret in your GitHub repository. If in command line/terminal, run the command: export GOOGLE_API_KEY='YOUR_API_KEY' ")
-
-  llm = LLM(
-    model="gemini/gemini-2.0-flash",
-    temperature=0.8,                 # or your preferred value
-    api_key=GOOGLE_API_KEY
-  )
-
-  # To get the theme of the topics to be decided
-  # theam = input("Enter the theme: ")
-
-  theam = os.environ.get("THEME")
-  if not theam:
-    theam = input("Enter the theme: ")
 
-  from random import randint
-  numberOfTopics = randint(5, 9)
+# crewai (and the version check / pip install that guard it) is only loaded once a crew actually runs,
+# so importing this module - e.g. from the main menu - stays cheap
 
-  print()
-  print("The theme chosen is: {}".format(theam))
-  print("The number of topics that will be generated is: {}".format(numberOfTopics))
+def build_summary_crews(session):
+  """
+  Builds the agents and tasks once per session. The per-run values are crewai
+  placeholders - {theme}, {number_of_topics}, {topic}, {topic_number} - filled in by kickoff(inputs=...).
+  """
+  from crewai import Agent, Task, Crew
 
   """
   Now, we create the agents.
@@ -75,9 +30,9 @@ def gen_summary():
 
   planner = Agent(
     role = "Topic Planner",
-    goal = f"To collect {numberOfTopics} engaging topics related to the theme: {theam}, addressed to an academic audience",
-    backstory = f"You have been given a theme - {theam} - and you must collect {numberOfTopics} topics related to the theme, for people to write articles about. It can be in-depth core topics related to the theme, or informatory topics as well. Your work is the basis for the user to write an article (college graduate level) on these topics.",
-    llm = llm,
+    goal = "To collect {number_of_topics} engaging topics related to the theme: {theme}, addressed to an academic audience",
+    backstory = "You have been given a theme - {theme} - and you must collect {number_of_topics} topics related to the theme, for people to write articles about. It can be in-depth core topics related to the theme, or informatory topics as well. Your work is the basis for the user to write an article (college graduate level) on these topics.",
+    llm = session.llm_for("Topic Planner", stream = True),  # streamed, so each topic's research starts as soon as its line is written
     max_iter = 100,
     verbose = False,
     allow_delegation = False
@@ -85,9 +40,9 @@ def gen_summary():
 
   condenser = Agent(
     role = "Summary Generator",
-    goal = f"To condense paragraphs of information into a title-one liner duo and show it to the user",
+    goal = "To condense paragraphs of information into a title-one liner duo and show it to the user",
     backstory = "You will take the information the Topic Researcher, and split it into small chunks - at least 3. Then you will condense it into a bullet point-worth of information and title each of these bullets. The user will elaborate on each point, by themselves, as they see fit. This should be shown to the user under the title 'Condensed Information Points:'",
-    llm = llm,
+    llm = session.llm_for("Summary Generator"),
     max_iter = 100,
     verbose = False,
     allow_delegation = False
@@ -97,7 +52,7 @@ def gen_summary():
     role = "Link Collector",
     goal = "To collect all the links of the material that were used as sources by the Topic Researcher",
     backstory = "You will take all the links from the researcher, and show them to the user at the end of the response under the title: 'Resources Used:'",
-    llm = llm,
+    llm = session.link_llm,          # parses the links out of the research; only asks the model if there are none
     max_iter = 100,
     verbose = False,
     allow_delegation = False
@@ -105,9 +60,9 @@ def gen_summary():
 
   researcher = Agent(
     role = "Topic Researcher",
-    goal = f"To collect in-depth information (and their sources) on the {numberOfTopics} {theam}-related topics provided by the Topic Planner",
-    backstory = f"For each topic given by the Topic Planner, you will do in-depth research into each, collect information and their source links, and send the links to the Link Collector. Also, you send the relevant informaton you have collected to the Summary Generator.",
-    llm = llm,
+    goal = "To collect in-depth information (and their sources) on the {number_of_topics} {theme}-related topics provided by the Topic Planner",
+    backstory = "For each topic given by the Topic Planner, you will do in-depth research into each, collect information and their source links, and send the links to the Link Collector. Also, you send the relevant informaton you have collected to the Summary Generator.",
+    llm = session.llm_for("Topic Researcher"),
     max_iter = 100,
     verbose = False,
     allow_delegation = True
@@ -140,9 +95,9 @@ def gen_summary():
 
   writer = Agent(
     role = "Article Prompt Writer",
-    goal = f"To take each topic from the {numberOfTopics} topics the Topic Planner has generated, give the condensed article prompt the Summary Generator has generated for the same, and then the links the Link Collector has collected for the same topic, and repeat the steps for the rest of the topics",
-    backstory = f"The Topic Planner has sent {numberOfTopics} topics to the Topic Researcher, who sent the information to the Summary Generator and the research links to the Link Collector, who have all sent their information chunks to you, who orders it and shows it to the user.",
-    llm = llm,
+    goal = "To take each topic from the {number_of_topics} topics the Topic Planner has generated, give the condensed article prompt the Summary Generator has generated for the same, and then the links the Link Collector has collected for the same topic, and repeat the steps for the rest of the topics",
+    backstory = "The Topic Planner has sent {number_of_topics} topics to the Topic Researcher, who sent the information to the Summary Generator and the research links to the Link Collector, who have all sent their information chunks to you, who orders it and shows it to the user.",
+    llm = session.llm_for("Article Prompt Writer", stream = True),  # its answer is the article, so it's streamed as it's written
     max_iter = 100,
     verbose = False,
     allow_delegation = False
@@ -157,22 +112,25 @@ def gen_summary():
   - writer : chunkJoin
 
   ## Total: **5** tasks
+
+  research, textCondense and linkCollection form the "topic" crew, which is copied once per
+  planned topic, so every topic is researched and condensed on its own.
   """
 
   plan = Task(
     name='Planning',
     agent = planner,
-    description = f'''
-    1. Identify the latest trends related to {theam}, along with key players and noteworthy news \n
-    2. Identify the target audience based on {theam} and collect relevant headlines/topics \n
-    3. Develop a {theam}-related title list of {numberOfTopics} items \n
+    description = '''
+    1. Identify the latest trends related to {theme}, along with key players and noteworthy news \n
+    2. Identify the target audience based on {theme} and collect relevant headlines/topics \n
+    3. Develop a {theme}-related title list of {number_of_topics} items \n
     4. Format the output as a numbered list with no additional commentary \n
     5. Example: \n
       1. Topic One \n
       2. Topic Two \n
       3. Topic Three \n
     6. Send the list to the Topic Researcher''',
-    expected_output=f"A {numberOfTopics}-item numbered list of {theam}-related topics with no extra text"
+    expected_output="A {number_of_topics}-item numbered list of {theme}-related topics with no extra text"
   )
 
   """
@@ -193,8 +151,8 @@ def gen_summary():
   research = Task(
     name='Researching',
     agent=researcher,
-    description=f'''
-    For each topic received from the Topic Planner:
+    description='''
+    Research topic {topic_number} of the {theme}-related list from the Topic Planner: "{topic}"
     1. Conduct in-depth research on the topic
     2. Use at least 5-6 sources
     3. Collect information and source links
@@ -213,33 +171,36 @@ def gen_summary():
       1. <exact link here>
       2. <exact link here>
     7. Send the research findings to the Summary Generator''',
-    expected_output="Structured research findings with exact source links for all topics"
+    expected_output="Structured research findings with exact source links for the topic: {topic}"
   )
 
   textCondense = Task(
     name='Condensing',
     agent=condenser,
-    description=f'''
-    1. Receive research content from Topic Researcher
-    2. For each logical chunk:
+    description='''
+    1. Receive research content from Topic Researcher on topic {topic_number}: "{topic}"
+    2. Start the output with the heading: "## Topic {topic_number}: {topic}"
+    3. For each logical chunk:
       a. Create a bolded heading (1-3 words)
       b. Add colon followed by 1-sentence summary
-    3. Output as:
+    4. Output as:
       - Heading: "### Condensed Information Points"
       - Bullet points with headings
-    4. Do not add commentary
-    5. Example:
+    5. Do not add commentary
+    6. Example:
+    ## Topic 1: Brain-Computer Interfaces
     ### Condensed Information Points
     - **Brain-Computer Interface:** Direct pathway between brain and external devices
     - **Neural Signals:** BCIs interpret signals to control computers''',
-    expected_output = "Markdown section with bolded headings and colon-separated summaries"
+    expected_output = "Markdown section with bolded headings and colon-separated summaries",
+    context=[research]
   )
 
   linkCollection = Task(
     name='Link Collecting',
     agent=collector,
-    description=f'''
-    1. Collect all source links from Topic Researcher
+    description='''
+    1. Collect all source links from Topic Researcher for topic {topic_number}: "{topic}"
     2. Format as:
       - Heading: "### Resources Used"
       - Numbered list of exact URLs
@@ -249,14 +210,16 @@ def gen_summary():
     ### Resources Used
       1. https://www.nature.com/articles/bci-technology
       2. https://ieeexplore.ieee.org/document/123456''',
-    expected_output="Numbered list of exact source URLs under heading"
+    expected_output="Numbered list of exact source URLs under heading",
+    context=[research]
   )
 
+  # its context (the plan plus every topic's outputs) is filled in per run
   chunkJoin = Task(
     name='Joining, Formatting, and Writing',
     agent=writer,
-    description=f'''
-    For each of the {numberOfTopics} topics:
+    description='''
+    For each of the {number_of_topics} topics, in the order they are given:
     1. Start with H2 heading: "## [Topic Name]"
     2. Include condensed points from Summary Generator
     3. Include resource links from Link Collector
@@ -267,20 +230,15 @@ def gen_summary():
       ### Resources Used
       1. <exact link here>
     5. Do not add commentary or summaries''',
-    expected_output=f"Structured output with headings, bullet points, and exact links for all topics"
+    expected_output="Structured output with headings, bullet points, and exact links for all topics"
   )
 
-  # forming the crew
-  crewww = Crew(
-    agents = [planner, researcher, condenser, collector, writer],
-    tasks = [plan, research, textCondense, linkCollection, chunkJoin],
-    process = "sequential",
-    verbose = False,
-    memory = False,
-    share_crew = True,
-    planning = False,
-    chat_llm = llm
-  )
+  # the condenser only reads the findings and the collector only the links, not the whole research
+  from _113_context_pruning import declare_context
+  declare_context(textCondense, {research: ["Research Findings"]})
+  declare_context(linkCollection, {research: ["Source Links"]})
+
+  crewSettings = session.crew_settings()
 
   """
   tasks: List of tasks assigned to the crew.
@@ -305,44 +263,206 @@ def gen_summary():
   <br>security_config: Security configuration for the crew, including fingerprinting.
   """
 
-  from IPython.display import Markdown, display, display_markdown
-
-  print("\nPreparing setup... ")
-  resp = crewww.kickoff(inputs={"theme": theam, "number of topics": numberOfTopics})
-
-  print("\nPrinting the article: \n")
-  # If you want to display markdown in a notebook, use display(Markdown(resp.raw.strip("`")))
-  # For a .py script, just print the result:
-  if resp:
-    print(resp)  # or print(resp) if .raw is not available
-    # (res.raw.strip('```')).strip('markdown')
+  # the plan runs on its own, the topic crew is copied for every planned topic, and the join runs last
+  return {
+    "plan": Crew(agents = [planner], tasks = [plan], **crewSettings),
+    "topic": Crew(agents = [researcher, condenser, collector], tasks = [research, textCondense, linkCollection], **crewSettings),
+    "join": Crew(agents = [writer], tasks = [chunkJoin], **crewSettings),
+  }
+
+def build_topic_crew(session):
+  # the summary template's topic crew; every planned topic checks out its own instance of it
+  return session.template("summary", build_summary_crews)["topic"]
+
+def similar_plan(theam, numberOfTopics, fresh):
+  # a plan made for a similar theme is reused if it has enough topics (all of them if no number was asked for)
+  from _105_markdown_parsing import parse_numbered_list
+  from _116_semantic_cache import reuse
+  return reuse("summary_plan", theam, "topic plan", fresh,
+               accept = lambda result: len(parse_numbered_list(result["plan"])) >= (numberOfTopics or 1))
+
+def plan_topics(crews, inputs, checkpoint, similar, speculation):
+  """
+  The planned topics: the checkpoint's plan on a resumed run, else a similar theme's, else the Topic
+  Planner's, written while `speculation` starts researching each topic as soon as its line is out.
+  """
+  from _104_task_graph import replay_output
+  from _105_markdown_parsing import parse_numbered_list
+  from _116_semantic_cache import get_default_semantic_cache
+
+  plan = crews["plan"].tasks[0]
+  if checkpoint.saved(plan):
+    replay_output(plan, checkpoint.saved(plan))
+  elif similar:
+    topics = parse_numbered_list(similar.result["plan"])[:inputs["number_of_topics"]]
+    replay_output(plan, "\n".join(f"{number}. {topic}" for number, topic in enumerate(topics, 1)))
+    checkpoint.save(plan, plan.output.raw)
   else:
-    print("No data received from the LLM. Nothing to write.")
-
-  print("\nDownloading the article as a .md file: ")
+    with speculation.watch(plan):
+      crews["plan"].kickoff(inputs = inputs)
+    if plan.output and plan.output.raw.strip():
+      get_default_semantic_cache().store("summary_plan", inputs["theme"], {"plan": plan.output.raw})
+
+  topics = parse_numbered_list(plan.output.raw)
+  if not topics:
+    # nothing to fan out over, so the whole plan is researched in one go, like before
+    print("\nCould not read a numbered list from the Topic Planner; researching its output as a whole.")
+    topics = [plan.output.raw.strip()]
+  return plan, topics
+
+def research_topics(topics, confirmed, check_out_topic, checkpoint, inputs, session, fresh):
+  """
+  Researches, condenses and collects the links of every topic side by side, each in its own topic crew;
+  returns the crews in topic order. `confirmed` are the topics whose crews the speculative research
+  already checked out, with their reused research or their research under way.
+  """
+  from _104_task_graph import run_task_graph
+  from _128_pipeline_steps import reusable_research, remember
+
+  topicCrews = []
+  topicInputs = {}
+  reusedResearch = {}
+  startedResearch = {}
+  for number, topic in enumerate(topics, 1):
+    if number in confirmed:
+      (topicCrew, reused), started = confirmed[number]
+      checkpoint.attach(topicCrew, f"topic {number}")
+    else:
+      topicCrew, started = check_out_topic(number), None
+      checkpoint.attach(topicCrew, f"topic {number}")
+      reused = None if checkpoint.saved(topicCrew.tasks[0]) else reusable_research(topic, fresh, "summary_research")
+    topicCrews.append(topicCrew)
+    for task in topicCrew.tasks:
+      topicInputs[id(task)] = dict(inputs, topic = topic, topic_number = number)
+    research = topicCrew.tasks[0]
+    if reused:
+      reusedResearch[id(research)] = reused
+    if started:
+      startedResearch[id(research)] = started
+
+  # each task starts as soon as the tasks in its context are done, so the topics run side by side
+  graphTasks = [task for topicCrew in topicCrews for task in topicCrew.tasks]
+  replays = checkpoint.replay_for(graphTasks)
+  run_task_graph(graphTasks, max_workers = 2 * len(topics), inputs_for = topicInputs,
+                 replay_for = {**reusedResearch, **replays}, started = startedResearch, **session.crew_settings())
+  for topic, topicCrew in zip(topics, topicCrews):
+    research = topicCrew.tasks[0]
+    if id(research) in reusedResearch or id(research) in startedResearch:
+      # these were done before the checkpoint was attached
+      checkpoint.save(research, research.output.raw)
+    if id(research) not in reusedResearch and id(research) not in replays and research.output and research.output.raw.strip():
+      remember("summary_research", topic, {"research": research.output.raw}, research.output.raw, "summary")
+  return topicCrews
+
+def gen_summary(theam = None, numberOfTopics = None, output_file = None, session = None, stream = None, fresh = None,
+                resume = None, progress = None, topic_results = None, from_archive = None, echo = True):
+  from _128_pipeline_steps import open_session, wants_stream, serve_archived, reusable_research, finish_run
+  # the session keeps the LLM and the crews warm between runs
+  session = open_session(session)
+
+  from functools import partial
+  from contextlib import ExitStack, nullcontext
+  from _104_task_graph import run_single_task, replay_output
+  from _105_markdown_parsing import parse_numbered_list
+  from _109_streaming import MarkdownStream, output_header, resolve_output_file
+  from _110_tracing import RunTracer
+  from _115_budget import RunBudget
+  from _117_checkpoints import RunCheckpoint
+  from _122_speculative_research import SpeculativeResearch
+
+  # a resumed run keeps the theme and number of topics it was started with
+  checkpoint = RunCheckpoint("summary", resume, given = {"theme": theam, "number_of_topics": numberOfTopics})
+  if checkpoint.resumed:
+    theam = checkpoint.inputs["theme"]
+    numberOfTopics = checkpoint.inputs["number_of_topics"]
 
-  from _101_download_to_device import find_downloads_folder
+  # To get the theme of the topics to be decided
+  # theam = input("Enter the theme: ")
 
-  downloads_folder = find_downloads_folder()
-  print("\nDownloads folder is:", downloads_folder)
+  if not theam:
+    theam = os.environ.get("THEME")
+  if not theam:
+    theam = input("Enter the theme: ")
 
-  import datetime
-  r = datetime.datetime.today()
-  rn = f"{r.day}-{r.month}-{r.year}_{r.hour}-{r.minute}-{r.second}"
+  # if asked for, a summary already archived for this theme (and number of topics) is served as is
+  if not checkpoint.resumed and topic_results is None:
+    archived = serve_archived("summary", theam, output_header(f"# Theme: {theam}"), output_file, "Article_Topic_Generated",
+                              from_archive, accept = lambda meta: not numberOfTopics or meta.get("number_of_topics") == numberOfTopics,
+                              echo = echo)
+    if archived:
+      return archived
 
-  file_writer = f"Article_Topic_Generated_{rn}.md"
-  fw = os.path.join(downloads_folder, file_writer)
+  similarPlan = None if checkpoint.resumed else similar_plan(theam, numberOfTopics, fresh)
+  if similarPlan and not numberOfTopics:
+    numberOfTopics = len(parse_numbered_list(similarPlan.result["plan"]))
 
-  f = open(fw, 'w')
-  hyphens = "-" * len(f"# Theme: {theam}")
-  f.write(f"# Theme: {theam} \n\n{hyphens}\n\n")
-  f.close()
+  if not numberOfTopics:
+    from random import randint
+    numberOfTopics = randint(5, 9)
 
-  f = open(fw, 'a')
-  f.write(resp.raw.strip('```')).strip('markdown')
-  f.close()
+  print()
+  print("The theme chosen is: {}".format(theam))
+  print("The number of topics that will be generated is: {}".format(numberOfTopics))
 
-  print("\nDownload complete! Check your downloads folder, and happy writing! :)")
+  inputs = {"theme": theam, "number_of_topics": numberOfTopics}
+
+  stream = wants_stream(stream)
+  fw = resolve_output_file(output_file, "Article_Topic_Generated")
+  # echo=False keeps the answer off the console (the HTTP service runs several jobs at once)
+  live = MarkdownStream(fw, output_header(f"# Theme: {theam}"), echo = echo, listener = progress)
+  tracer = RunTracer("summary", theam, listener = progress)
+  budget = RunBudget()
+
+  def check_out_topic(number):
+    topicCrew = topicCheckouts.enter_context(session.checkout("summary_topic", build_topic_crew))
+    tracer.attach(topicCrew, f"topic {number}")
+    budget.attach(topicCrew)
+    return topicCrew
+
+  def start_topic(number, topic):
+    # called while the planner is still writing its list; the checkpoint is only attached once the plan confirms the topic
+    topicCrew = check_out_topic(number)
+    reused = reusable_research(topic, fresh, "summary_research")
+    research = partial(run_single_task, topicCrew.tasks[0], session.crew_settings(), dict(inputs, topic = topic, topic_number = number))
+    return (topicCrew, reused), None if reused else research
+
+  with session.checkout("summary", build_summary_crews) as crews, ExitStack() as topicCheckouts, tracer, budget, checkpoint, \
+       SpeculativeResearch(start_topic, numberOfTopics, numberOfTopics) as speculation:
+    print("\nPreparing setup... ")
+    checkpoint.begin(theam, inputs)
+    tracer.attach(crews)
+    budget.attach(crews)
+    checkpoint.attach(crews)
+    plan, topics = plan_topics(crews, inputs, checkpoint, similarPlan, speculation)
+    inputs["number_of_topics"] = len(topics)
+
+    # the topics started on while the plan was streamed keep their crew and research, if the plan still has them there
+    confirmed = speculation.confirm(topics)
+
+    print(f"\nResearching {len(topics)} topics in parallel...")
+    topicCrews = research_topics(topics, confirmed, check_out_topic, checkpoint, inputs, session, fresh)
+
+    # for callers that carry on with the topics (e.g. the theme-to-articles pipeline)
+    if topic_results is not None:
+      for number, (topic, topicCrew) in enumerate(zip(topics, topicCrews), 1):
+        research, condensed, links = (task.output.raw if task.output else "" for task in topicCrew.tasks)
+        topic_results.append({"number": number, "topic": topic, "research": research, "condensed": condensed, "links": links})
+
+    # per-topic outputs are merged in topic order: condensed points, then that topic's links
+    chunkJoin = crews["join"].tasks[0]
+    chunkJoin.context = [plan] + [task for topicCrew in topicCrews for task in topicCrew.tasks[1:]]
+
+    print("\nPrinting the article: \n")
+    if checkpoint.saved(chunkJoin):
+      replay_output(chunkJoin, checkpoint.saved(chunkJoin))
+    else:
+      live.watch(chunkJoin)
+      with live if stream else nullcontext():
+        crews["join"].kickoff(inputs = inputs)
+    resp = chunkJoin.output
+
+  return finish_run("summary", resp, live, "the article", tracer, budget, checkpoint,
+                    meta = {"number_of_topics": inputs["number_of_topics"]}, theme = theam)
 
 if __name__ == "__main__":
   gen_summary()
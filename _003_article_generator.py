@@ -3,57 +3,17 @@ Task:
 Generate an article, based on a 'theme' provided by the user
 """
 
-import importlib.util
-import sys
-
-# Check Python version compatibility
-if not (sys.version_info >= (3, 10) and sys.version_info < (3, 14)):
-  print("Error: CrewAI requires Python >=3.10 and <3.14")
-  print(f"Your Python version: {sys.version}")
-  sys.exit(1)
-
-import subprocess
-
-# Install CrewAI if missing
-try:
-  import crewai
-except ImportError:
-  print("CrewAI not found. Installing...")
-  try:
-    # Use pip to install CrewAI
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "crewai"])
-    import crewai
-    print("CrewAI installed successfully")
-  except subprocess.CalledProcessError as e:
-    print(f"Installation failed: {e}")
-    sys.exit(1)
-
-# this tells the code to ignore/disregard any warnings that appear
-import warnings
-warnings.filterwarnings('ignore')
-
 import os
-from crewai import Agent, Task, Crew, LLM
-
-def gen_article():
-  GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-  if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable not set. Please set it as a secret in your GitHub repository. If in command line/terminal, run the command: export GOOGLE_API_KEY='YOUR_API_KEY' ")
 
-  llm = LLM(
-    model="gemini/gemini-2.0-flash",
-    temperature=0.8,                 # or your preferred value
-    api_key=GOOGLE_API_KEY
-  )
+# crewai (and the version check / pip install that guard it) is only loaded once a crew actually runs,
+# so importing this module - e.g. from the main menu - stays cheap
 
-  # To get the theme of the topics to be decided
-
-  topik = os.environ.get("TOPIC")
-  if not topik:
-    topik = input("Enter the topic: ")
-
-  print()
-  print("The topic chosen is: {}".format(topik))
+def build_article_crew(session):
+  """
+  Builds the agents and tasks once per session; the topic is the crewai placeholder {topic},
+  filled in by kickoff(inputs=...) on every run.
+  """
+  from crewai import Agent, Task, Crew
 
   """
   Now, we create the agents.
@@ -70,9 +30,9 @@ def gen_article():
 
   planner = Agent(
     role = "Topic Planner",
-    goal = f"To collect engaging ideas related to the topic: {topik}, addressed to an academic audience",
-    backstory = f"Given a topic - {topik} - you collect many subdivisions or subtopics related to the topic, for people to use when writing the article. It can be in-depth core subdivisions related to the topic, or informatory subtopics as well. Your work is the basis for the user to write an article (college graduate level) on these subheadings.",
-    llm = llm,
+    goal = "To collect engaging ideas related to the topic: {topic}, addressed to an academic audience",
+    backstory = "Given a topic - {topic} - you collect many subdivisions or subtopics related to the topic, for people to use when writing the article. It can be in-depth core subdivisions related to the topic, or informatory subtopics as well. Your work is the basis for the user to write an article (college graduate level) on these subheadings.",
+    llm = session.llm_for("Topic Planner"),
     max_iter = 100,
     verbose = False,
     allow_delegation = False
@@ -80,9 +40,9 @@ def gen_article():
 
   researcher = Agent(
     role = "Topic Researcher",
-    goal = f"To collect in-depth information (and their sources) on the {topik}-related subtopics provided by the Topic Planner",
-    backstory = f"For each subtopic given by the Topic Planner, you do in-depth research into each, collect information and their source links, and send the links to the Link Collector. Also, you send the relevant informaton you have collected to the Article Generator.",
-    llm = llm,
+    goal = "To collect in-depth information (and their sources) on the {topic}-related subtopics provided by the Topic Planner",
+    backstory = "For each subtopic given by the Topic Planner, you do in-depth research into each, collect information and their source links, and send the links to the Link Collector. Also, you send the relevant informaton you have collected to the Article Generator.",
+    llm = session.llm_for("Topic Researcher"),
     max_iter = 100,
     verbose = False,
     allow_delegation = True
@@ -92,7 +52,7 @@ def gen_article():
     role = "Link Collector",
     goal = "To collect all the links of the material that were used as sources by the Topic Researcher",
     backstory = "You take all the links from the researcher, and show them to the user at the end of the response under the title: 'Resources Used:'",
-    llm = llm,
+    llm = session.link_llm,          # parses the links out of the research; only asks the model if there are none
     max_iter = 100,
     verbose = False,
     allow_delegation = False
@@ -100,9 +60,9 @@ def gen_article():
 
   generator = Agent(
     role = "Article Generator",
-    goal = f"Take the structured subtopic outlines from the Topic Planner,curated links and source material from the Link Collector, and score of factual accuracy from the Fact Checker, and write a full-length, polished and engaging article in 500-750 words on the topic {topik}",
-    backstory = f"You write well-structured, clear articles which are at par with college graduates's work, while maintaining cohesion and a formal tone. Also cite key references from the Link Collector. After generating the article, you consider feedback from the Fact Checker to refine and iteratively improve your drafts for final submission.",
-    llm = llm,
+    goal = "Take the structured subtopic outlines from the Topic Planner,curated links and source material from the Link Collector, and score of factual accuracy from the Fact Checker, and write a full-length, polished and engaging article in 500-750 words on the topic {topic}",
+    backstory = "You write well-structured, clear articles which are at par with college graduates's work, while maintaining cohesion and a formal tone. Also cite key references from the Link Collector. After generating the article, you consider feedback from the Fact Checker to refine and iteratively improve your drafts for final submission.",
+    llm = session.llm_for("Article Generator"),
     max_iter = 100,
     verbose = False,
     allow_delegation = False
@@ -112,7 +72,7 @@ def gen_article():
     role = "Fact Checker",
     goal = "To verify the factual accuracy of each article produced by the Article Generator using trusted and verifiable sources. Flag any misleading, outdated, or unsupported claims, and suggest accurate replacements wherever needed.",
     backstory = "You are a meticulous fact-checking specialist with expertise in academia and journalism. Your focus is ensuring that every statement made in the generated article aligns with credible, up-to-date sources. You help maintain accuracy and reliability before the article reaches the final compilation stage. Replace outdated or wrong reference links with your own credible sources, if and when a factual error is found.",
-    llm = llm,
+    llm = session.llm_for("Fact Checker"),
     max_iter = 100,
     verbose = False,
     allow_delegation = False
@@ -120,7 +80,7 @@ def gen_article():
 
   writer = Agent(
     role = "Final Article Compiler and Formatter",
-    goal = f"""To take the subtopics the Topic Planner has generated, give the elaborate article prompt the Article Generator has generated for the same, and then the links the Link Collector has collected for the same topic {topik} in the following format:
+    goal = """To take the subtopics the Topic Planner has generated, give the elaborate article prompt the Article Generator has generated for the same, and then the links the Link Collector has collected for the same topic {topic} in the following format:
     # HEADING / TITLE
     1. Introduction
     2. Article
@@ -128,8 +88,8 @@ def gen_article():
 
     ## Resouces Used:
     1. <exact link here>""",
-    backstory = f"The Topic Planner has sent subtopics related to the {topik} to the Topic Researcher, who sent the information to the Article Generator and the research links to the Link Collector, all of which have sent all their information chunks to you. You order it and show it to the user.",
-    llm = llm,
+    backstory = "The Topic Planner has sent subtopics related to the {topic} to the Topic Researcher, who sent the information to the Article Generator and the research links to the Link Collector, all of which have sent all their information chunks to you. You order it and show it to the user.",
+    llm = session.llm_for("Final Article Compiler and Formatter", stream = True),  # its answer is the article, so it's streamed as it's written
     max_iter = 100,
     verbose = False,
     allow_delegation = False
@@ -175,17 +135,17 @@ def gen_article():
   plan = Task(
     name = 'Planning',
     agent = planner,
-    description = f'''
-    1. Identify the latest trends related to {topik}, along with key players and noteworthy news \n
-    2. Identify the target audience based on {topik} and collect relevant headlines/topics \n
-    3. Develop a {topik}-related subtitle list of 4-5 items \n
+    description = '''
+    1. Identify the latest trends related to {topic}, along with key players and noteworthy news \n
+    2. Identify the target audience based on {topic} and collect relevant headlines/topics \n
+    3. Develop a {topic}-related subtitle list of 4-5 items \n
     4. Format the output as a numbered list with no additional commentary \n
     5. Example: \n
       1. Sub-topic One \n
       2. Sub-topic Two \n
       3. Sub-topic Three \n
     6. Send the list to the Topic Researcher''',
-    expected_output = f"An itemized / numbered list of {topik}-related subtopics with no extra text."
+    expected_output = "An itemized / numbered list of {topic}-related subtopics with no extra text."
   )
 
   """
@@ -206,7 +166,7 @@ def gen_article():
   research = Task(
     name = 'Researching',
     agent = researcher,
-    description = f'''
+    description = '''
     For each topic received from the Topic Planner:
     1. Conduct in-depth research on the topic
     2. Use at least 5-6 sources, use only verified sources - if fewer than 5 exist, use only those
@@ -226,13 +186,14 @@ def gen_article():
       1. <exact link here>
       2. <exact link here>
     7. Send the research findings to the Article Generator''',
-    expected_output = "Structured research findings with exact source links for all topics"
+    expected_output = "Structured research findings with exact source links for all topics",
+    context = [plan]
   )
 
   collectLinks = Task(
     name = 'Link Collecting',
     agent = collector,
-    description = f'''
+    description = '''
     1. Collect all source links from Topic Research
     2. Format as:
       Heading: "Resources Used: "
@@ -244,13 +205,14 @@ def gen_article():
     Resources Used
     1. https://www.nature.com/articles/bci-technology
     2. https://ieeexplore.ieee.org/document/123456''',
-    expected_output = "Numbered list of exact source URLs with heading"
+    expected_output = "Numbered list of exact source URLs with heading",
+    context = [research]
   )
 
   generateArticle = Task(
     name = 'Article Generation',
     agent = generator,
-    description = f'''
+    description = '''
     1. Receive the structured research content from the Topic Researcher. Use the research findings and source links to generate a cohesive and well-structured article in 500-750 words.
     2. Maintain a formal, academic, and accessible tone suitable for college graduates. Maintain clear section headings and ensure logical flow.
     3. Paraphrase and synthesize information from research — avoid direct copying.
@@ -264,15 +226,16 @@ def gen_article():
       Conclusion
       A brief wrap-up with relevance or implications.
     6. Send the generated article to the Fact Checker for feedback.''',
-    expected_output = f"A polished, well-structured markdown article of 500-750 words based on solid, valid research on the topic {topik}."
+    expected_output = "A polished, well-structured markdown article of 500-750 words based on solid, valid research on the topic {topic}.",
+    context = [research]
   )
 
   """
   agent: Agent responsible for generating the main article draft using Topic Researcher data.
-  <br>async_execution: False (sequential task — follows researcher output).
+  <br>async_execution: True (runs alongside collectLinks — both only follow the researcher output).
   <br>callback: None (evaluation handled by the next agent).
   <br>config: Includes tone and structure preferences from Topic Planner.
-  <br>context: Takes research findings and collected links as input.
+  <br>context: Takes research findings as input.
   <br>description: Defines how to synthesize and write the final article.
   <br>expected_output: Markdown-formatted, structured article draft.
   <br>tools: LLM model specified in the Agent definition.
@@ -281,12 +244,13 @@ def gen_article():
   checkFacts = Task(
     name = 'Fact Checking',
     agent = checkFactser,
-    description = f'''
+    description = '''
     1. Review each generated article from the Article Generator carefully.
     2. Identify any factual inaccuracies, unsupported claims, or ambiguous data points.
     3. Cross-verify these points using reliable sources such as academic journals, government data, and credible news sites.
     4. For each issue found, provide a correction suggestion and cite the source used for verification.
-    5. Repeat this process multiple times, iteratively, for the entire article.
+    5. Do one pass over the entire article, starting the report with the heading "Fact Check Report". Your report of the previous pass, if there was one: {previous_report}
+       Check its statements again and keep the verdicts that still hold.
     6. Format your findings as:
       Fact Check Report
       Checked Statement: <quote from article>
@@ -295,7 +259,8 @@ def gen_article():
       Verified Source: <exact URL here>
     7. End with a short summary highlighting the overall factual accuracy rate (e.g., “8 out of 10 statements verified as accurate”).
     8. Send this report internally to the Article Generator for factual refinements.''',
-    expected_output = "A detailed report highlighting verified facts, correction notes, and accuracy summary for the article."
+    expected_output = "A detailed report highlighting verified facts, correction notes, and accuracy summary for the article.",
+    context = [generateArticle, collectLinks]    # run one pass at a time, until the verdicts settle (_115_budget.run_fact_check)
   )
 
   # Note: 'chunkJoin' task is mentioned in the crew definition in the original code but not defined.
@@ -303,31 +268,34 @@ def gen_article():
   chunkJoin = Task(
     name = 'Final Article Compilation and Formatting',
     agent = writer,
-    description = f'''
+    description = '''
     1. Receive the topics from the Topic Planner, the generated articles from the Article Generator (potentially after fact-checking refinements), and the source links from the Link Collector.
     2. For each subtopic, compile the generated article text and the corresponding list of source links.
     3. Format the output clearly, presenting the article followed by its resources.
     4. Ensure the final output is well-organized and easy to read.
     5. The final output should present the article and its corresponding source links.
     ''',
-    expected_output = f"A compiled and formatted document containing the generated article and source links for the topic {topik}."
+    expected_output = "A compiled and formatted document containing the generated article and source links for the topic {topic}.",
+    context = [plan, generateArticle, checkFacts, collectLinks]
   )
 
+  # the collector only reads the research's links; the generator needs the findings and the links to cite
+  from _113_context_pruning import declare_context
+  declare_context(collectLinks, {research: ["Source Links"]})
+
+  # collectLinks and generateArticle both only need the research, so they run side by side
+  from _104_task_graph import schedule_tasks
+
   crewww = Crew(
     agents = [planner, researcher, collector, generator, checkFactser, writer],
-    tasks = [plan, research, collectLinks, generateArticle, checkFacts, chunkJoin],
-    process = "sequential",
-    verbose = False,
-    memory = False,
-    share_crew = True,
-    planning = False,
-    chat_llm = llm
+    tasks = schedule_tasks([plan, research, collectLinks, generateArticle, checkFacts, chunkJoin]),
+    **session.crew_settings()
   )
 
   """
   agents: Ordered list of all agents participating in the workflow.
-  <br>tasks: Sequential mapping of tasks — each corresponding to an agent.
-  <br>process: 'sequential' ensures linear execution (Planner → Writer).
+  <br>tasks: Mapping of tasks — each corresponding to an agent, ordered by their context dependencies.
+  <br>process: 'sequential' runs the tasks in order (Planner → Writer); tasks marked async by schedule_tasks run side by side.
   <br>verbose: False to suppress LLM token-by-token logging.
   <br>memory: Disabled — avoids storing intermediate chat history.
   <br>share_crew: True — allows agents to share context and results.
@@ -335,44 +303,89 @@ def gen_article():
   <br>chat_llm: Primary LLM used for conversational reasoning and content generation.
   """
 
-  from IPython.display import Markdown, display, display_markdown
-
-  print("\nPreparing setup... ")
-  resp = crewww.kickoff(inputs={"topic": topik})
-
-  print("\nPrinting the article: \n")
-  # If you want to display markdown in a notebook, use display(Markdown(resp.raw.strip("`")))
-  # For a .py script, just print the result:
-  if resp:
-    print(resp)  # or print(resp) if .raw is not available
-    # (res.raw.strip('```')).strip('markdown')
-  else:
-    print("No data received from the LLM. Nothing to write.")
-
-  print("\nDownloading the topics collected as a .md file: ")
-
-  from _101_download_to_device import find_downloads_folder
-
-  downloads_folder = find_downloads_folder()
-  print("\nDownloads folder is:", downloads_folder)
+  return crewww
+
+def reused_outputs(tasks, similar, research):
+  # id(task) -> the output to use instead of running it: a similar topic's plan and research, or research handed in
+  reused = {id(tasks[name]): raw for name, raw in similar.result.items() if name in tasks} if similar else {}
+  if research:
+    reused[id(tasks["Researching"])] = research
+  return reused
+
+def gen_article(topik = None, output_file = None, session = None, stream = None, fresh = None, resume = None,
+                progress = None, research = None, from_archive = None, echo = True):
+  from _128_pipeline_steps import open_session, wants_stream, serve_archived, reusable_research, remember, finish_run
+  # the session keeps the LLM and the crew warm between runs
+  session = open_session(session)
+
+  from contextlib import nullcontext
+  from _104_task_graph import run_task_graph
+  from _109_streaming import MarkdownStream, output_header, resolve_output_file
+  from _110_tracing import RunTracer
+  from _115_budget import RunBudget, run_fact_check
+  from _116_semantic_cache import reuse
+  from _117_checkpoints import RunCheckpoint
+
+  # a resumed run keeps the topic it was started with
+  checkpoint = RunCheckpoint("article", resume, given = {"topic": topik})
+  if checkpoint.resumed:
+    topik = checkpoint.inputs["topic"]
 
-  import datetime
-  r = datetime.datetime.today()
-  rn = f"{r.day}-{r.month}-{r.year}_{r.hour}-{r.minute}-{r.second}"
+  # To get the theme of the topics to be decided
 
-  file_writer = f"Article_Generated_{rn}.md"
-  fw = os.path.join(downloads_folder, file_writer)
+  if not topik:
+    topik = os.environ.get("TOPIC")
+  if not topik:
+    topik = input("Enter the topic: ")
 
-  f = open(fw, 'w')
-  hyphens = "-" * len(f"# Theme: {theam}")
-  f.write(f"# Theme: {theam} \n\n{hyphens}\n\n")
-  f.close()
+  # if asked for, an article already archived for this topic is served as is
+  if not checkpoint.resumed:
+    archived = serve_archived("article", topik, output_header(f"# Topic: {topik}"), output_file, "Article_Generated", from_archive,
+                              echo = echo)
+    if archived:
+      return archived
 
-  f = open(fw, 'a')
-  f.write(resp.raw.strip('```')).strip('markdown')
-  f.close()
+  print()
+  print("The topic chosen is: {}".format(topik))
 
-  print("\nDownload complete! Check your downloads folder, and happy writing! :)")
+  stream = wants_stream(stream)
+  fw = resolve_output_file(output_file, "Article_Generated")
+  # echo=False keeps the answer off the console (the HTTP service runs several jobs at once)
+  live = MarkdownStream(fw, output_header(f"# Topic: {topik}"), echo = echo, listener = progress)
+  tracer = RunTracer("article", topik, listener = progress)
+  budget = RunBudget()
+
+  # research handed in by the caller (e.g. from the summary of the topic's theme) or already done on this
+  # topic by either generator is used instead of researching; failing that, a similar topic's plan and research
+  if not research and not checkpoint.resumed:
+    research = reusable_research(topik, fresh)
+  similar = None if checkpoint.resumed or research else reuse("article", topik, "plan and research", fresh)
+
+  with session.checkout("article", build_article_crew) as crewww, tracer, budget, checkpoint:
+    print("\nPreparing setup... ")
+    checkpoint.begin(topik, {"topic": topik})
+    tracer.attach(crewww)
+    budget.attach(crewww)
+    checkpoint.attach(crewww)
+    tasks = {task.name: task for task in crewww.tasks}
+    reused = reused_outputs(tasks, similar, research)
+    for task in crewww.tasks:
+      if id(task) in reused:
+        checkpoint.save(task, reused[id(task)])
+    reused.update(checkpoint.replay_for(crewww.tasks))
+    live.watch(crewww.tasks[-1])
+    with live if stream else nullcontext():
+      print("\nPrinting the article: \n")
+      # the crew's tasks run as a graph, so tasks with an earlier output can be left out
+      run_task_graph(crewww.tasks, inputs_for = {id(task): {"topic": topik} for task in crewww.tasks},
+                     replay_for = reused, run_with = {id(tasks["Fact Checking"]): run_fact_check}, **session.crew_settings())
+      resp = crewww.tasks[-1].output
+
+    if not similar and not research and not checkpoint.resumed and all(tasks[name].output and tasks[name].output.raw.strip() for name in ("Planning", "Researching")):
+      remember("article", topik, {name: tasks[name].output.raw for name in ("Planning", "Researching")},
+               tasks["Researching"].output.raw, "article")
+
+  return finish_run("article", resp, live, "the topics collected", tracer, budget, checkpoint, topic = topik)
 
 if __name__ == "__main__":
   gen_article()
@@ -0,0 +1,219 @@
+"""
+## Task:
+Cache LLM responses on disk, so that re-running a theme/topic with the same prompts
+doesn't pay for the same Gemini calls again
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+
+# pysqlite3-binary (see requirements.txt) bundles a newer sqlite; fall back to the stdlib one
+try:
+  import pysqlite3 as sqlite3
+except ImportError:
+  import sqlite3
+
+from typing import Any
+from crewai import BaseLLM
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bphc_agentic_ai", "llm_cache.sqlite3")
+
+def env_flag(name):
+  return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "y", "on")
+
+class LLMCache:
+  """
+  Content-addressed store of LLM responses, keyed on (model, temperature, messages).
+  Entries expire after `ttl_seconds`, and the least recently used ones are evicted
+  once there are more than `max_entries` of them, or they take up more than `max_bytes`.
+  """
+
+  def __init__(self, path = None, max_entries = 5000, max_bytes = 200 * 1024 * 1024, ttl_seconds = 7 * 24 * 3600):
+    self.path = path or os.environ.get("LLM_CACHE_PATH") or DEFAULT_CACHE_PATH
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.ttl_seconds = ttl_seconds
+
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+    if self.path != ":memory:":
+      os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute('''
+      CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        model TEXT,
+        response TEXT,
+        size INTEGER,
+        created_at REAL,
+        last_access REAL
+      )''')
+    self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+    self._conn.commit()
+
+  @staticmethod
+  def make_key(model, temperature, messages):
+    payload = json.dumps({"model": model, "temperature": temperature, "messages": messages}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+  def get(self, key):
+    now = time.time()
+    with self._lock:
+      row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+      if row is None:
+        self.misses += 1
+        return None
+
+      response, created_at = row
+      if self.ttl_seconds and now - created_at > self.ttl_seconds:
+        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self._conn.commit()
+        self.evictions += 1
+        self.misses += 1
+        return None
+
+      self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+      self._conn.commit()
+      self.hits += 1
+      return response
+
+  def put(self, key, model, response):
+    now = time.time()
+    size = len(response.encode("utf-8"))
+    with self._lock:
+      self._conn.execute(
+        "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+        (key, model, response, size, now, now)
+      )
+      self._evict(now)
+      self._conn.commit()
+
+  def _evict(self, now):
+    # expired entries go first, then the least recently used ones until we're back under both limits
+    if self.ttl_seconds:
+      cur = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+      self.evictions += max(cur.rowcount, 0)
+
+    count, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    if count <= self.max_entries and total_bytes <= self.max_bytes:
+      return
+
+    doomed = []
+    for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+      if count <= self.max_entries and total_bytes <= self.max_bytes:
+        break
+      doomed.append((key,))
+      count -= 1
+      total_bytes -= size
+
+    self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+    self.evictions += len(doomed)
+
+  def clear(self):
+    with self._lock:
+      self._conn.execute("DELETE FROM responses")
+      self._conn.commit()
+
+  def stats(self):
+    with self._lock:
+      count, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    return {
+      "path": self.path,
+      "entries": count,
+      "bytes": total_bytes,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+    }
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+  # one cache (and one sqlite connection) per process, shared by every crew
+  global _default_cache
+  with _default_cache_lock:
+    if _default_cache is None:
+      _default_cache = LLMCache()
+    return _default_cache
+
+class DelegatingLLM(BaseLLM):
+  """
+  A crewai custom LLM that forwards everything to the `inner` LLM it wraps.
+  Subclasses override `call` to add behaviour around `self.inner.call(...)`.
+  """
+
+  inner: Any = None
+
+  def __init__(self, inner, **kwargs):
+    kwargs.setdefault("model", inner.model)
+    kwargs.setdefault("temperature", getattr(inner, "temperature", None))
+    super().__init__(inner = inner, **kwargs)
+
+  def call(self, messages, **kwargs):
+    return self.inner.call(messages, **kwargs)
+
+  def supports_function_calling(self):
+    return self.inner.supports_function_calling()
+
+  def supports_stop_words(self):
+    return self.inner.supports_stop_words()
+
+  def get_context_window_size(self):
+    return self.inner.get_context_window_size()
+
+  def get_token_usage_summary(self):
+    return self.inner.get_token_usage_summary()
+
+class CachedLLM(DelegatingLLM):
+  """
+  Serves repeated prompts from an LLMCache instead of calling the wrapped LLM.
+  With `bypass=True` (or LLM_CACHE_BYPASS=1) cached answers are ignored, and the fresh ones overwrite them.
+  """
+
+  cache: Any = None
+  bypass: bool = False
+
+  def __init__(self, inner, cache = None, bypass = None, **kwargs):
+    if cache is None:
+      cache = get_default_cache()
+    if bypass is None:
+      bypass = env_flag("LLM_CACHE_BYPASS")
+    super().__init__(inner, cache = cache, bypass = bypass, **kwargs)
+
+  def call(self, messages, **kwargs):
+    # tool calls and structured outputs aren't plain text, so they always go to the model
+    cacheable = not kwargs.get("tools") and kwargs.get("response_model") is None
+    if not cacheable:
+      return self.inner.call(messages, **kwargs)
+
+    key = LLMCache.make_key(self.model, self.temperature, messages)
+    if not self.bypass:
+      cached = self.cache.get(key)
+      if cached is not None:
+        return cached
+
+    resp = self.inner.call(messages, **kwargs)
+    if isinstance(resp, str) and resp.strip():
+      self.cache.put(key, self.model, resp)
+    return resp
+
+def print_cache_stats(cache = None):
+  stats = (cache or get_default_cache()).stats()
+  print(f"\nLLM cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries stored ({stats['bytes'] / 1024:.1f} KiB)")
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1 and sys.argv[1] == "clear":
+    get_default_cache().clear()
+    print("LLM cache cleared.")
+  else:
+    print(json.dumps(get_default_cache().stats(), indent=2))
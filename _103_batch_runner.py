@@ -0,0 +1,181 @@
+"""
+## Task:
+Run many themes (Article Title Generator) or topics (Article Generator) in one go,
+a few crews at a time, instead of one theme per process
+
+Usage:
+  python _103_batch_runner.py themes.csv --mode summary --concurrency 8 --out ./batch_output
+  python _103_batch_runner.py topics.jsonl --mode article
+
+Input files:
+  .csv   - a 'theme' / 'topic' column (or just the first column if there is no header)
+  .jsonl - one item per line, either a bare string or {"theme": ...} / {"topic": ...}
+           summary items may also carry "number_of_topics"
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import time
+import asyncio
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+ITEM_KEYS = ("theme", "topic")
+
+def topic_count(value, where):
+  """
+  A number_of_topics cell as an int, or None if it's blank. A value that isn't a whole number of at
+  least 1 is reported and left out (the planner picks the count), rather than stopping the whole batch.
+  """
+  if value is None or not str(value).strip():
+    return None
+  try:
+    count = int(str(value).strip())
+  except ValueError:
+    print(f"{where}: number_of_topics {value!r} is not a whole number; ignoring it")
+    return None
+  if count < 1:
+    print(f"{where}: number_of_topics {value!r} is less than 1; ignoring it")
+    return None
+  return count
+
+def read_items(path):
+  items = []
+
+  if path.lower().endswith(".jsonl"):
+    with open(path, encoding="utf-8") as f:
+      for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+          continue
+        record = json.loads(line)
+        if isinstance(record, str):
+          record = {"text": record}
+        else:
+          record = dict(record)
+          for k in ITEM_KEYS:
+            if k in record:
+              record["text"] = record.pop(k)
+              break
+          if "number_of_topics" in record:
+            record["number_of_topics"] = topic_count(record["number_of_topics"], f"{path}, line {line_number}")
+        items.append(record)
+
+  else:
+    with open(path, newline="", encoding="utf-8") as f:
+      reader = csv.reader(f)
+      # only blank rows are skipped here: the theme/topic column isn't known until the header is read,
+      # and rows without a theme/topic are dropped at the end
+      rows = [(reader.line_num, row) for row in reader if any(cell.strip() for cell in row)]
+    if not rows:
+      return items
+
+    header = [h.strip().lower() for h in rows[0][1]]
+    column = next((header.index(k) for k in ITEM_KEYS if k in header), None)
+    if column is None:
+      items = [{"text": row[0]} for _, row in rows]
+    else:
+      n_column = header.index("number_of_topics") if "number_of_topics" in header else None
+      for line_number, row in rows[1:]:
+        record = {"text": row[column] if len(row) > column else ""}
+        if n_column is not None and len(row) > n_column:
+          count = topic_count(row[n_column], f"{path}, line {line_number}")
+          if count is not None:
+            record["number_of_topics"] = count
+        items.append(record)
+
+  return [r for r in items if str(r.get("text", "")).strip()]
+
+def slugify(text, max_len = 60):
+  slug = re.sub(r"[^a-zA-Z0-9]+", "-", text).strip("-").lower()
+  return slug[:max_len] or "item"
+
+def run_one(mode, index, record, out_dir):
+  # runs in a worker thread; the generators are plain blocking functions
+  text = str(record["text"]).strip()
+  output_file = os.path.join(out_dir, f"{index:04d}_{slugify(text)}.md")
+
+  entry = {"index": index, "mode": mode, "input": text, "output_file": None, "status": "ok", "error": None}
+  start = time.perf_counter()
+  try:
+    if mode == "summary":
+      from _002_article_summarizer import gen_summary
+      written = gen_summary(text, record.get("number_of_topics"), output_file = output_file, stream = False)
+    else:
+      from _003_article_generator import gen_article
+      written = gen_article(text, output_file = output_file, stream = False)
+
+    entry["output_file"] = written
+    if written is None:
+      entry["status"] = "empty"
+  except Exception as e:
+    entry["status"] = "failed"
+    entry["error"] = f"{type(e).__name__}: {e}"
+  entry["seconds"] = round(time.perf_counter() - start, 3)
+  return entry
+
+async def run_batch(items, mode = "summary", concurrency = 4, out_dir = "batch_output"):
+  os.makedirs(out_dir, exist_ok=True)
+
+  loop = asyncio.get_running_loop()
+  limit = asyncio.Semaphore(concurrency)
+
+  with ThreadPoolExecutor(max_workers = concurrency) as pool:
+    async def bounded(index, record):
+      async with limit:
+        entry = await loop.run_in_executor(pool, run_one, mode, index, record, out_dir)
+        print(f"[{index + 1}/{len(items)}] {entry['status']}: {entry['input']} ({entry['seconds']}s)")
+        return entry
+
+    return await asyncio.gather(*(bounded(i, r) for i, r in enumerate(items)))
+
+def write_manifest(entries, out_dir, started_at, seconds):
+  manifest = {
+    "started_at": started_at,
+    "seconds": round(seconds, 3),
+    "total": len(entries),
+    "ok": sum(e["status"] == "ok" for e in entries),
+    "failed": sum(e["status"] == "failed" for e in entries),
+    "items": entries,
+  }
+  path = os.path.join(out_dir, "manifest.json")
+  with open(path, "w", encoding="utf-8") as f:
+    json.dump(manifest, f, indent=2)
+  return path
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description="Run the article crews over a CSV/JSONL file of themes or topics.")
+  parser.add_argument("input", help="CSV or JSONL file of themes (summary mode) or topics (article mode)")
+  parser.add_argument("--mode", choices=["summary", "article"], default="summary")
+  parser.add_argument("--concurrency", type=int, default=4, help="how many crews run at the same time")
+  parser.add_argument("--out", default=None, help="output folder (default: Downloads/batch_<timestamp>)")
+  args = parser.parse_args(argv)
+
+  items = read_items(args.input)
+  if not items:
+    print("No themes/topics found in", args.input)
+    return 1
+
+  out_dir = args.out
+  if not out_dir:
+    from _101_download_to_device import find_downloads_folder
+    r = datetime.datetime.today()
+    rn = f"{r.day}-{r.month}-{r.year}_{r.hour}-{r.minute}-{r.second}"
+    out_dir = os.path.join(find_downloads_folder(), f"batch_{rn}")
+
+  print(f"\nRunning {len(items)} item(s) in {args.mode} mode, {args.concurrency} at a time...")
+  started_at = datetime.datetime.now().isoformat(timespec="seconds")
+  start = time.perf_counter()
+  entries = asyncio.run(run_batch(items, args.mode, max(1, args.concurrency), out_dir))
+  manifest = write_manifest(entries, out_dir, started_at, time.perf_counter() - start)
+
+  failed = sum(e["status"] == "failed" for e in entries)
+  print(f"\nBatch done: {len(entries) - failed} succeeded, {failed} failed. Manifest: {manifest}")
+  return 1 if failed else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+## Task:
+Let a "sequential" crew run independent tasks side by side
+
+Each Task declares what it needs through `context`. From that we work out
+dependency levels (plan -> research -> {condense, links} -> join), and every
+level with more than one task is marked `async_execution`, so crewai starts
+them together and only waits for them at the next task that needs them.
+
+`run_task_graph` goes one step further for graphs that crewai's async flag can't
+express (e.g. several independent branches that each end in more than one task):
+every task runs in its own one-task crew as soon as its context is done.
+"""
+
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# the task run_single_task is running in this context; crewai's step callbacks aren't told which task a step is for
+current_task = ContextVar("current_task", default = None)
+
+def task_dependencies(task, tasks):
+  context = getattr(task, "context", None)
+  if not isinstance(context, list):
+    return []
+  return [t for t in context if any(t is other for other in tasks)]
+
+def dependency_levels(tasks):
+  levels = {}
+
+  def level_of(task, seen = ()):
+    if id(task) in levels:
+      return levels[id(task)]
+    if any(task is s for s in seen):
+      raise ValueError(f"Task '{task.name}' depends on itself through its context")
+    deps = task_dependencies(task, tasks)
+    level = 1 + max((level_of(d, seen + (task,)) for d in deps), default = -1)
+    levels[id(task)] = level
+    return level
+
+  for task in tasks:
+    level_of(task)
+  return levels
+
+def schedule_tasks(tasks):
+  """
+  Returns `tasks` ordered by dependency level (ties keep their original order),
+  with the tasks that share a level set to run asynchronously.
+  """
+  levels = dependency_levels(tasks)
+  position = {id(t): i for i, t in enumerate(tasks)}
+  ordered = sorted(tasks, key = lambda t: (levels[id(t)], position[id(t)]))
+
+  groups = {}
+  for task in ordered:
+    groups.setdefault(levels[id(task)], []).append(task)
+
+  last_level = max(groups)
+  for level, group in groups.items():
+    # crewai only allows a crew to end with a single async task, so a wide last level stays sequential
+    parallel = len(group) > 1 and level != last_level
+    for task in group:
+      task.async_execution = parallel
+
+  return ordered
+
+def describe_schedule(tasks):
+  levels = dependency_levels(tasks)
+  groups = {}
+  for task in tasks:
+    groups.setdefault(levels[id(task)], []).append(task.name)
+  return " -> ".join(" | ".join(names) if len(names) == 1 else "{" + " | ".join(names) + "}" for _, names in sorted(groups.items()))
+
+def run_single_task(task, crew_settings, inputs = None):
+  from _113_context_pruning import PrunedContextCrew
+  token = current_task.set(task)
+  try:
+    PrunedContextCrew(agents = [task.agent], tasks = [task], **crew_settings).kickoff(inputs = inputs or None)
+  finally:
+    current_task.reset(token)
+  return task.output
+
+def replay_output(task, raw):
+  """
+  Gives `task` the output `raw` of an earlier run without running it; tasks that have it
+  in their context read it like any other output.
+  """
+  from crewai.tasks.task_output import TaskOutput
+  task.output = TaskOutput(description = task.description, name = task.name, expected_output = task.expected_output,
+                           raw = raw, agent = task.agent.role if task.agent else "")
+  return task.output
+
+def run_task_graph(tasks, max_workers = 8, inputs_for = None, replay_for = None, started = None, run_with = None,
+                   **crew_settings):
+  """
+  Runs `tasks` on a thread pool, starting each one once every task in its
+  `context` has finished (context tasks outside `tasks` count as already done).
+  `inputs_for` maps id(task) to the kickoff inputs of that task's crew,
+  `replay_for` maps id(task) to an earlier output to use instead of running the task,
+  `started` maps id(task) to the Future of a run of the task that's already under way, and
+  `run_with` maps id(task) to a function that runs it in place of run_single_task (same arguments).
+  Returns the task outputs in the order the tasks were given.
+  """
+  inputs_for = inputs_for or {}
+  replay_for = replay_for or {}
+  started = started or {}
+  run_with = run_with or {}
+  dependency_levels(tasks)   # fails early on cycles
+
+  outputs = {id(t): replay_output(t, replay_for[id(t)]) for t in tasks if id(t) in replay_for}
+  running = {started[id(t)]: t for t in tasks if id(t) in started and id(t) not in outputs}
+  pending = [t for t in tasks if id(t) not in outputs and id(t) not in started]
+
+  with ThreadPoolExecutor(max_workers = max(1, max_workers)) as pool:
+    try:
+      while pending or running:
+        ready = [t for t in pending if all(id(d) in outputs for d in task_dependencies(t, tasks))]
+        for task in ready:
+          pending = [t for t in pending if t is not task]
+          run = run_with.get(id(task), run_single_task)
+          running[pool.submit(run, task, crew_settings, inputs_for.get(id(task)))] = task
+
+        finished, _ = wait(running, return_when = FIRST_COMPLETED)
+        for future in finished:
+          task = running.pop(future)
+          outputs[id(task)] = future.result()
+    finally:
+      # on failure, don't start anything new; already running tasks are left to finish
+      for future in running:
+        future.cancel()
+
+  return [outputs[id(t)] for t in tasks]
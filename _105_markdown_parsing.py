@@ -0,0 +1,95 @@
+"""
+## Task:
+Small helpers to read the markdown the agents are asked to produce
+(numbered lists, '### Heading' sections, ...)
+"""
+
+import re
+
+NUMBERED_ITEM = re.compile(r"^\s*(\d+)\s*[.)]\s+(.+?)\s*$")
+
+def clean_item(text):
+  # planners like to wrap titles in **bold** or quotes
+  return text.strip().strip("*_").strip().strip('"').strip("'").strip()
+
+def parse_numbered_list(text):
+  """
+  Returns the items of the numbered list in `text` ("1. Topic One", "2) Topic Two", ...), in order.
+  """
+  items = []
+  for line in (text or "").splitlines():
+    match = NUMBERED_ITEM.match(line)
+    if match:
+      item = clean_item(match.group(2))
+      if item:
+        items.append(item)
+  return items
+
+MARKDOWN_HEADING = re.compile(r"^\s*(#{1,6})\s+(.+?)\s*#*\s*$")
+BOLD_LINE = re.compile(r"^\s*\*\*([^*]+?)\*\*\s*:?\s*$")
+
+# the section headings the prompts ask for, which are sometimes written without the '#'
+SECTION_TITLES = ("Research Findings", "Source Links", "Resources Used", "Condensed Information Points", "Fact Check Report")
+
+def heading_key(text):
+  # "## Source Links:", "**Source Links**" and "Source Links" all name the same section
+  return re.sub(r"\s+", " ", text.strip().strip("#*_:").strip().rstrip(":")).lower()
+
+def split_sections(text, titles = ()):
+  """
+  Splits `text` at its markdown headings, at lines that are all **bold**, and at lines that are
+  just one of SECTION_TITLES / `titles` (agents don't always put the '#' in front).
+  Returns (heading key, section text) pairs; whatever comes before the first heading has the key None.
+  """
+  known = {heading_key(t) for t in SECTION_TITLES + tuple(titles)}
+  sections = [[None, []]]
+  for line in (text or "").splitlines():
+    match = MARKDOWN_HEADING.match(line) or BOLD_LINE.match(line)
+    key = heading_key(match.group(match.lastindex)) if match else heading_key(line) if line.strip() else ""
+    if match or key in known:
+      sections.append([key, []])
+    sections[-1][1].append(line)
+  return [(key, "\n".join(lines).strip()) for key, lines in sections if "\n".join(lines).strip()]
+
+def extract_sections(text, titles):
+  """
+  Only the sections of `text` headed by one of `titles`, in their original order,
+  or None if none of them is there.
+  """
+  wanted = {heading_key(t) for t in titles}
+  found = [section for key, section in split_sections(text, titles) if key in wanted]
+  return "\n\n".join(found) if found else None
+
+URL = re.compile(r"https?://[^\s<>\"'`]+")
+MARKDOWN_LINK = re.compile(r"\[[^\]]*\]\((https?://[^)\s]+)\)")
+
+def clean_url(url):
+  # trailing punctuation belongs to the sentence/list around the link, not to the link itself
+  url = url.rstrip(".,;:!?*_")
+  while url.endswith(")") and url.count(")") > url.count("("):
+    url = url[:-1]
+  while url.endswith("]") and url.count("]") > url.count("["):
+    url = url[:-1]
+  return url
+
+def url_key(url):
+  # only for spotting duplicates: scheme/host case, a trailing slash and the #fragment don't make a new link
+  scheme, _, rest = url.partition("://")
+  host, slash, path = rest.partition("/")
+  path = path.split("#")[0].rstrip("/")
+  return f"{scheme.lower()}://{host.lower()}/{path}"
+
+def extract_urls(text):
+  """
+  Every http(s) URL in `text`, in order of first appearance, without duplicates.
+  The URLs themselves are kept exactly as written (minus surrounding punctuation).
+  """
+  text = MARKDOWN_LINK.sub(lambda m: f" {m.group(1)} ", text or "")
+  urls, seen = [], set()
+  for match in URL.finditer(text):
+    url = clean_url(match.group(0))
+    key = url_key(url)
+    if "." in url.partition("://")[2].split("/")[0] and key not in seen:
+      seen.add(key)
+      urls.append(url)
+  return urls
@@ -0,0 +1,48 @@
+"""
+## Task:
+Check the Python version and make sure CrewAI is installed - once per process,
+and only when a crew is actually about to run (not when the menu is imported)
+"""
+
+import sys
+import threading
+
+_lock = threading.Lock()
+_ready = False
+
+def ensure_crewai():
+  global _ready
+  if _ready:
+    return
+
+  with _lock:
+    if _ready:
+      return
+
+    # Check Python version compatibility
+    if not (sys.version_info >= (3, 10) and sys.version_info < (3, 14)):
+      print("Error: CrewAI requires Python >=3.10 and <3.14")
+      print(f"Your Python version: {sys.version}")
+      sys.exit(1)
+
+    # Install CrewAI if missing
+    try:
+      import crewai
+    except ImportError:
+      import subprocess
+
+      print("CrewAI not found. Installing...")
+      try:
+        # Use pip to install CrewAI
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "crewai"])
+        import crewai
+        print("CrewAI installed successfully")
+      except subprocess.CalledProcessError as e:
+        print(f"Installation failed: {e}")
+        sys.exit(1)
+
+    # this tells the code to ignore/disregard any warnings that appear
+    import warnings
+    warnings.filterwarnings('ignore')
+
+    _ready = True
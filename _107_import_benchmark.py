@@ -0,0 +1,83 @@
+"""
+## Task:
+Guard the CLI's startup time: import each entry module under `python -X importtime`
+and fail if it got slow, or if it pulls in crewai / IPython / other heavy packages at import time
+
+Usage:
+  python _107_import_benchmark.py               # check against the default budget
+  python _107_import_benchmark.py --budget-ms 50 --runs 10
+"""
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+ENTRY_MODULES = ["_001_main_interface", "_002_article_summarizer", "_003_article_generator", "_103_batch_runner"]
+
+# none of these should load before a crew actually runs
+HEAVY_PACKAGES = ("crewai", "litellm", "IPython", "pypdf", "google", "openai", "pydantic")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def measure_import(module, cwd):
+  """
+  Imports `module` in a fresh interpreter; returns (cumulative microseconds, names of every module it imported).
+  """
+  result = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+    cwd = cwd, capture_output = True, text = True
+  )
+  if result.returncode != 0:
+    raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+  cumulative_us = None
+  imported = []
+  for line in result.stderr.splitlines():
+    match = IMPORTTIME_LINE.match(line)
+    if not match:
+      continue
+    name = match.group(4)
+    imported.append(name)
+    if name == module:
+      cumulative_us = int(match.group(2))
+  return cumulative_us or 0, imported
+
+def check_module(module, cwd, runs, budget_ms):
+  timings = []
+  imported = []
+  for _ in range(runs):
+    us, imported = measure_import(module, cwd)
+    timings.append(us)
+
+  # the fastest run is the least noisy estimate of what the import itself costs
+  best_ms = min(timings) / 1000
+  heavy = sorted({name.split(".")[0] for name in imported if name.split(".")[0] in HEAVY_PACKAGES})
+
+  problems = []
+  if best_ms > budget_ms:
+    problems.append(f"took {best_ms:.1f} ms (budget {budget_ms} ms)")
+  if heavy:
+    problems.append(f"imports {', '.join(heavy)} at import time")
+  return best_ms, problems
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description="Import-time regression check for the CLI entry modules.")
+  parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", 100)))
+  parser.add_argument("--runs", type=int, default=5)
+  parser.add_argument("modules", nargs="*", default=ENTRY_MODULES)
+  args = parser.parse_args(argv)
+
+  cwd = os.path.dirname(os.path.abspath(__file__))
+  failed = False
+  for module in args.modules:
+    best_ms, problems = check_module(module, cwd, max(1, args.runs), args.budget_ms)
+    status = "FAIL" if problems else "ok"
+    print(f"{status:4} {module:30} {best_ms:8.1f} ms" + (f"  <- {'; '.join(problems)}" if problems else ""))
+    failed = failed or bool(problems)
+
+  return 1 if failed else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
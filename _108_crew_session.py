@@ -0,0 +1,181 @@
+"""
+## Task:
+Keep one warm session per process: the LLM client and the agent/task templates of
+each crew are built once, and every run only rebinds the theme/topic through
+crewai's `kickoff(inputs=...)` interpolation ({theme}, {topic}, ... in the prompts)
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+class CrewSession:
+  def __init__(self, llm = None, streaming_llm = None):
+    self._llm = llm
+    self._streaming_llm = streaming_llm or llm
+    self._link_llm = None
+    self._routed = {}        # (tier, stream) -> LLM
+    self._given_llm = llm is not None
+    self._templates = {}
+    self._idle = {}
+    self._lock = threading.RLock()
+
+  @property
+  def llm(self):
+    with self._lock:
+      if self._llm is None:
+        self._llm = self._build_llm()
+      return self._llm
+
+  @property
+  def streaming_llm(self):
+    # the same model, streaming its tokens; used by the agents whose answer is the final output
+    with self._lock:
+      if self._streaming_llm is None:
+        self._streaming_llm = self._build_llm(stream = True)
+      return self._streaming_llm
+
+  @property
+  def link_llm(self):
+    # the Link Collector's links are parsed out of the research; export LINK_EXTRACTOR=0 to ask the model instead
+    with self._lock:
+      if self._link_llm is None:
+        if os.environ.get("LINK_EXTRACTOR", "1") == "0":
+          self._link_llm = self.llm_for("Link Collector")
+        else:
+          from _114_link_extraction import LinkExtractorLLM
+          self._link_llm = LinkExtractorLLM(self.llm_for("Link Collector"))
+      return self._link_llm
+
+  def llm_for(self, role, stream = False):
+    """
+    The LLM the agents with `role` run on: the model and temperature of the tier the routing table
+    (_123_model_routing) sends them to. A session made with an LLM of its own runs every agent on it.
+    """
+    if self._given_llm:
+      return self.streaming_llm if stream else self.llm
+    from _123_model_routing import DEFAULT_TIER, get_routing
+    tier = get_routing().tier_for(role)
+    if tier == DEFAULT_TIER:
+      return self.streaming_llm if stream else self.llm
+    with self._lock:
+      if (tier, stream) not in self._routed:
+        self._routed[(tier, stream)] = self._build_llm(stream, tier)
+      return self._routed[(tier, stream)]
+
+  def _build_llm(self, stream = False, tier = None):
+    from _106_environment import ensure_crewai
+    ensure_crewai()
+    from crewai import LLM
+    from _102_llm_cache import CachedLLM, env_flag
+    from _112_rate_limiter import RateLimitedLLM, get_default_limiter
+    from _115_budget import BudgetedLLM
+    from _123_model_routing import DEFAULT_TIER, MeteredLLM, get_routing
+    from _125_http_pool import install, llm_client_settings
+
+    GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+    if not GOOGLE_API_KEY:
+      raise ValueError("GOOGLE_API_KEY environment variable not set. Please set it as a secret in your GitHub repository. If in command line/terminal, run the command: export GOOGLE_API_KEY='YOUR_API_KEY' ")
+
+    # repeated prompts are served from the on-disk cache; export LLM_CACHE_BYPASS=1 to force fresh answers.
+    # Everything else is charged to the run's budget (_115_budget), then waits for the
+    # process-wide rate limiter (LLM_RPM / LLM_TPM) before it goes to Gemini, where it's metered per tier
+    tier = tier or DEFAULT_TIER
+    settings = get_routing().tiers[tier]
+    install()
+    llm = MeteredLLM(LLM(
+      model=settings["model"],
+      temperature=settings["temperature"],   # see _123_model_routing for the tiers and which agents use them
+      api_key=GOOGLE_API_KEY,
+      stream=stream,
+      **llm_client_settings()          # every LLM shares one keep-alive connection pool (_125_http_pool)
+    ), tier = tier, input_price = settings.get("input_price", 0.0), output_price = settings.get("output_price", 0.0))
+    if env_flag("LLM_HEDGE") and not stream:
+      # slow calls are sent a second time (_124_hedged_requests). Inside the rate limiter, so time spent
+      # queued for it isn't taken for a slow model; a duplicate only goes out if a slot is free right away
+      from _124_hedged_requests import HedgedLLM
+      llm = HedgedLLM(llm, limiter = get_default_limiter())
+    return CachedLLM(BudgetedLLM(RateLimitedLLM(llm)))
+
+  def crew_settings(self):
+    # the settings every crew in both generators runs with
+    return dict(
+      process = "sequential",
+      verbose = False,
+      memory = False,
+      share_crew = True,
+      planning = False,
+      chat_llm = self.llm
+    )
+
+  def template(self, name, builder):
+    """
+    The pristine crew(s) `builder(session)` makes for `name`, built once. Templates are never
+    run themselves - runs get instances from `checkout` - so their placeholders stay intact.
+    """
+    with self._lock:
+      if name not in self._templates:
+        from _106_environment import ensure_crewai
+        ensure_crewai()
+        self._templates[name] = builder(self)
+        self._idle[name] = []
+      return self._templates[name]
+
+  @contextmanager
+  def checkout(self, name, builder):
+    """
+    Yields a runnable instance of the `name` template. Instances go back to an idle pool
+    afterwards, so later runs reuse them as they are; a copy is only made when every
+    instance is busy (the first run, or several runs at once, e.g. batch workers).
+    """
+    template = self.template(name, builder)
+    with self._lock:
+      idle = self._idle[name]
+      instance = idle.pop() if idle else None
+    if instance is None:
+      instance = self.copy_template(template)
+    try:
+      yield instance
+    finally:
+      self.release(instance)
+      with self._lock:
+        idle.append(instance)
+
+  def release(self, instance):
+    # what a run left on its instance (task outputs, the agents' executors with their conversations and
+    # flow state, which grows with every task they run) would otherwise stay reachable from the idle pool;
+    # an agent builds a new executor for its next task
+    for crew in (instance.values() if isinstance(instance, dict) else [instance]):
+      for task in crew.tasks:
+        task.output = None
+      for agent in crew.agents:
+        agent.agent_executor = None
+
+  def copy_template(self, template):
+    if isinstance(template, dict):
+      return {k: self.copy_template(v) for k, v in template.items()}
+    return self.copy_crew(template)
+
+  def copy_crew(self, crew):
+    # Crew.copy() would round-trip chat_llm through model_dump and lose the cache wrapper around it.
+    # Runnable copies only pass each task the context sections it declared (see _113_context_pruning)
+    from _113_context_pruning import PrunedContextCrew
+
+    agents = [agent.copy() for agent in crew.agents]
+    task_mapping = {}
+    tasks = []
+    for task in crew.tasks:
+      clone = task.copy(agents, task_mapping)
+      task_mapping[task.key] = clone
+      tasks.append(clone)
+    return PrunedContextCrew(agents = agents, tasks = tasks, **self.crew_settings())
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+  global _session
+  with _session_lock:
+    if _session is None:
+      _session = CrewSession()
+    return _session
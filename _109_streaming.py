@@ -0,0 +1,148 @@
+"""
+## Task:
+Stream the final task's answer to the console and to the output .md file as the
+tokens arrive, instead of waiting for the whole crew to finish first
+"""
+
+import os
+import threading
+
+FINAL_ANSWER = "Final Answer:"
+
+def output_header(title):
+  hyphens = "-" * len(title)
+  return f"{title} \n\n{hyphens}\n\n"
+
+def clean_output(text):
+  # the model sometimes wraps its whole answer in a ```markdown fence
+  text = (text or "").strip()
+  if text.startswith("```"):
+    text = text[3:]
+    if text.startswith("markdown"):
+      text = text[len("markdown"):]
+  if text.endswith("```"):
+    text = text[:-3]
+  return text.strip() + "\n"
+
+def resolve_output_file(output_file, prefix):
+  if output_file:
+    return output_file
+
+  from _101_download_to_device import find_downloads_folder
+
+  downloads_folder = find_downloads_folder()
+  print("\nDownloads folder is:", downloads_folder)
+
+  import datetime
+  r = datetime.datetime.today()
+  rn = f"{r.day}-{r.month}-{r.year}_{r.hour}-{r.minute}-{r.second}"
+
+  file_writer = f"{prefix}_{rn}.md"
+  return os.path.join(downloads_folder, file_writer)
+
+def write_markdown(path, header, body):
+  # write next to the target and swap it in, so the file is never left half-written
+  tmp = f"{path}.tmp"
+  with open(tmp, "w", encoding="utf-8") as f:
+    f.write(header)
+    f.write(clean_output(body))
+  os.replace(tmp, path)
+
+class MarkdownStream:
+  """
+  While active, every token the LLM streams for the watched task is printed and appended to `path`.
+  The agent's reasoning ("Thought: ...") is held back until its "Final Answer:" starts.
+  If the run dies halfway, the partial answer stays in the file; `finish` replaces it with the final text.
+  `listener`, if given, is called with {"event": "text", "text": ...} for every streamed piece of the answer.
+  """
+
+  def __init__(self, path, header, echo = True, listener = None):
+    self.path = path
+    self.header = header
+    self.echo = echo
+    self.listener = listener
+    self.task_id = None
+    self.call_id = None
+    self.pending = ""
+    self.streaming = False
+    self.streamed_chars = 0
+    self._lock = threading.Lock()
+    self._file = None
+
+  def watch(self, task):
+    self.task_id = str(task.id)
+
+  def __enter__(self):
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+
+    self._file = open(self.path, "w", encoding="utf-8")
+    self._file.write(self.header)
+    self._file.flush()
+    crewai_event_bus.on(LLMStreamChunkEvent)(self.on_chunk)
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+
+    crewai_event_bus.off(LLMStreamChunkEvent, self.on_chunk)
+    if self._file and not self._file.closed:
+      self._file.close()
+    return False
+
+  def on_chunk(self, source, event):
+    if self.task_id is None or getattr(event, "task_id", None) != self.task_id or event.tool_call:
+      return
+
+    with self._lock:
+      if event.call_id != self.call_id:
+        # another LLM call for the same task (a retry, or the agent trying again): start the answer over
+        if self.streamed_chars:
+          self.restart()
+        self.call_id = event.call_id
+        self.pending = ""
+        self.streaming = False
+        self.streamed_chars = 0
+
+      text = event.chunk or ""
+      if not self.streaming:
+        self.pending += text
+        marker = self.pending.find(FINAL_ANSWER)
+        if marker >= 0:
+          text = self.pending[marker + len(FINAL_ANSWER):].lstrip()
+        elif len(self.pending.lstrip()) > len("Thought:") and not self.pending.lstrip().startswith("Thought"):
+          # not a ReAct-style reply, so it's all answer
+          text = self.pending
+        else:
+          return
+        self.streaming = True
+
+      if text:
+        self.streamed_chars += len(text)
+        self.emit(text)
+
+  def emit(self, text):
+    # a piece of the answer
+    self._file.write(text)
+    self._file.flush()
+    if self.echo:
+      print(text, end="", flush=True)
+    if self.listener:
+      self.listener({"event": "text", "text": text})
+
+  def restart(self):
+    # the answer streamed so far is void, another one is on its way
+    self._file.seek(0)
+    self._file.truncate()
+    self._file.write(self.header)
+    if self.echo:
+      print("\n\n[the agent is revising its answer...]\n")
+    if self.listener:
+      self.listener({"event": "restart"})
+
+  def finish(self, final_text):
+    if self._file and not self._file.closed:
+      self._file.close()
+    if self.echo and not self.streamed_chars:
+      # nothing was streamed (e.g. a cached answer), so show the whole thing now
+      print(final_text)
+    write_markdown(self.path, self.header, final_text)
@@ -0,0 +1,287 @@
+"""
+## Task:
+Trace every run: wall time, LLM calls, prompt/completion tokens, retries and agent steps
+per task and per agent, written as JSONL spans (one JSON object per line) so we can see
+which agent dominates the runtime and the token spend
+
+Spans are appended to ~/.cache/bphc_agentic_ai/traces.jsonl (export TRACE_PATH to move it);
+export TRACE_SUMMARY=1 to also print a summary table at the end of each run.
+
+Usage:
+  python _110_tracing.py                  # summary of the last run in the trace file
+  python _110_tracing.py <run_id>
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+
+DEFAULT_TRACE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bphc_agentic_ai", "traces.jsonl")
+
+def usage_tokens(usage, *keys):
+  # providers name the usage fields differently (prompt_tokens vs prompt_token_count, ...)
+  for key in keys:
+    if usage and usage.get(key):
+      return int(usage[key])
+  return 0
+
+def new_counters():
+  return {"llm_calls": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0, "steps": 0,
+          "context_tokens": 0, "context_tokens_saved": 0}
+
+class RunTracer:
+  """
+  Records one run of a crew pipeline. `attach` hooks the task/step callbacks of checked out crews;
+  while the tracer is active it also listens to crewai's LLM call events for those tasks.
+  Several tracers can be active at once (batch runs): each one only sees its own tasks.
+  `listener`, if given, is told when each of those tasks starts and finishes.
+  """
+
+  def __init__(self, pipeline, label = "", path = None, listener = None):
+    self.pipeline = pipeline
+    self.label = label
+    self.listener = listener
+    self.run_id = uuid.uuid4().hex[:12]
+    self.path = path or os.environ.get("TRACE_PATH") or DEFAULT_TRACE_PATH
+    self.start = None
+    self.end = None
+    self.tasks = {}       # task id -> task span
+    self.task_agents = {} # task id -> the agent (object) that runs it
+    self.calls = {}       # call id -> llm call span
+    self.spans = []
+    self._lock = threading.Lock()
+
+  def attach(self, crew, name = None):
+    """
+    Per-run callbacks on a checked out crew (or a dict of crews). They are set on the agents and
+    tasks themselves, so they replace whatever the previous run of a pooled instance left there.
+    """
+    if isinstance(crew, dict):
+      for c in crew.values():
+        self.attach(c, name)
+      return
+
+    for agent in crew.agents:
+      agent.step_callback = self._step_callback(agent)
+    for task in crew.tasks:
+      task.callback = self._task_callback(task)
+      self.task_agents[str(task.id)] = task.agent
+      span = {
+        "kind": "task", "name": task.name or task.agent.role, "scope": name, "agent": task.agent.role,
+        "task_id": str(task.id), "start": None, "end": None, "status": "pending",
+      }
+      span.update(new_counters())
+      with self._lock:
+        self.tasks[str(task.id)] = span
+
+  def _step_callback(self, agent):
+    from _104_task_graph import current_task
+    def on_step(step):
+      task = current_task.get()
+      with self._lock:
+        span = self.tasks.get(str(task.id)) if task is not None else self._running_task(agent)
+        if span:
+          span["steps"] += 1
+    return on_step
+
+  def _task_callback(self, task):
+    task_id = str(task.id)
+    def on_task(output):
+      with self._lock:
+        span = self.tasks[task_id]
+        span["end"] = time.time()
+        span["status"] = "ok"
+        if span["start"] is None:
+          span["start"] = span["end"]
+      self._notify("task_finished", span)
+    return on_task
+
+  def _running_task(self, agent):
+    # for crews kicked off directly (not through run_single_task): the agent's one running task. Every checked
+    # out crew has agents of its own, so parallel instances of a crew (one per topic) don't share any
+    running = [s for task_id, s in self.tasks.items()
+               if self.task_agents.get(task_id) is agent and s["start"] is not None and s["end"] is None]
+    return running[-1] if len(running) == 1 else None
+
+  # crewai event bus handlers; they run on the bus' worker threads
+
+  def on_task_started(self, source, event):
+    task_id = str(getattr(event.task, "id", "")) or event.task_id
+    with self._lock:
+      span = self.tasks.get(task_id)
+      # a task run in several kickoffs (the fact check's passes) starts with the first
+      if span is not None and span["start"] is None:
+        span["start"] = event.timestamp.timestamp()
+        span["status"] = "running"
+        self._notify("task_started", span)
+
+  def _notify(self, event, span):
+    if self.listener:
+      self.listener({"event": event, "task": span["name"], "scope": span["scope"], "agent": span["agent"]})
+
+  def on_llm_started(self, source, event):
+    with self._lock:
+      if event.task_id not in self.tasks:
+        return
+      self.calls[event.call_id] = {
+        "kind": "llm", "name": event.model, "agent": event.agent_role, "task_id": event.task_id,
+        "call_id": event.call_id, "start": event.timestamp.timestamp(), "end": None, "status": "running",
+        "prompt_tokens": 0, "completion_tokens": 0,
+      }
+
+  def on_llm_completed(self, source, event):
+    usage = event.usage or {}
+    self._end_call(event, "ok",
+      prompt_tokens = usage_tokens(usage, "prompt_tokens", "prompt_token_count", "input_tokens"),
+      completion_tokens = usage_tokens(usage, "completion_tokens", "candidates_token_count", "output_tokens"))
+
+  def on_llm_failed(self, source, event):
+    self._end_call(event, "failed", error = event.error[:500])
+
+  def _end_call(self, event, status, **fields):
+    with self._lock:
+      call = self.calls.get(event.call_id)
+      task = self.tasks.get(event.task_id)
+      if call is None or task is None:
+        return
+      call.update(fields, end = event.timestamp.timestamp(), status = status)
+      task["llm_calls"] += 1
+      task["prompt_tokens"] += call["prompt_tokens"]
+      task["completion_tokens"] += call["completion_tokens"]
+      if status == "failed":
+        # whatever follows a failed call for the same task is a retry
+        task["retries"] += 1
+
+  def handlers(self):
+    from crewai.events import (
+      LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent, TaskStartedEvent
+    )
+    return [
+      (TaskStartedEvent, self.on_task_started),
+      (LLMCallStartedEvent, self.on_llm_started),
+      (LLMCallCompletedEvent, self.on_llm_completed),
+      (LLMCallFailedEvent, self.on_llm_failed),
+    ]
+
+  def __enter__(self):
+    from crewai.events import crewai_event_bus
+
+    self.start = time.time()
+    for event_type, handler in self.handlers():
+      crewai_event_bus.on(event_type)(handler)
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    from crewai.events import crewai_event_bus
+
+    # let the bus deliver the last events before we stop listening
+    crewai_event_bus.flush(timeout = 5)
+    for event_type, handler in self.handlers():
+      crewai_event_bus.off(event_type, handler)
+    self.end = time.time()
+    self.finish("failed" if exc_type else "ok")
+    return False
+
+  def finish(self, status = "ok"):
+    """
+    Turns what was recorded into spans (llm calls, tasks, agents, the run) and appends them to the trace file.
+    """
+    with self._lock:
+      calls = list(self.calls.values())
+      # tasks of an attached crew that this run never used (e.g. a template's unused branch) are left out
+      tasks = [t for t in self.tasks.values() if t["start"] is not None or t["llm_calls"]]
+
+    for span in calls + tasks:
+      if span["end"] is None and span["start"] is not None:
+        span["end"] = self.end
+        span["status"] = "failed" if status == "failed" else "unfinished"
+
+    # what context pruning left out of each task's prompt (estimated tokens)
+    from _113_context_pruning import pop_savings
+    savings = pop_savings(list(self.tasks))
+    for task in tasks:
+      full, sent = savings.get(task["task_id"], (0, 0))
+      task["context_tokens"] = full
+      task["context_tokens_saved"] = full - sent
+
+    agents = {}
+    for task in tasks:
+      agent = agents.setdefault(task["agent"], dict(
+        {"kind": "agent", "name": task["agent"], "start": None, "end": None, "tasks": 0, "task_seconds": 0.0},
+        **new_counters()))
+      agent["tasks"] += 1
+      for key in new_counters():
+        agent[key] += task[key]
+      if task["start"] is not None:
+        agent["task_seconds"] += task["end"] - task["start"]
+        agent["start"] = min(filter(None, [agent["start"], task["start"]]))
+        agent["end"] = max(filter(None, [agent["end"], task["end"]]))
+
+    run = dict({"kind": "run", "name": self.pipeline, "label": self.label, "start": self.start,
+                "end": self.end, "status": status}, **new_counters())
+    for task in tasks:
+      for key in new_counters():
+        run[key] += task[key]
+
+    self.spans = []
+    for span in calls + tasks + list(agents.values()) + [run]:
+      span = dict(span, run_id = self.run_id)
+      if span["start"] is not None and span["end"] is not None:
+        span["seconds"] = round(span["end"] - span["start"], 3)
+      if "task_seconds" in span:
+        span["task_seconds"] = round(span["task_seconds"], 3)
+      self.spans.append(span)
+
+    write_spans(self.path, self.spans)
+    return self.spans
+
+  def print_summary(self):
+    print_summary(self.spans)
+
+def write_spans(path, spans):
+  os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+  with open(path, "a", encoding="utf-8") as f:
+    for span in spans:
+      f.write(json.dumps(span) + "\n")
+
+def read_spans(path, run_id = None):
+  with open(path, encoding="utf-8") as f:
+    spans = [json.loads(line) for line in f if line.strip()]
+  if run_id is None:
+    runs = [s for s in spans if s["kind"] == "run"]
+    if not runs:
+      return []
+    run_id = runs[-1]["run_id"]
+  return [s for s in spans if s["run_id"] == run_id]
+
+def print_summary(spans):
+  run = next((s for s in spans if s["kind"] == "run"), None)
+  if run is None:
+    return
+
+  print(f"\nTrace {run['run_id']} ({run['name']}: {run['label']}) - {run.get('seconds', 0):.1f}s, "
+        f"{run['llm_calls']} LLM calls, {run['prompt_tokens']} prompt + {run['completion_tokens']} completion tokens")
+
+  columns = ("seconds", "llm_calls", "retries", "steps", "prompt_tokens", "completion_tokens")
+  header = f"{'':44} {'secs':>8} {'calls':>6} {'retry':>6} {'steps':>6} {'prompt':>8} {'compl':>8}"
+  for kind, title in (("agent", "Agent"), ("task", "Task")):
+    rows = [s if kind == "task" else dict(s, seconds = s["task_seconds"]) for s in spans if s["kind"] == kind]
+    print("\n" + title + header[len(title):])
+    for span in sorted(rows, key = lambda s: -s.get("seconds", 0)):
+      name = span["name"] if not span.get("scope") else f"{span['name']} [{span['scope']}]"
+      values = [span.get(c, 0) for c in columns]
+      print(f"{name[:44]:44} {values[0]:8.1f} " + " ".join(f"{v:>{w}}" for v, w in zip(values[1:], (6, 6, 6, 8, 8))))
+
+if __name__ == "__main__":
+  path = os.environ.get("TRACE_PATH") or DEFAULT_TRACE_PATH
+  if not os.path.exists(path):
+    print("No traces yet at", path)
+    sys.exit(1)
+  spans = read_spans(path, sys.argv[1] if len(sys.argv) > 1 else None)
+  if not spans:
+    print("No such run in", path)
+    sys.exit(1)
+  print_summary(spans)
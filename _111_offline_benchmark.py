@@ -0,0 +1,286 @@
+"""
+## Task:
+Benchmark both pipelines end to end without touching Gemini: the session's LLM is swapped
+for a deterministic local stand-in with a configurable latency and response size, so the
+orchestration and file-writing overhead can be measured (and guarded) on a laptop with no network
+
+Reports per-stage (per-task) wall time, total time, peak traced memory and allocated blocks,
+and compares them with a stored baseline.
+
+Usage:
+  python _111_offline_benchmark.py                         # compare with the stored baseline
+  python _111_offline_benchmark.py --save-baseline         # (re)record the baseline
+  python _111_offline_benchmark.py --latency 0.2 --size 400 --topics 7 --runs 5
+  python _111_offline_benchmark.py --latency 0.2 --slow 0.1 --hedge     # 10% slow calls, hedged
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import importlib
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+
+from crewai import BaseLLM
+
+PIPELINES = ("summary", "article")
+DEFAULT_BASELINE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bphc_agentic_ai", "benchmark_baseline.json")
+
+# every store a run reads or writes: env var -> (module, its process-wide instance, file name)
+STORES = {
+  "TRACE_PATH": (None, None, "traces.jsonl"),
+  "LLM_CACHE_PATH": ("_102_llm_cache", "_default_cache", "llm_cache.sqlite3"),
+  "SEMANTIC_CACHE_PATH": ("_116_semantic_cache", "_default_index", "semantic_cache.sqlite3"),
+  "CHECKPOINT_PATH": ("_117_checkpoints", "_default_store", "checkpoints.sqlite3"),
+  "KNOWLEDGE_PATH": ("_120_knowledge_store", "_default_store", "knowledge.sqlite3"),
+  "ARCHIVE_PATH": ("_121_archive", "_default_archive", "archive.sqlite3"),
+}
+
+WORDS = (
+  "agent model data system network learning signal energy design process research method "
+  "result analysis memory compute latency token article topic source future impact scale"
+).split()
+
+class LocalLLM(BaseLLM):
+  """
+  A deterministic stand-in for the Gemini LLM: the same prompt always gets the same answer.
+  Every call sleeps `latency` seconds (`slow_factor` times that for a random `slow_share` of the calls)
+  and answers with about `size` words, shaped like what each agent is expected to produce
+  (a numbered list for the planner, links for the researcher, ...).
+  It emits the same LLM call / stream chunk events a real provider does, so tracing and streaming still work.
+  """
+
+  latency: float = 0.0
+  slow_share: float = 0.0
+  slow_factor: float = 10.0
+  size: int = 200
+  topics: int = 5
+
+  def call(self, messages, tools = None, callbacks = None, available_functions = None,
+           from_task = None, from_agent = None, response_model = None):
+    from crewai.llms.base_llm import llm_call_context
+    from crewai.events.types.llm_events import LLMCallType
+
+    with llm_call_context():
+      self._emit_call_started_event(messages = messages, from_task = from_task, from_agent = from_agent)
+      if self.latency:
+        time.sleep(self.latency * (self.slow_factor if random.random() < self.slow_share else 1))
+
+      text = "Thought: I now know the final answer\nFinal Answer: " + self.answer(messages, from_agent)
+      if self.stream:
+        for word in text.split(" "):
+          self._emit_stream_chunk_event(word + " ", from_task = from_task, from_agent = from_agent)
+
+      usage = {"prompt_tokens": len(str(messages)) // 4, "completion_tokens": len(text) // 4}
+      self._emit_call_completed_event(response = text, call_type = LLMCallType.LLM_CALL,
+                                      from_task = from_task, from_agent = from_agent, usage = usage)
+      return text
+
+  def answer(self, messages, agent):
+    seed = int(hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode()).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+    role = agent.role if agent else ""
+
+    def sentence(n):
+      return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+    if role == "Topic Planner":
+      return "\n".join(f"{i}. **{sentence(5)[:-1]}**" for i in range(1, self.topics + 1))
+    if role == "Fact Checker":
+      # every statement checks out, so the fact check ends after its first pass
+      entries = "\n".join(f"Checked Statement: {sentence(8)}\nVerdict: Accurate\nVerified Source: https://example.com/{rng.choice(WORDS)}"
+                          for _ in range(3))
+      return f"Fact Check Report\n{entries}\n\n3 out of 3 statements verified as accurate."
+    if role in ("Topic Researcher", "Link Collector"):
+      links = "\n".join(f"{i}. https://example.com/{rng.choice(WORDS)}/{rng.randrange(10**6)}" for i in range(1, 6))
+      return f"### Research Findings\n- {sentence(max(1, self.size - 40))}\n\n### Source Links\n{links}"
+    paragraphs = [sentence(40) for _ in range(max(1, self.size // 40))]
+    return "\n\n".join(paragraphs)
+
+  def supports_function_calling(self):
+    return False
+
+def make_session(latency, size, topics, slow = 0.0, slow_factor = 10.0, hedge = False):
+  from _108_crew_session import CrewSession
+  from _124_hedged_requests import HedgedLLM
+
+  settings = dict(model = "local/deterministic", temperature = 0.0, latency = latency, size = size, topics = topics,
+                  slow_share = slow, slow_factor = slow_factor)
+  llm = HedgedLLM(LocalLLM(**settings)) if hedge else LocalLLM(**settings)
+  return CrewSession(llm = llm, streaming_llm = LocalLLM(stream = True, **settings))
+
+@contextmanager
+def isolated_stores(work):
+  """
+  Points every cache and store at `work` for the duration, so the benchmark neither reuses
+  what earlier (real) runs stored nor leaves its stand-in answers behind for them.
+  """
+  saved = {}
+  for var, (module, attr, name) in STORES.items():
+    module = importlib.import_module(module) if module else None
+    saved[var] = (os.environ.get(var), module, attr, getattr(module, attr) if module else None)
+    os.environ[var] = os.path.join(work, name)
+    if module:
+      setattr(module, attr, None)
+  try:
+    yield
+  finally:
+    for var, (value, module, attr, instance) in saved.items():
+      if value is None:
+        os.environ.pop(var, None)
+      else:
+        os.environ[var] = value
+      if module:
+        setattr(module, attr, instance)
+
+def run_pipeline(pipeline, session, out_dir, topics, stream):
+  from _002_article_summarizer import gen_summary
+  from _003_article_generator import gen_article
+
+  output_file = os.path.join(out_dir, f"{pipeline}.md")
+  # the pipelines narrate to stdout; keep that out of the report. Every run does the whole
+  # pipeline: nothing is reused from the runs before it
+  with redirect_stdout(io.StringIO()):
+    if pipeline == "summary":
+      return gen_summary("Offline benchmark", topics, output_file = output_file, session = session, stream = stream,
+                         fresh = True, from_archive = False)
+    return gen_article("Offline benchmark", output_file = output_file, session = session, stream = stream,
+                       fresh = True, from_archive = False)
+
+def stage_times(spans):
+  """
+  Wall time per stage (task name, across topics), plus the time no task was running:
+  setup, topic parsing and writing the output file.
+  """
+  run = next(s for s in spans if s["kind"] == "run")
+  tasks = [s for s in spans if s["kind"] == "task" and s.get("start") is not None]
+
+  stages = {}
+  for task in tasks:
+    start, end = stages.get(task["name"], (task["start"], task["end"]))
+    stages[task["name"]] = (min(start, task["start"]), max(end, task["end"]))
+  result = {name: round(end - start, 4) for name, (start, end) in sorted(stages.items(), key = lambda kv: kv[1][0])}
+
+  covered, last_end = 0.0, run["start"]
+  for task in sorted(tasks, key = lambda t: t["start"]):
+    start = max(task["start"], last_end)
+    if task["end"] > start:
+      covered += task["end"] - start
+      last_end = task["end"]
+  result["(outside tasks)"] = round(max(0.0, run["end"] - run["start"] - covered), 4)
+  return result
+
+def benchmark(pipeline, args):
+  work = tempfile.mkdtemp(prefix = "bench_")
+  with isolated_stores(work):
+    return measure(pipeline, args, work)
+
+def measure(pipeline, args, work):
+  from _110_tracing import read_spans
+
+  session = make_session(args.latency, args.size, args.topics, args.slow, args.slow_factor, args.hedge)
+
+  # timing runs; the first one also builds the crew templates (cold), the rest reuse them (warm)
+  timings = []
+  for _ in range(args.runs):
+    start = time.perf_counter()
+    run_pipeline(pipeline, session, work, args.topics, args.stream)
+    timings.append(time.perf_counter() - start)
+  spans = read_spans(os.environ["TRACE_PATH"])
+
+  # one more warm run under tracemalloc, which slows things down too much to time
+  tracemalloc.start()
+  before = tracemalloc.take_snapshot()
+  run_pipeline(pipeline, session, work, args.topics, args.stream)
+  after = tracemalloc.take_snapshot()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+
+  return {
+    "cold_seconds": round(timings[0], 4),
+    "warm_seconds": round(min(timings[1:] or timings), 4),
+    "llm_calls": next(s for s in spans if s["kind"] == "run")["llm_calls"],
+    "peak_kib": round(peak / 1024, 1),
+    "allocated_blocks": blocks,
+    "stages": stage_times(spans),
+  }
+
+def compare(results, baseline, threshold):
+  problems = []
+  for pipeline, result in results.items():
+    base = baseline.get(pipeline)
+    if not base:
+      continue
+    for key in ("warm_seconds", "peak_kib"):
+      if base.get(key) and result[key] > base[key] * (1 + threshold):
+        problems.append(f"{pipeline} {key}: {result[key]} vs baseline {base[key]} (+{threshold:.0%} allowed)")
+  return problems
+
+def print_results(results, baseline):
+  for pipeline, result in results.items():
+    base = baseline.get(pipeline, {})
+    print(f"\n{pipeline}: {result['llm_calls']} LLM calls, cold {result['cold_seconds']:.3f}s, warm {result['warm_seconds']:.3f}s"
+          + (f" (baseline {base['warm_seconds']:.3f}s)" if base else ""))
+    print(f"  peak memory {result['peak_kib']:.0f} KiB, {result['allocated_blocks']} blocks allocated"
+          + (f" (baseline {base['peak_kib']:.0f} KiB)" if base else ""))
+    for stage, seconds in result["stages"].items():
+      print(f"  {stage:44} {seconds:8.3f}s")
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description="Offline benchmark of both pipelines with a deterministic local LLM.")
+  parser.add_argument("pipelines", nargs="*", default=list(PIPELINES), help="summary and/or article (default: both)")
+  parser.add_argument("--latency", type=float, default=0.0, help="seconds every LLM call takes")
+  parser.add_argument("--slow", type=float, default=0.0, help="share of LLM calls that are slow")
+  parser.add_argument("--slow-factor", type=float, default=10.0, help="how many times longer a slow call takes")
+  parser.add_argument("--hedge", action="store_true", help="hedge the (non-streamed) LLM calls, see _124_hedged_requests")
+  parser.add_argument("--size", type=int, default=200, help="words in every LLM answer")
+  parser.add_argument("--topics", type=int, default=5, help="topics the planner comes up with")
+  parser.add_argument("--runs", type=int, default=3)
+  parser.add_argument("--no-stream", dest="stream", action="store_false", help="benchmark without streaming the output")
+  parser.add_argument("--baseline", default=os.environ.get("BENCHMARK_BASELINE", DEFAULT_BASELINE_PATH))
+  parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown/growth over the baseline (0.25 = 25%%)")
+  parser.add_argument("--save-baseline", action="store_true")
+  args = parser.parse_args(argv)
+  unknown = set(args.pipelines) - set(PIPELINES)
+  if unknown:
+    parser.error(f"unknown pipeline(s): {', '.join(sorted(unknown))}")
+  args.runs = max(1, args.runs)
+
+  settings = {"latency": args.latency, "size": args.size, "topics": args.topics, "stream": args.stream}
+  if args.slow or args.hedge:
+    settings.update(slow = args.slow, slow_factor = args.slow_factor, hedge = args.hedge)
+  results = {pipeline: benchmark(pipeline, args) for pipeline in args.pipelines}
+
+  baseline = {}
+  if os.path.exists(args.baseline) and not args.save_baseline:
+    with open(args.baseline, encoding="utf-8") as f:
+      baseline = json.load(f)
+    if baseline.pop("settings", None) != settings:
+      # numbers measured with another latency/size/... aren't comparable
+      print(f"\nThe baseline at {args.baseline} was recorded with other settings; not comparing.")
+      baseline = {}
+  print_results(results, baseline)
+
+  if args.save_baseline:
+    os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+    with open(args.baseline, "w", encoding="utf-8") as f:
+      json.dump(dict(results, settings = settings), f, indent=2)
+    print("\nBaseline saved to", args.baseline)
+    return 0
+
+  problems = compare(results, baseline, args.threshold)
+  for problem in problems:
+    print("REGRESSION", problem)
+  if not os.path.exists(args.baseline):
+    print("\nNo baseline at", args.baseline, "- run with --save-baseline to record one.")
+  return 1 if problems else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+## Task:
+Pace every Gemini call in the process through one shared limiter, so several crews running
+at once (batch runs, the parallel topic fan-out) stay under the requests/tokens-per-minute
+quota instead of all hitting 429s and stalling on uncoordinated retries
+
+- token buckets for requests per minute (LLM_RPM) and tokens per minute (LLM_TPM), set to the key's quota;
+  both are off by default (0), so a paid key isn't held to the free tier's numbers
+- AIMD: whenever Gemini answers 429 / 503 the number of calls in flight (LLM_MAX_CONCURRENCY at most) and
+  the configured rates are halved (and everyone pauses for the retry delay); successful calls win them
+  back a little at a time. Without LLM_RPM / LLM_TPM that is what finds the quota
+- counters for the time calls spent queued
+"""
+
+import os
+import time
+import threading
+
+from typing import Any
+from _102_llm_cache import DelegatingLLM
+
+# no fixed rates: the quota depends on the key (the Gemini free tier is LLM_RPM=15 LLM_TPM=1000000),
+# and the AIMD backoff on real 429s keeps calls under whatever it is
+DEFAULT_RPM = 0
+DEFAULT_TPM = 0
+DEFAULT_MAX_CONCURRENCY = 8
+
+THROTTLE_STATUS = (429, 503)
+# google.genai's APIError.status and the gRPC codes of google.api_core name the same two
+THROTTLE_STATUS_NAMES = ("RESOURCE_EXHAUSTED", "UNAVAILABLE")
+# the exception types litellm and google.api_core raise for them, matched by name so neither has to be imported
+THROTTLE_TYPES = ("RateLimitError", "ServiceUnavailableError", "ResourceExhausted", "ServiceUnavailable", "TooManyRequests")
+
+def estimate_tokens(text):
+  # about 4 characters per token for English text; close enough for pacing
+  return max(1, len(str(text)) // 4)
+
+def is_throttle(error):
+  """
+  Whether `error` (or anything in its cause chain) is the provider asking us to slow down. Only the
+  status the provider sent and its exception type count: the text of an error can quote anything.
+  """
+  seen = set()
+  while error is not None and id(error) not in seen:
+    seen.add(id(error))
+    statuses = (getattr(error, "status_code", None), getattr(getattr(error, "response", None), "status_code", None),
+                getattr(error, "code", None), getattr(error, "status", None))
+    for status in statuses:
+      if isinstance(status, int) and status in THROTTLE_STATUS:
+        return True
+      if isinstance(status, str) and status.upper() in THROTTLE_STATUS_NAMES:
+        return True
+    if any(cls.__name__ in THROTTLE_TYPES for cls in type(error).__mro__):
+      return True
+    error = error.__cause__ or error.__context__
+  return False
+
+def retry_after(error):
+  value = getattr(getattr(error, "response", None), "headers", {}) or {}
+  try:
+    return float(value.get("retry-after"))
+  except (TypeError, ValueError, AttributeError):
+    return None
+
+class TokenBucket:
+  """
+  `rate_per_minute` units (times `scale`, which the limiter adapts) refill continuously,
+  up to `burst_seconds` worth of them. Not thread-safe by itself; RateLimiter guards it.
+  """
+
+  def __init__(self, rate_per_minute, burst_seconds = 10):
+    self.rate = rate_per_minute / 60
+    self.scale = 1.0
+    self.capacity = max(1.0, self.rate * burst_seconds)
+    self.level = self.capacity
+    self.updated = time.monotonic()
+
+  def refill(self, now):
+    self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * self.scale)
+    self.updated = now
+
+  def wait_time(self, amount, now):
+    # requests bigger than the bucket only wait for a full bucket
+    self.refill(now)
+    missing = min(amount, self.capacity) - self.level
+    return max(0.0, missing / (self.rate * self.scale))
+
+  def take(self, amount):
+    self.level -= amount
+
+class RateLimiter:
+  def __init__(self, rpm = DEFAULT_RPM, tpm = DEFAULT_TPM, max_concurrency = DEFAULT_MAX_CONCURRENCY,
+               burst_seconds = 10, backoff_seconds = 1.0):
+    self.requests = TokenBucket(rpm, burst_seconds) if rpm else None
+    self.tokens = TokenBucket(tpm, burst_seconds) if tpm else None
+    self.buckets = [b for b in (self.requests, self.tokens) if b]
+    # a full rate back after about a minute's worth of successful calls
+    self.increase = 1 / rpm if rpm else 0.05
+    self.backoff_seconds = backoff_seconds
+    self.max_concurrency = max(1, max_concurrency)
+    self.window = float(self.max_concurrency)
+    self.in_flight = 0
+    self.paused_until = 0.0
+    self.last_decrease = 0.0
+    self.consecutive_throttles = 0
+    self._cond = threading.Condition()
+
+    self.calls = 0
+    self.throttles = 0
+    self.queued_seconds = 0.0
+    self.max_queued_seconds = 0.0
+
+  def acquire(self, tokens):
+    """
+    Blocks until a call estimated at `tokens` tokens may go out; returns when it went out,
+    which is handed back to `release`.
+    """
+    start = time.monotonic()
+    with self._cond:
+      while True:
+        now = time.monotonic()
+        if self.in_flight >= int(self.window):
+          self._cond.wait()
+          continue
+        wait = self._wait_time(tokens, now)
+        if wait > 0:
+          self._cond.wait(wait)
+          continue
+        return self._take(tokens, now, now - start)
+
+  def try_acquire(self, tokens):
+    """
+    Like `acquire`, but only if the call may go out right away: None (and nothing taken) if it would wait.
+    """
+    with self._cond:
+      now = time.monotonic()
+      if self.in_flight >= int(self.window) or self._wait_time(tokens, now) > 0:
+        return None
+      return self._take(tokens, now, 0.0)
+
+  def _wait_time(self, tokens, now):
+    return max(
+      self.paused_until - now,
+      self.requests.wait_time(1, now) if self.requests else 0.0,
+      self.tokens.wait_time(tokens, now) if self.tokens else 0.0,
+    )
+
+  def _take(self, tokens, now, waited):
+    if self.requests:
+      self.requests.take(1)
+    if self.tokens:
+      self.tokens.take(tokens)
+    self.in_flight += 1
+    self.calls += 1
+    self.queued_seconds += waited
+    self.max_queued_seconds = max(self.max_queued_seconds, waited)
+    return now
+
+  def release(self, started, estimated_tokens, used_tokens = None, throttled = False, delay = None):
+    with self._cond:
+      self.in_flight -= 1
+      if self.tokens and used_tokens is not None:
+        # settle the estimate against what the call really used
+        self.tokens.take(used_tokens - estimated_tokens)
+
+      if throttled and started < self.last_decrease:
+        # sent before the last slow-down took effect: part of the same overload, not a new one
+        self.throttles += 1
+      elif throttled:
+        # multiplicative decrease, and everyone holds off until the provider is ready again
+        self.throttles += 1
+        self.consecutive_throttles += 1
+        self.last_decrease = time.monotonic()
+        self.window = max(1.0, self.window / 2)
+        for bucket in self.buckets:
+          bucket.scale = max(0.05, bucket.scale / 2)
+          bucket.level = min(bucket.level, 0.0)
+        backoff = delay if delay is not None else min(30.0, self.backoff_seconds * 2 ** (self.consecutive_throttles - 1))
+        self.paused_until = max(self.paused_until, self.last_decrease + backoff)
+      else:
+        # additive increase: about one more slot per window's worth of successful calls
+        self.consecutive_throttles = 0
+        self.window = min(float(self.max_concurrency), self.window + 1 / self.window)
+        for bucket in self.buckets:
+          bucket.scale = min(1.0, bucket.scale + self.increase)
+      self._cond.notify_all()
+
+  def stats(self):
+    with self._cond:
+      return {
+        "calls": self.calls,
+        "throttles": self.throttles,
+        "queued_seconds": round(self.queued_seconds, 3),
+        "max_queued_seconds": round(self.max_queued_seconds, 3),
+        "concurrency_window": round(self.window, 2),
+        "rate_scale": round(min(b.scale for b in self.buckets), 2) if self.buckets else None,
+      }
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+def get_default_limiter():
+  # one limiter per process: the quota belongs to the API key, not to a crew
+  global _default_limiter
+  with _default_limiter_lock:
+    if _default_limiter is None:
+      _default_limiter = RateLimiter(
+        rpm = int(os.environ.get("LLM_RPM", DEFAULT_RPM)),
+        tpm = int(os.environ.get("LLM_TPM", DEFAULT_TPM)),
+        max_concurrency = int(os.environ.get("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+      )
+    return _default_limiter
+
+class RateLimitedLLM(DelegatingLLM):
+  """
+  Waits for the shared RateLimiter before every call to the wrapped LLM. Throttled calls are
+  retried here, through the limiter, up to `max_attempts` times.
+  """
+
+  limiter: Any = None
+  max_attempts: int = 5
+
+  def __init__(self, inner, limiter = None, **kwargs):
+    super().__init__(inner, limiter = limiter or get_default_limiter(), **kwargs)
+
+  def call(self, messages, **kwargs):
+    estimated = estimate_tokens(messages) + expected_completion_tokens(self.inner)
+    for attempt in range(1, self.max_attempts + 1):
+      started = self.limiter.acquire(estimated)
+      try:
+        resp = self.inner.call(messages, **kwargs)
+      except Exception as e:
+        throttled = is_throttle(e)
+        self.limiter.release(started, estimated, throttled = throttled, delay = retry_after(e))
+        if not throttled or attempt == self.max_attempts:
+          raise
+        continue
+      used = estimate_tokens(messages) + estimate_tokens(resp) if isinstance(resp, str) else None
+      self.limiter.release(started, estimated, used)
+      return resp
+
+def expected_completion_tokens(llm):
+  # the average answer of `llm` so far, or a typical one before its first call
+  usage = llm.get_token_usage_summary()
+  if usage and usage.successful_requests:
+    return usage.completion_tokens // usage.successful_requests
+  return 1000
+
+def print_limiter_stats(limiter = None):
+  stats = (limiter or get_default_limiter()).stats()
+  print(f"LLM rate limiter: {stats['calls']} calls, {stats['queued_seconds']:.1f}s queued "
+        f"(longest wait {stats['max_queued_seconds']:.1f}s), {stats['throttles']} throttled, "
+        f"concurrency window {stats['concurrency_window']}, "
+        + (f"{stats['rate_scale']:.0%} of the configured rate" if stats["rate_scale"] is not None else "no RPM/TPM limit set"))
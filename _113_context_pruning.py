@@ -0,0 +1,73 @@
+"""
+## Task:
+Give each task only the parts of its context it actually needs: a task declares, per upstream
+task, which '### Section' headings of that output it reads (e.g. the Link Collector only reads
+the researcher's "Source Links"), and everything else is left out of its prompt
+
+The tokens this saves are recorded per task and end up in the run's trace.
+"""
+
+import threading
+
+from crewai import Crew
+from crewai.utilities.formatter import DIVIDERS
+
+from _105_markdown_parsing import extract_sections
+from _112_rate_limiter import estimate_tokens
+
+# task key -> {upstream task key: section titles}; task keys survive copies and {placeholder} interpolation
+_needs = {}
+# task id -> (context tokens it would have got, context tokens it was sent), until the tracer collects them
+_savings = {}
+_lock = threading.Lock()
+
+def declare_context(task, needs):
+  """
+  `needs` maps upstream tasks (in task.context) to the section titles `task` reads from them;
+  upstream tasks that aren't mentioned are passed on whole.
+  """
+  with _lock:
+    _needs[task.key] = {upstream.key: tuple(titles) for upstream, titles in needs.items()}
+
+def prune_output(raw, titles):
+  # an output without the sections the prompt asked for is passed on whole, rather than dropped
+  if not titles:
+    return raw
+  return extract_sections(raw, titles) or raw
+
+def pruned_context(task):
+  needs = _needs.get(task.key, {})
+  full, pruned = [], []
+  for upstream in task.context:
+    if upstream.output is None:
+      continue
+    full.append(upstream.output.raw)
+    pruned.append(prune_output(upstream.output.raw, needs.get(upstream.key)))
+
+  context = DIVIDERS.join(pruned)
+  with _lock:
+    _savings[str(task.id)] = (estimate_tokens(DIVIDERS.join(full)), estimate_tokens(context))
+  return context
+
+def pop_savings(task_ids):
+  with _lock:
+    return {task_id: _savings.pop(task_id) for task_id in task_ids if task_id in _savings}
+
+class PrunedContextCrew(Crew):
+  """
+  A Crew that builds each task's context with `pruned_context`. Tasks without an explicit
+  context list (or without declared needs) get exactly what a plain Crew would give them.
+  """
+
+  def _get_context(self, task, task_outputs):
+    if not task.context or not isinstance(task.context, list):
+      return Crew._get_context(task, task_outputs)
+    return pruned_context(task)
+
+def print_context_savings(spans):
+  tasks = [s for s in spans if s["kind"] == "task" and s.get("context_tokens")]
+  if not tasks:
+    return
+  full = sum(s["context_tokens"] for s in tasks)
+  saved = sum(s["context_tokens_saved"] for s in tasks)
+  print(f"Context pruning: ~{saved} of ~{full} context tokens left out ({saved / full:.0%})")
@@ -0,0 +1,46 @@
+"""
+## Task:
+Collect the source links without an LLM call: the Link Collector's job is to copy the URLs out of
+the researcher's "Source Links" section and renumber them, which plain parsing does exactly.
+The collector agent only asks the model when no links can be parsed out of the research
+
+export LINK_EXTRACTOR=0 to send the collector's task to the model as before.
+"""
+
+from _102_llm_cache import DelegatingLLM
+from _105_markdown_parsing import extract_sections, extract_urls
+
+RESOURCES_HEADING = "### Resources Used"
+
+def research_urls(text):
+  # the links the researcher listed; if it didn't make a "Source Links" section, any link it gave
+  return extract_urls(extract_sections(text, ["Source Links"]) or text)
+
+def resources_block(texts):
+  """
+  The `### Resources Used` block for the links found in `texts`, or None if there are none.
+  """
+  urls, seen = [], set()
+  for text in texts:
+    for url in research_urls(text):
+      if url not in seen:
+        seen.add(url)
+        urls.append(url)
+  if not urls:
+    return None
+  return RESOURCES_HEADING + "\n" + "\n".join(f"{i}. {url}" for i, url in enumerate(urls, 1))
+
+class LinkExtractorLLM(DelegatingLLM):
+  """
+  The Link Collector's LLM: answers straight from the outputs of the task's context
+  (the research), and only calls the wrapped LLM if there are no links in them.
+  """
+
+  def call(self, messages, **kwargs):
+    context = getattr(kwargs.get("from_task"), "context", None)
+    upstream = [t.output.raw for t in context if t.output] if isinstance(context, list) else []
+    block = resources_block(upstream)
+    if block is None:
+      return self.inner.call(messages, **kwargs)
+    # in the agent's answer format, so crewai takes the block as the final answer as is
+    return f"Thought: I have collected the source links\nFinal Answer: {block}"
@@ -0,0 +1,232 @@
+"""
+## Task:
+Keep a run from ballooning into dozens of LLM calls: per-run and per-agent budgets for calls
+and tokens, a wall-clock deadline for the run, and a fact-check that stops repeating itself
+once its verdicts stop changing. The budget usage is reported at the end of every run
+
+Limits (0 turns one off):
+  RUN_MAX_CALLS, RUN_MAX_TOKENS, RUN_DEADLINE_SECONDS  - for the whole run
+  AGENT_MAX_CALLS, AGENT_MAX_TOKENS                    - for each agent's task
+  FACT_CHECK_MAX_PASSES                                - fact-check passes per article (default 3)
+
+AGENT_MAX_CALLS also caps the agents' crewai max_iter, at AGENT_MAX_CALLS - 1 (5 by default) in place of
+the 100 the crews are defined with: it's what actually stops an agent that keeps looping.
+"""
+
+import os
+import re
+import time
+import threading
+
+from _102_llm_cache import DelegatingLLM
+from _112_rate_limiter import estimate_tokens
+
+DEFAULT_LIMITS = {
+  "RUN_MAX_CALLS": 60,
+  "RUN_MAX_TOKENS": 500_000,
+  "RUN_DEADLINE_SECONDS": 900,
+  "AGENT_MAX_CALLS": 6,
+  "AGENT_MAX_TOKENS": 150_000,
+  "FACT_CHECK_MAX_PASSES": 3,
+}
+
+class BudgetExceeded(RuntimeError):
+  pass
+
+def env_limit(name):
+  return int(os.environ.get(name, DEFAULT_LIMITS[name]))
+
+# task id -> the RunBudget of the run it belongs to
+_budgets = {}
+_budgets_lock = threading.Lock()
+
+class RunBudget:
+  """
+  The limits of one run. `attach` puts a checked out crew under it; while the budget is active,
+  BudgetedLLM charges every model call of those tasks to it (cached answers are free).
+  """
+
+  def __init__(self, max_calls = None, max_tokens = None, deadline_seconds = None,
+               agent_max_calls = None, agent_max_tokens = None):
+    self.max_calls = env_limit("RUN_MAX_CALLS") if max_calls is None else max_calls
+    self.max_tokens = env_limit("RUN_MAX_TOKENS") if max_tokens is None else max_tokens
+    self.deadline_seconds = env_limit("RUN_DEADLINE_SECONDS") if deadline_seconds is None else deadline_seconds
+    self.agent_max_calls = env_limit("AGENT_MAX_CALLS") if agent_max_calls is None else agent_max_calls
+    self.agent_max_tokens = env_limit("AGENT_MAX_TOKENS") if agent_max_tokens is None else agent_max_tokens
+
+    self.start = None
+    self.end = None
+    self.calls = 0
+    self.tokens = 0
+    self.agents = {}      # task id -> {"role", "calls", "tokens"}
+    self.tasks = []
+    self.fact_check = []  # (passes run, how the fact check ended) of every fact-check
+    self._lock = threading.Lock()
+
+  def attach(self, crew):
+    if isinstance(crew, dict):
+      for c in crew.values():
+        self.attach(c)
+      return
+
+    if self.agent_max_calls:
+      for agent in crew.agents:
+        # crewai asks for a final answer once max_iter is reached, which takes one more call
+        agent.max_iter = max(1, self.agent_max_calls - 1)
+    with _budgets_lock:
+      for task in crew.tasks:
+        _budgets[str(task.id)] = self
+        self.tasks.append(task)
+
+  def __enter__(self):
+    self.start = time.monotonic()
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.end = time.monotonic()
+    with _budgets_lock:
+      for task in self.tasks:
+        if _budgets.get(str(task.id)) is self:
+          del _budgets[str(task.id)]
+    return False
+
+  def elapsed(self):
+    return (self.end or time.monotonic()) - (self.start or time.monotonic())
+
+  def before_call(self, task, agent):
+    """
+    Reserves a call for `task`, or raises BudgetExceeded if the run or its agent is out of budget.
+    """
+    with self._lock:
+      usage = self.agents.setdefault(str(task.id), {"role": getattr(agent, "role", task.agent.role), "calls": 0, "tokens": 0})
+      checks = [
+        (self.deadline_seconds, self.elapsed(), f"the run's {self.deadline_seconds}s deadline passed"),
+        (self.max_calls, self.calls, f"the run used its {self.max_calls} LLM calls"),
+        (self.max_tokens, self.tokens, f"the run used its {self.max_tokens} tokens"),
+        (self.agent_max_calls, usage["calls"], f"{usage['role']} used its {self.agent_max_calls} LLM calls"),
+        (self.agent_max_tokens, usage["tokens"], f"{usage['role']} used its {self.agent_max_tokens} tokens"),
+      ]
+      for limit, used, problem in checks:
+        if limit and used >= limit:
+          raise BudgetExceeded(f"Stopped before another '{task.name}' call: {problem}")
+      self.calls += 1
+      usage["calls"] += 1
+
+  def after_call(self, task, tokens):
+    with self._lock:
+      self.tokens += tokens
+      self.agents[str(task.id)]["tokens"] += tokens
+
+  def record_fact_check(self, passes, outcome):
+    with self._lock:
+      self.fact_check.append((passes, outcome))
+
+  def report(self):
+    by_role = {}
+    with self._lock:
+      for usage in self.agents.values():
+        role = by_role.setdefault(usage["role"], {"calls": 0, "tokens": 0, "tasks": 0})
+        role["tasks"] += 1
+        role["calls"] += usage["calls"]
+        role["tokens"] += usage["tokens"]
+    return {
+      "calls": self.calls, "max_calls": self.max_calls,
+      "tokens": self.tokens, "max_tokens": self.max_tokens,
+      "seconds": round(self.elapsed(), 1), "deadline_seconds": self.deadline_seconds,
+      "agents": by_role, "fact_check": self.fact_check,
+    }
+
+  def print_report(self):
+    r = self.report()
+    limit = lambda value: value or "no limit"
+    print(f"Budget: {r['calls']}/{limit(r['max_calls'])} LLM calls, ~{r['tokens']}/{limit(r['max_tokens'])} tokens, "
+          f"{r['seconds']}s/{limit(r['deadline_seconds'])}s")
+    busiest = sorted(r["agents"].items(), key = lambda kv: -kv[1]["calls"])[:3]
+    if busiest:
+      print("  most calls: " + ", ".join(f"{role} {u['calls']} in {u['tasks']} task(s)" for role, u in busiest)
+            + (f" (limit {self.agent_max_calls} per task)" if self.agent_max_calls else ""))
+    for passes, outcome in r["fact_check"]:
+      print(f"  fact check: {outcome} after {passes} pass(es)")
+
+def budget_for(task):
+  with _budgets_lock:
+    return _budgets.get(str(getattr(task, "id", "")))
+
+class BudgetedLLM(DelegatingLLM):
+  """
+  Charges every call to the budget of the run its task belongs to, and refuses calls past it.
+  Calls from tasks outside any budgeted run go through untouched.
+  """
+
+  def call(self, messages, **kwargs):
+    task = kwargs.get("from_task")
+    budget = budget_for(task)
+    if budget is None:
+      return self.inner.call(messages, **kwargs)
+    budget.before_call(task, kwargs.get("from_agent"))
+    resp = self.inner.call(messages, **kwargs)
+    budget.after_call(task, estimate_tokens(messages) + estimate_tokens(resp))
+    return resp
+
+# fact-check passes
+
+ENTRY_FIELD = re.compile(r"^\W*(checked statement|verdict|correct information|verified source)\W*:\s*(.*)$", re.IGNORECASE)
+NO_PREVIOUS_REPORT = "(none - this is the first pass)"
+
+def verdicts(report):
+  found, statement = {}, None
+  for line in report.splitlines():
+    match = ENTRY_FIELD.match(line)
+    if not match:
+      continue
+    # compared loosely: "**Verdict:** Accurate." and "Verdict: accurate" are the same verdict
+    field, value = match.group(1).lower(), re.sub(r"\W+", " ", match.group(2)).strip().lower()
+    if field == "checked statement":
+      statement = value
+    elif field == "verdict" and statement is not None:
+      found[statement] = value
+  return found
+
+def run_fact_check(task, crew_settings, inputs = None, max_passes = None):
+  """
+  Runs the fact-check `task` (for run_task_graph's `run_with`) one pass at a time, each pass its own
+  kickoff, shown the report of the pass before as {previous_report}. It stops at the first pass that
+  finds nothing to correct or has the same verdicts as the pass before (another pass wouldn't change
+  anything), at a pass without readable verdicts, or after `max_passes` (FACT_CHECK_MAX_PASSES).
+  The last pass is the task's output; the task's callback only sees that one.
+  """
+  from _104_task_graph import run_single_task, replay_output
+
+  max_passes = max(1, env_limit("FACT_CHECK_MAX_PASSES") if max_passes is None else max_passes)
+  callback, task.callback = task.callback, None
+  report, found, outcome = None, None, "verdicts still changing"
+  try:
+    for number in range(1, max_passes + 1):
+      try:
+        output = run_single_task(task, crew_settings, dict(inputs or {}, previous_report = report or NO_PREVIOUS_REPORT))
+      except BudgetExceeded:
+        if report is None:
+          raise
+        # out of calls for another pass: the last full pass stands
+        replay_output(task, report)
+        outcome, number = "out of budget", number - 1
+        break
+      previous, report, found = found, output.raw, verdicts(output.raw)
+      if not found:
+        outcome = "no verdicts to compare"
+        break
+      if all(verdict.startswith("accurate") for verdict in found.values()):
+        outcome = "nothing to correct"
+        break
+      if found == previous:
+        outcome = "verdicts settled"
+        break
+  finally:
+    task.callback = callback
+
+  budget = budget_for(task)
+  if budget:
+    budget.record_fact_check(number, outcome)
+  if callback:
+    callback(task.output)
+  return task.output
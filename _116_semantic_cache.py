@@ -0,0 +1,206 @@
+"""
+## Task:
+Reuse the planning and research of an earlier run when a new theme/topic means the same thing
+("AI in healthcare" and "AI for healthcare"): past themes and topics are indexed locally with a
+hashed TF-IDF vectorizer, and a result is reused when its cosine similarity passes a threshold,
+without any LLM call
+
+SEMANTIC_CACHE_THRESHOLD (default 0.85) sets how similar a theme/topic has to be;
+SEMANTIC_CACHE_BYPASS=1 (or fresh=True) always generates fresh results, which then replace the old ones.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import zlib
+import threading
+
+try:
+  import pysqlite3 as sqlite3
+except ImportError:
+  import sqlite3
+
+from collections import Counter
+from _102_llm_cache import env_flag
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bphc_agentic_ai", "semantic_cache.sqlite3")
+DEFAULT_THRESHOLD = 0.85
+
+HASH_BUCKETS = 2 ** 18
+WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+  a an and or the of for in on to with about into by from at as vs versus its it their our your my
+  is are be how what why which who when where this that these those
+""".split())
+
+def stem(word):
+  # just enough to make "trends" / "trend" and "applications" / "application" the same word
+  for suffix, replacement in (("ies", "y"), ("ing", ""), ("es", ""), ("s", "")):
+    if len(word) > len(suffix) + 3 and word.endswith(suffix) and not word.endswith("ss"):
+      return word[:-len(suffix)] + replacement
+  return word
+
+def features(text):
+  """
+  Hashed term counts of `text`: its words (lower-cased, stemmed, without stopwords) and, at a
+  lower weight, their character trigrams and pairs of neighbouring words run together, so
+  "healthcare" still matches "health care".
+  """
+  words = [stem(w) for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+  counts = Counter()
+  for word in words:
+    counts[zlib.crc32(b"w:" + word.encode()) % HASH_BUCKETS] += 1.0
+    padded = f" {word} "
+    for i in range(len(padded) - 2):
+      counts[zlib.crc32(b"c:" + padded[i:i + 3].encode()) % HASH_BUCKETS] += 0.25
+  for first, second in zip(words, words[1:]):
+    # compounds written apart ("health care") also count as the word written together
+    counts[zlib.crc32(b"w:" + (first + second).encode()) % HASH_BUCKETS] += 0.5
+  return dict(counts)
+
+def tfidf(counts, idf):
+  vector = {term: (1 + math.log(count)) * idf(term) for term, count in counts.items() if count > 0}
+  norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+  return {term: v / norm for term, v in vector.items()}
+
+def cosine(a, b):
+  if len(a) > len(b):
+    a, b = b, a
+  return sum(v * b.get(term, 0.0) for term, v in a.items())
+
+class Match:
+  def __init__(self, score, text, result):
+    self.score = score
+    self.text = text
+    self.result = result
+
+class SemanticCache:
+  """
+  Results of past runs (a dict of task name -> raw output), indexed by the theme/topic they were made for.
+  `kind` keeps the pipelines' results apart: a summary plan is never offered for an article.
+  """
+
+  def __init__(self, path = None, threshold = None, max_entries = 5000, ttl_seconds = 7 * 24 * 3600):
+    self.path = path or os.environ.get("SEMANTIC_CACHE_PATH") or DEFAULT_INDEX_PATH
+    self.threshold = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", DEFAULT_THRESHOLD)) if threshold is None else threshold
+    self.max_entries = max_entries
+    self.ttl_seconds = ttl_seconds
+
+    self.hits = 0
+    self.misses = 0
+
+    if self.path != ":memory:":
+      os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute('''
+      CREATE TABLE IF NOT EXISTS results (
+        kind TEXT,
+        text TEXT,
+        features TEXT,
+        result TEXT,
+        created_at REAL,
+        PRIMARY KEY (kind, text)
+      )''')
+    self._conn.commit()
+
+  def _entries(self, kind):
+    now = time.time()
+    rows = self._conn.execute("SELECT text, features, result, created_at FROM results WHERE kind = ?", (kind,)).fetchall()
+    return [(text, {int(t): c for t, c in json.loads(feats).items()}, result)
+            for text, feats, result, created_at in rows
+            if not self.ttl_seconds or now - created_at <= self.ttl_seconds]
+
+  def lookup(self, kind, text):
+    """
+    The stored result whose theme/topic is most similar to `text`, if it's at least `threshold` similar; else None.
+    """
+    query = features(text)
+    with self._lock:
+      entries = self._entries(kind)
+    if not entries or not query:
+      self.misses += 1
+      return None
+
+    # document frequencies over the stored themes/topics (and the query), so common words count for less
+    df = Counter(term for _, counts, _ in entries for term in counts)
+    df.update(query.keys())
+    n = len(entries) + 1
+    idf = lambda term: math.log((1 + n) / (1 + df[term])) + 1
+
+    vector = tfidf(query, idf)
+    score, best = max(((cosine(vector, tfidf(counts, idf)), (stored, result)) for stored, counts, result in entries),
+                      key = lambda scored: scored[0])
+    if score < self.threshold:
+      self.misses += 1
+      return None
+    self.hits += 1
+    return Match(round(score, 3), best[0], json.loads(best[1]))
+
+  def store(self, kind, text, result):
+    now = time.time()
+    with self._lock:
+      self._conn.execute(
+        "INSERT OR REPLACE INTO results (kind, text, features, result, created_at) VALUES (?, ?, ?, ?, ?)",
+        (kind, text, json.dumps(features(text)), json.dumps(result), now)
+      )
+      if self.ttl_seconds:
+        self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+      self._conn.execute(
+        "DELETE FROM results WHERE rowid NOT IN (SELECT rowid FROM results ORDER BY created_at DESC LIMIT ?)",
+        (self.max_entries,)
+      )
+      self._conn.commit()
+
+  def clear(self):
+    with self._lock:
+      self._conn.execute("DELETE FROM results")
+      self._conn.commit()
+
+  def stats(self):
+    with self._lock:
+      kinds = dict(self._conn.execute("SELECT kind, COUNT(*) FROM results GROUP BY kind").fetchall())
+    return {"path": self.path, "threshold": self.threshold, "entries": kinds, "hits": self.hits, "misses": self.misses}
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+def get_default_semantic_cache():
+  global _default_index
+  with _default_index_lock:
+    if _default_index is None:
+      _default_index = SemanticCache()
+    return _default_index
+
+def reuse(kind, text, what, fresh = None, accept = None, index = None):
+  """
+  Looks `text` up unless a fresh result was asked for, and says what is being reused and how similar it was.
+  `accept` can turn down a match whose result doesn't fit this run.
+  """
+  if fresh is None:
+    fresh = env_flag("SEMANTIC_CACHE_BYPASS")
+  if fresh:
+    return None
+  match = (index or get_default_semantic_cache()).lookup(kind, text)
+  if match and accept and not accept(match.result):
+    return None
+  if match:
+    print(f"\nSemantic cache: reusing the {what} of '{match.text}' for '{text}' (similarity {match.score:.2f})")
+  return match
+
+def print_semantic_cache_stats(index = None):
+  stats = (index or get_default_semantic_cache()).stats()
+  print(f"Semantic cache: {stats['hits']} reused, {stats['misses']} generated fresh "
+        f"(threshold {stats['threshold']:.2f}, {sum(stats['entries'].values())} themes/topics indexed)")
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1 and sys.argv[1] == "clear":
+    get_default_semantic_cache().clear()
+    print("Semantic cache cleared.")
+  else:
+    print(json.dumps(get_default_semantic_cache().stats(), indent=2))
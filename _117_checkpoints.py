@@ -0,0 +1,228 @@
+"""
+## Task:
+Checkpoint every task's output under a run ID, so a run that died halfway (a crash, a Gemini
+error in the final task) can be resumed: the tasks that finished are skipped and their saved
+outputs are given to the remaining tasks as context, so retrying the last task costs one call
+
+Resume with gen_summary(resume=<run id>) / gen_article(resume=<run id>), or "last" for the latest
+failed run of that pipeline (a new run if there is none); export RESUME_RUN=<run id|last> to do
+the same from the menu. RESUME_RUN is only read when no theme/topic is given, and a run is never
+resumed for another theme/topic than its own. A run that was killed outright stays "running", so
+"last" leaves it alone (it may be another worker's); resume it by its ID.
+
+Usage:
+  python _117_checkpoints.py              # the latest runs, their status and saved tasks
+  python _117_checkpoints.py clear
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+
+try:
+  import pysqlite3 as sqlite3
+except ImportError:
+  import sqlite3
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bphc_agentic_ai", "checkpoints.sqlite3")
+
+class CheckpointStore:
+  """
+  Runs (pipeline, label, inputs, status) and the outputs of their finished tasks.
+  Runs older than `ttl_seconds` are dropped along with their outputs.
+  """
+
+  def __init__(self, path = None, ttl_seconds = 7 * 24 * 3600):
+    self.path = path or os.environ.get("CHECKPOINT_PATH") or DEFAULT_CHECKPOINT_PATH
+    self.ttl_seconds = ttl_seconds
+
+    if self.path != ":memory:":
+      os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute('''
+      CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        pipeline TEXT,
+        label TEXT,
+        inputs TEXT,
+        status TEXT,
+        created_at REAL,
+        updated_at REAL
+      )''')
+    self._conn.execute('''
+      CREATE TABLE IF NOT EXISTS outputs (
+        run_id TEXT,
+        task TEXT,
+        raw TEXT,
+        created_at REAL,
+        PRIMARY KEY (run_id, task)
+      )''')
+    self._conn.commit()
+
+  def find_run(self, pipeline, run_id, inputs = None):
+    """
+    The run `run_id` of `pipeline` as a dict, or None. For "last", its latest failed run -
+    started with `inputs`, if given.
+    """
+    with self._lock:
+      if run_id == "last":
+        rows = self._conn.execute(
+          "SELECT run_id, label, inputs, status FROM runs WHERE pipeline = ? AND status = 'failed' ORDER BY updated_at DESC",
+          (pipeline,)).fetchall()
+      else:
+        rows = self._conn.execute("SELECT run_id, label, inputs, status FROM runs WHERE pipeline = ? AND run_id = ?",
+                                  (pipeline, run_id)).fetchall()
+    runs = [{"run_id": row[0], "label": row[1], "inputs": json.loads(row[2]), "status": row[3]} for row in rows]
+    if run_id == "last" and inputs:
+      runs = [run for run in runs if not differing_inputs(run, inputs)]
+    return runs[0] if runs else None
+
+  def save_run(self, run_id, pipeline, label, inputs, status):
+    now = time.time()
+    with self._lock:
+      self._conn.execute('''
+        INSERT INTO runs (run_id, pipeline, label, inputs, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(run_id) DO UPDATE SET label = excluded.label, inputs = excluded.inputs,
+          status = excluded.status, updated_at = excluded.updated_at''',
+        (run_id, pipeline, label, json.dumps(inputs, default=str), status, now, now))
+      if self.ttl_seconds:
+        self._conn.execute("DELETE FROM outputs WHERE run_id IN (SELECT run_id FROM runs WHERE updated_at < ?)", (now - self.ttl_seconds,))
+        self._conn.execute("DELETE FROM runs WHERE updated_at < ?", (now - self.ttl_seconds,))
+      self._conn.commit()
+
+  def set_status(self, run_id, status):
+    with self._lock:
+      self._conn.execute("UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?", (status, time.time(), run_id))
+      self._conn.commit()
+
+  def save_output(self, run_id, task, raw):
+    with self._lock:
+      self._conn.execute("INSERT OR REPLACE INTO outputs (run_id, task, raw, created_at) VALUES (?, ?, ?, ?)",
+                         (run_id, task, raw, time.time()))
+      self._conn.commit()
+
+  def outputs(self, run_id):
+    with self._lock:
+      return dict(self._conn.execute("SELECT task, raw FROM outputs WHERE run_id = ?", (run_id,)).fetchall())
+
+  def list_runs(self, limit = 10):
+    with self._lock:
+      return self._conn.execute('''
+        SELECT runs.run_id, pipeline, label, status, updated_at, COUNT(outputs.task) FROM runs
+        LEFT JOIN outputs ON outputs.run_id = runs.run_id
+        GROUP BY runs.run_id ORDER BY updated_at DESC LIMIT ?''', (limit,)).fetchall()
+
+  def clear(self):
+    with self._lock:
+      self._conn.execute("DELETE FROM outputs")
+      self._conn.execute("DELETE FROM runs")
+      self._conn.commit()
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_default_checkpoints():
+  global _default_store
+  with _default_store_lock:
+    if _default_store is None:
+      _default_store = CheckpointStore()
+    return _default_store
+
+def differing_inputs(run, given):
+  return sorted(name for name, value in given.items() if run["inputs"].get(name) != value)
+
+class RunCheckpoint:
+  """
+  The checkpoints of one run of `pipeline`; with `resume` (a run ID, or "last") it continues that run,
+  and `inputs` are the inputs it was started with. `given` are the inputs the caller asked for (None
+  where it left them out): a run started with others isn't resumed. `attach` saves the output of every
+  task of a checked out crew as it finishes - attach it after the tracer, whose task callbacks it keeps.
+  """
+
+  def __init__(self, pipeline, resume = None, store = None, given = None):
+    self.pipeline = pipeline
+    self.store = store or get_default_checkpoints()
+    given = {name: value for name, value in (given or {}).items() if value is not None}
+    if resume is None and not given:
+      # a leftover RESUME_RUN must not turn a run for one input into another input's run
+      resume = os.environ.get("RESUME_RUN") or None
+
+    run = self.store.find_run(pipeline, resume, given) if resume else None
+    if resume and resume != "last" and run is None:
+      raise ValueError(f"There is no {pipeline} run '{resume}' to resume")
+    differing = differing_inputs(run, given) if run else []
+    if differing:
+      raise ValueError(f"The {pipeline} run '{run['run_id']}' was started with another {' and '.join(differing)} "
+                       f"({', '.join(repr(run['inputs'].get(name)) for name in differing)}); it can't be resumed for this one")
+    self.resumed = run is not None
+    self.run_id = run["run_id"] if run else uuid.uuid4().hex[:12]
+    self.label = run["label"] if run else ""
+    self.inputs = run["inputs"] if run else {}
+    self.outputs = self.store.outputs(self.run_id) if run else {}
+    self.names = {}     # task id -> the task's name in this run
+    self._lock = threading.Lock()
+
+  def begin(self, label, inputs):
+    self.label = label
+    self.inputs = inputs
+    self.store.save_run(self.run_id, self.pipeline, label, inputs, "running")
+    if self.resumed:
+      print(f"\nResuming run {self.run_id}: {len(self.outputs)} finished task(s) are reused")
+
+  def attach(self, crew, name = None):
+    if isinstance(crew, dict):
+      for c in crew.values():
+        self.attach(c, name)
+      return
+    for task in crew.tasks:
+      self.names[str(task.id)] = f"{name}/{task.name}" if name else task.name
+      task.callback = self._task_callback(task, task.callback)
+
+  def _task_callback(self, task, previous):
+    def on_task(output):
+      self.save(task, output.raw)
+      if previous:
+        previous(output)
+    return on_task
+
+  def saved(self, task):
+    return self.outputs.get(self.names.get(str(task.id)))
+
+  def replay_for(self, tasks):
+    # id(task) -> saved output, for run_task_graph
+    return {id(task): self.saved(task) for task in tasks if self.saved(task) is not None}
+
+  def save(self, task, raw):
+    name = self.names.get(str(task.id))
+    if name is None or not raw or not raw.strip():
+      return
+    with self._lock:
+      if self.outputs.get(name) == raw:
+        return
+      self.outputs[name] = raw
+    self.store.save_output(self.run_id, name, raw)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.store.set_status(self.run_id, "failed" if exc_type else "done")
+    if exc_type:
+      print(f"\nRun {self.run_id} stopped after {len(self.outputs)} finished task(s); "
+            f"resume it with resume='{self.run_id}' (or RESUME_RUN={self.run_id})")
+    return False
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1 and sys.argv[1] == "clear":
+    get_default_checkpoints().clear()
+    print("Checkpoints cleared.")
+  else:
+    for run_id, pipeline, label, status, updated_at, saved in get_default_checkpoints().list_runs():
+      print(f"{run_id}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(updated_at))}  {pipeline:<8} {status:<8} "
+            f"{saved:>2} task(s) saved  {label}")
@@ -0,0 +1,383 @@
+"""
+## Task:
+Serve the Article Title Generator and the Article Generator over HTTP from one warm process:
+jobs go into an in-process queue worked off by a pool of worker threads, and clients poll a
+job's status or follow its progress (tasks starting/finishing, the answer as it's written)
+as server-sent events
+
+Usage:
+  python _118_http_service.py --port 8000 --workers 4
+
+  POST /jobs                 {"mode": "summary", "theme": "...", "number_of_topics": 5}
+                             {"mode": "article", "topic": "..."}
+                             (optional: "fresh": true, "resume": "<run id>", "from_archive": true)
+  GET  /jobs                 all jobs
+  GET  /jobs/<id>            one job's status
+  GET  /jobs/<id>/result     the finished markdown
+  GET  /jobs/<id>/events     progress as server-sent events (text/event-stream)
+  GET  /archive?q=...        search the archive of earlier outputs (optional: &mode=article&limit=10)
+  GET  /archive/<id>         one archived output
+  GET  /health
+
+SERVICE_WORKERS, SERVICE_QUEUE_SIZE and SERVICE_OUTPUT_DIR set the defaults of the flags below.
+A finished job (and the history of its events) is forgotten SERVICE_JOB_TTL seconds (default 3600)
+after it finished, or sooner once there are more than 500 jobs.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import argparse
+import threading
+import urllib.parse
+
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODES = ("summary", "article")
+FINISHED = ("done", "failed", "empty")
+DEFAULT_JOB_TTL = 3600
+
+class Job:
+  """
+  One request for a summary or an article, and everything that happened to it so far.
+  """
+
+  def __init__(self, mode, text, options):
+    self.id = uuid.uuid4().hex[:12]
+    self.mode = mode
+    self.text = text
+    self.options = options
+    self.status = "queued"
+    self.created_at = time.time()
+    self.started_at = None
+    self.finished_at = None
+    self.output_file = None
+    self.error = None
+    self.events = []
+    self._cond = threading.Condition()
+
+  def emit(self, event):
+    # called from the crews' threads and the event bus; SSE readers wait on the condition
+    with self._cond:
+      self.events.append(dict(event, time = round(time.time(), 3)))
+      self._cond.notify_all()
+
+  def set_status(self, status, **fields):
+    with self._cond:
+      self.status = status
+      for name, value in fields.items():
+        setattr(self, name, value)
+    self.emit({"event": "status", "status": status})
+
+  def events_since(self, index, timeout):
+    """
+    The events after the first `index` ones, waiting up to `timeout` seconds for new ones;
+    and whether the job is finished (so no more are coming).
+    """
+    with self._cond:
+      if index >= len(self.events) and self.status not in FINISHED:
+        self._cond.wait(timeout)
+      return self.events[index:], self.status in FINISHED
+
+  def to_dict(self):
+    seconds = lambda start, end: round((end or time.time()) - start, 3) if start else None
+    return {
+      "id": self.id, "mode": self.mode, "input": self.text, "options": self.options, "status": self.status,
+      "queued_seconds": seconds(self.created_at, self.started_at), "run_seconds": seconds(self.started_at, self.finished_at),
+      "output_file": self.output_file, "error": self.error, "events": len(self.events),
+    }
+
+class JobQueue:
+  """
+  A bounded queue of jobs and the worker threads that run them, `workers` at a time.
+  The crews come from the shared CrewSession, so concurrent jobs each check out their own.
+  """
+
+  def __init__(self, workers = 2, max_queued = 100, out_dir = None, max_jobs = 500, job_ttl = None):
+    self.workers = max(1, workers)
+    self.out_dir = out_dir
+    self.max_jobs = max_jobs
+    # every job keeps each piece of its streamed answer, so finished ones don't stay around for long
+    self.job_ttl = float(os.environ.get("SERVICE_JOB_TTL", DEFAULT_JOB_TTL)) if job_ttl is None else job_ttl
+    self.jobs = {}
+    self._queue = queue.Queue(maxsize = max_queued)
+    self._lock = threading.Lock()
+    self._threads = []
+
+  def start(self):
+    os.makedirs(self.out_dir, exist_ok=True)
+    for n in range(self.workers):
+      thread = threading.Thread(target = self._work, name = f"job-worker-{n + 1}", daemon = True)
+      thread.start()
+      self._threads.append(thread)
+
+  def stop(self):
+    for _ in self._threads:
+      self._queue.put(None)
+    for thread in self._threads:
+      thread.join(timeout = 5)
+
+  def submit(self, mode, text, options):
+    """
+    Queues a job; raises queue.Full if there are already `max_queued` jobs waiting.
+    """
+    job = Job(mode, text, options)
+    job.emit({"event": "status", "status": "queued"})
+    with self._lock:
+      self._forget_old_jobs()
+      self.jobs[job.id] = job
+    try:
+      self._queue.put_nowait(job)
+    except queue.Full:
+      with self._lock:
+        del self.jobs[job.id]
+      raise
+    return job
+
+  def _forget_old_jobs(self):
+    finished = sorted((j for j in self.jobs.values() if j.status in FINISHED), key = lambda j: j.created_at)
+    expired = time.time() - self.job_ttl
+    for job in [j for j in finished if (j.finished_at or j.created_at) < expired]:
+      del self.jobs[job.id]
+      finished.remove(job)
+    for job in finished[:max(0, len(self.jobs) - self.max_jobs + 1)]:
+      del self.jobs[job.id]
+
+  def get(self, job_id):
+    with self._lock:
+      self._forget_old_jobs()
+      return self.jobs.get(job_id)
+
+  def list(self):
+    with self._lock:
+      self._forget_old_jobs()
+      return sorted(self.jobs.values(), key = lambda j: j.created_at)
+
+  def stats(self):
+    jobs = self.list()
+    return {"workers": self.workers, "queued": sum(j.status == "queued" for j in jobs),
+            "running": sum(j.status == "running" for j in jobs), "jobs": len(jobs)}
+
+  def _work(self):
+    while True:
+      job = self._queue.get()
+      if job is None:
+        return
+      run_job(job, self.out_dir)
+
+def run_job(job, out_dir):
+  from _103_batch_runner import slugify
+
+  job.set_status("running", started_at = time.time())
+  output_file = job.options.get("output_file") or os.path.join(out_dir, f"{job.id}_{slugify(job.text)}.md")
+  try:
+    if job.mode == "summary":
+      from _002_article_summarizer import gen_summary
+      written = gen_summary(job.text, job.options.get("number_of_topics"), output_file = output_file, stream = True,
+                            fresh = job.options.get("fresh"), resume = job.options.get("resume"), progress = job.emit,
+                            from_archive = job.options.get("from_archive"), echo = False)
+    else:
+      from _003_article_generator import gen_article
+      written = gen_article(job.text, output_file = output_file, stream = True,
+                            fresh = job.options.get("fresh"), resume = job.options.get("resume"), progress = job.emit,
+                            from_archive = job.options.get("from_archive"), echo = False)
+    job.set_status("done" if written else "empty", output_file = written, finished_at = time.time())
+  except Exception as e:
+    job.set_status("failed", error = f"{type(e).__name__}: {e}", finished_at = time.time())
+
+def parse_job(body):
+  """
+  (mode, text, options) from a POST /jobs body, or raises ValueError saying what's wrong with it.
+  """
+  try:
+    request = json.loads(body or b"{}")
+  except json.JSONDecodeError as e:
+    raise ValueError(f"the body is not valid JSON: {e}")
+  if not isinstance(request, dict):
+    raise ValueError("the body must be a JSON object")
+
+  mode = request.get("mode", "summary")
+  if mode not in MODES:
+    raise ValueError(f"mode must be one of {', '.join(MODES)}")
+  text = str(request.get("theme") or request.get("topic") or request.get("text") or "").strip()
+  if not text:
+    raise ValueError("give a 'theme' (summary) or a 'topic' (article)")
+
+  # left out, "fresh" and "from_archive" fall back to SEMANTIC_CACHE_BYPASS / ARCHIVE_REUSE
+  options = {"fresh": True if request.get("fresh") else None, "resume": request.get("resume") or None,
+             "from_archive": True if request.get("from_archive") else None}
+  if mode == "summary" and request.get("number_of_topics") is not None:
+    try:
+      options["number_of_topics"] = int(request["number_of_topics"])
+    except (TypeError, ValueError):
+      raise ValueError("number_of_topics must be a whole number")
+  return mode, text, options
+
+class ServiceHandler(BaseHTTPRequestHandler):
+  jobs = None                 # the JobQueue, set by make_server
+  protocol_version = "HTTP/1.1"
+  heartbeat_seconds = 15
+
+  def do_GET(self):
+    parts = [p for p in self.path.split("?")[0].split("/") if p]
+    if parts == ["health"]:
+      return self.send_json(dict(self.jobs.stats(), status = "ok"))
+    if parts == ["jobs"]:
+      return self.send_json([job.to_dict() for job in self.jobs.list()])
+    if parts and parts[0] == "archive" and len(parts) <= 2:
+      return self.send_archive(parts[1] if len(parts) == 2 else None)
+    if len(parts) in (2, 3) and parts[0] == "jobs":
+      job = self.jobs.get(parts[1])
+      if job is None:
+        return self.send_error_json(HTTPStatus.NOT_FOUND, f"no job '{parts[1]}'")
+      if len(parts) == 2:
+        return self.send_json(job.to_dict())
+      if parts[2] == "events":
+        return self.send_events(job)
+      if parts[2] == "result":
+        return self.send_result(job)
+    self.send_error_json(HTTPStatus.NOT_FOUND, f"nothing at {self.path}")
+
+  def do_POST(self):
+    if self.path.split("?")[0].rstrip("/") != "/jobs":
+      return self.send_error_json(HTTPStatus.NOT_FOUND, f"nothing at {self.path}")
+    body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+    try:
+      mode, text, options = parse_job(body)
+    except ValueError as e:
+      return self.send_error_json(HTTPStatus.BAD_REQUEST, str(e))
+    try:
+      job = self.jobs.submit(mode, text, options)
+    except queue.Full:
+      return self.send_error_json(HTTPStatus.SERVICE_UNAVAILABLE, "too many jobs are waiting; try again later")
+    self.send_json(dict(job.to_dict(), status_url = f"/jobs/{job.id}", events_url = f"/jobs/{job.id}/events"),
+                   HTTPStatus.ACCEPTED)
+
+  def send_json(self, payload, status = HTTPStatus.OK):
+    body = json.dumps(payload, indent=2).encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def send_error_json(self, status, message):
+    self.send_json({"error": message}, status)
+
+  def send_result(self, job):
+    if job.status != "done":
+      return self.send_error_json(HTTPStatus.CONFLICT, f"job {job.id} is {job.status}")
+    try:
+      with open(job.output_file, "rb") as f:
+        body = f.read()
+    except TypeError:
+      return self.send_error_json(HTTPStatus.NOT_FOUND, f"job {job.id} wrote no output file")
+    except FileNotFoundError:
+      # the .md file was moved or deleted since the job wrote it
+      return self.send_error_json(HTTPStatus.GONE, f"the output of job {job.id} ({job.output_file}) no longer exists")
+    self.send_response(HTTPStatus.OK)
+    self.send_header("Content-Type", "text/markdown; charset=utf-8")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def send_archive(self, output_id):
+    from _121_archive import get_default_archive
+
+    archive = get_default_archive()
+    if output_id is not None:
+      found = archive.get(int(output_id)) if output_id.isdigit() else None
+      if found is None:
+        return self.send_error_json(HTTPStatus.NOT_FOUND, f"nothing archived as '{output_id}'")
+      return self.send_json(found)
+
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+    text = query.get("q", [""])[0]
+    mode = query.get("mode", [None])[0]
+    if not text.strip() or mode not in (None,) + MODES:
+      return self.send_error_json(HTTPStatus.BAD_REQUEST, "give a search as ?q=... (and optionally &mode=summary|article)")
+    try:
+      limit = int(query.get("limit", ["10"])[0])
+    except ValueError:
+      return self.send_error_json(HTTPStatus.BAD_REQUEST, "limit must be a whole number")
+    # the bodies can be long; a search only lists the matches
+    results = [{k: v for k, v in row.items() if k != "body"} for row in archive.search(text, mode, limit)]
+    self.send_json(results)
+
+  def send_events(self, job):
+    # a reconnecting client sends the id of the last event it got, and carries on from there
+    try:
+      index = max(-1, int(self.headers.get("Last-Event-ID", -1))) + 1
+    except ValueError:
+      index = 0
+    self.send_response(HTTPStatus.OK)
+    self.send_header("Content-Type", "text/event-stream")
+    self.send_header("Cache-Control", "no-cache")
+    self.send_header("Connection", "close")
+    self.end_headers()
+    self.close_connection = True
+    try:
+      while True:
+        events, finished = job.events_since(index, self.heartbeat_seconds)
+        for event in events:
+          self.wfile.write(f"id: {index}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+          index += 1
+        if finished and not events:
+          self.wfile.write(f"event: end\ndata: {json.dumps(job.to_dict())}\n\n".encode("utf-8"))
+          self.wfile.flush()
+          return
+        if not events:
+          self.wfile.write(b": keep-alive\n\n")
+        self.wfile.flush()
+    except (BrokenPipeError, ConnectionResetError):
+      pass   # the client went away; the job carries on
+
+  def log_request(self, code = "-", size = "-"):
+    # the crews already print plenty; only failed requests are worth a line
+    if str(getattr(code, "value", code)).startswith(("4", "5")):
+      super().log_request(code, size)
+
+def make_server(host, port, jobs):
+  handler = type("BoundServiceHandler", (ServiceHandler,), {"jobs": jobs})
+  server = ThreadingHTTPServer((host, port), handler)
+  server.daemon_threads = True
+  return server
+
+def default_out_dir():
+  from _101_download_to_device import find_downloads_folder
+  return os.path.join(find_downloads_folder(), "service_output")
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description="Serve the article crews over HTTP.")
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=8000)
+  parser.add_argument("--workers", type=int, default=int(os.environ.get("SERVICE_WORKERS", 2)),
+                      help="how many jobs run at the same time")
+  parser.add_argument("--queue-size", type=int, default=int(os.environ.get("SERVICE_QUEUE_SIZE", 100)),
+                      help="how many jobs may wait before new ones are turned away")
+  parser.add_argument("--out", default=os.environ.get("SERVICE_OUTPUT_DIR"), help="folder for the finished .md files")
+  args = parser.parse_args(argv)
+
+  # build the LLM up front, so a missing API key stops the service now instead of failing every job
+  from _108_crew_session import get_session
+  get_session().llm
+
+  jobs = JobQueue(args.workers, args.queue_size, args.out or default_out_dir())
+  jobs.start()
+  server = make_server(args.host, args.port, jobs)
+  print(f"\nServing on http://{args.host}:{server.server_port} with {jobs.workers} worker(s); results go to {jobs.out_dir}")
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    print("\nShutting down...")
+  finally:
+    server.server_close()
+    jobs.stop()
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
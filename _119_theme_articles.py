@@ -0,0 +1,109 @@
+"""
+## Task:
+Go from a theme straight to an article for every topic of it: the Article Title Generator plans
+and researches the topics, then the Article Generator writes all their articles side by side
+(a few at a time), starting from the research the summary already did instead of researching again
+
+Usage:
+  python _119_theme_articles.py "AI in healthcare" --topics 6 --concurrency 4 --out ./healthcare
+
+THEME_ARTICLES_CONCURRENCY sets the default of --concurrency.
+"""
+
+import os
+import sys
+import time
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 4
+
+def seed_research(result):
+  """
+  What gen_article gets as its research for a topic of the summary: the topic's research, or,
+  if that's gone, its condensed points and links in the researcher's format.
+  """
+  if result["research"].strip():
+    return result["research"]
+  from _105_markdown_parsing import extract_urls
+  from _120_knowledge_store import research_text
+  return research_text(result["condensed"], extract_urls(result["links"]))
+
+def write_article(result, out_dir, session = None, fresh = None, progress = None):
+  from _003_article_generator import gen_article
+  from _103_batch_runner import slugify
+
+  output_file = os.path.join(out_dir, f"{result['number']:02d}_{slugify(result['topic'])}.md")
+  entry = {"index": result["number"], "mode": "article", "input": result["topic"], "output_file": None, "status": "ok", "error": None}
+  start = time.perf_counter()
+  try:
+    written = gen_article(result["topic"], output_file = output_file, session = session, stream = False,
+                          fresh = fresh, progress = progress, research = seed_research(result))
+    entry["output_file"] = written
+    if written is None:
+      entry["status"] = "empty"
+  except Exception as e:
+    entry["status"] = "failed"
+    entry["error"] = f"{type(e).__name__}: {e}"
+  entry["seconds"] = round(time.perf_counter() - start, 3)
+  return entry
+
+def gen_theme_articles(theam = None, numberOfTopics = None, concurrency = None, out_dir = None, session = None, fresh = None,
+                       progress = None):
+  """
+  Writes the theme's summary and one article per topic into `out_dir`, with a manifest.json of the
+  articles; returns the manifest's path, or None if the summary came back empty. `progress` gets the
+  events of the summary and of every article (from several threads at once).
+  """
+  from _002_article_summarizer import gen_summary
+  from _103_batch_runner import slugify, write_manifest
+
+  if not theam:
+    theam = os.environ.get("THEME") or input("Enter the theme: ")
+  if concurrency is None:
+    concurrency = int(os.environ.get("THEME_ARTICLES_CONCURRENCY", DEFAULT_CONCURRENCY))
+
+  started_at = datetime.datetime.now().isoformat(timespec="seconds")
+  if not out_dir:
+    from _101_download_to_device import find_downloads_folder
+    r = datetime.datetime.today()
+    out_dir = os.path.join(find_downloads_folder(), f"theme_{slugify(theam, 40)}_{r.day}-{r.month}-{r.year}_{r.hour}-{r.minute}-{r.second}")
+  os.makedirs(out_dir, exist_ok=True)
+
+  start = time.perf_counter()
+  results = []
+  summary = gen_summary(theam, numberOfTopics, output_file = os.path.join(out_dir, "00_summary.md"), session = session,
+                        stream = False, fresh = fresh, progress = progress, topic_results = results)
+  if summary is None or not results:
+    return None
+
+  print(f"\nWriting {len(results)} articles, {max(1, concurrency)} at a time...")
+  with ThreadPoolExecutor(max_workers = max(1, concurrency)) as pool:
+    futures = [pool.submit(write_article, result, out_dir, session, fresh, progress) for result in results]
+    entries = []
+    for future in futures:
+      entry = future.result()
+      print(f"[{entry['index']}/{len(results)}] {entry['status']}: {entry['input']} ({entry['seconds']}s)")
+      entries.append(entry)
+
+  manifest = write_manifest(entries, out_dir, started_at, time.perf_counter() - start)
+  failed = sum(e["status"] == "failed" for e in entries)
+  print(f"\nTheme done: summary and {len(entries) - failed} of {len(entries)} articles written "
+        f"in {time.perf_counter() - start:.1f}s. Manifest: {manifest}")
+  return manifest
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description="Write the summary of a theme and an article for each of its topics.")
+  parser.add_argument("theme", nargs="?", help="the theme (asked for if left out)")
+  parser.add_argument("--topics", type=int, default=None, help="how many topics to plan (default: 5-9)")
+  parser.add_argument("--concurrency", type=int, default=None, help="how many articles are written at the same time")
+  parser.add_argument("--out", default=None, help="output folder (default: Downloads/theme_<theme>_<timestamp>)")
+  parser.add_argument("--fresh", action="store_true", help="don't reuse plans/research of similar themes and topics")
+  args = parser.parse_args(argv)
+
+  manifest = gen_theme_articles(args.theme, args.topics, args.concurrency, args.out, fresh = args.fresh or None)
+  return 0 if manifest else 1
+
+if __name__ == "__main__":
+  sys.exit(main())
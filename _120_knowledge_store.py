@@ -0,0 +1,165 @@
+"""
+## Task:
+Share research between the two generators: the research findings and source links of every topic
+either of them researched are kept (for a limited time) under the normalized topic, and the next
+researcher task on that topic - in either generator - uses them instead of calling the LLM
+
+KNOWLEDGE_TTL_DAYS (default 7) sets how long research stays usable;
+KNOWLEDGE_BYPASS=1 (or fresh=True) researches again, and the new research replaces the old.
+
+Usage:
+  python _120_knowledge_store.py          # what's stored
+  python _120_knowledge_store.py clear
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+
+try:
+  import pysqlite3 as sqlite3
+except ImportError:
+  import sqlite3
+
+from _102_llm_cache import env_flag
+from _105_markdown_parsing import heading_key, split_sections
+from _114_link_extraction import research_urls
+from _116_semantic_cache import WORD, STOPWORDS, stem
+
+DEFAULT_KNOWLEDGE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bphc_agentic_ai", "knowledge.sqlite3")
+DEFAULT_TTL_DAYS = 7
+
+def topic_key(topic):
+  # "The Role of AI in Healthcare" and "healthcare: role of AI" are the same topic
+  words = {stem(w) for w in WORD.findall(topic.lower()) if w not in STOPWORDS}
+  return " ".join(sorted(words)) or topic.strip().lower()
+
+def research_findings(research):
+  """
+  The body of the researcher's "Research Findings" section(s); without one, everything but its links.
+  """
+  sections = split_sections(research, ["Research Findings"])
+  findings = [section.partition("\n")[2].strip() for key, section in sections if key == heading_key("Research Findings")]
+  if any(findings):
+    return "\n\n".join(f for f in findings if f)
+  return "\n\n".join(section for key, section in sections if key != heading_key("Source Links")).strip()
+
+def research_text(findings, urls):
+  """
+  Findings and links in the format the researchers are asked for.
+  """
+  links = "\n".join(f"{i}. {url}" for i, url in enumerate(urls, 1))
+  return f"### Research Findings\n{findings.strip()}\n\n### Source Links\n{links}"
+
+class KnowledgeStore:
+  """
+  Research findings and source links per normalized topic. Entries older than `ttl_seconds`
+  are neither returned nor kept.
+  """
+
+  def __init__(self, path = None, ttl_seconds = None):
+    self.path = path or os.environ.get("KNOWLEDGE_PATH") or DEFAULT_KNOWLEDGE_PATH
+    if ttl_seconds is None:
+      ttl_seconds = float(os.environ.get("KNOWLEDGE_TTL_DAYS", DEFAULT_TTL_DAYS)) * 24 * 3600
+    self.ttl_seconds = ttl_seconds
+
+    self.hits = 0
+    self.misses = 0
+
+    if self.path != ":memory:":
+      os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute('''
+      CREATE TABLE IF NOT EXISTS research (
+        topic_key TEXT PRIMARY KEY,
+        topic TEXT,
+        findings TEXT,
+        links TEXT,
+        source TEXT,
+        created_at REAL
+      )''')
+    self._conn.commit()
+
+  def get(self, topic):
+    with self._lock:
+      row = self._conn.execute("SELECT topic, findings, links, source, created_at FROM research WHERE topic_key = ?",
+                               (topic_key(topic),)).fetchone()
+    if row is None or (self.ttl_seconds and time.time() - row[4] > self.ttl_seconds):
+      self.misses += 1
+      return None
+    self.hits += 1
+    return {"topic": row[0], "findings": row[1], "links": json.loads(row[2]), "source": row[3], "age_seconds": time.time() - row[4]}
+
+  def put(self, topic, research, source):
+    """
+    Keeps the findings and links of a researcher's output; outputs without findings aren't kept.
+    """
+    findings = research_findings(research)
+    links = research_urls(research)
+    if not findings:
+      return
+    now = time.time()
+    with self._lock:
+      self._conn.execute(
+        "INSERT OR REPLACE INTO research (topic_key, topic, findings, links, source, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (topic_key(topic), topic, findings, json.dumps(links), source, now))
+      if self.ttl_seconds:
+        self._conn.execute("DELETE FROM research WHERE created_at < ?", (now - self.ttl_seconds,))
+      self._conn.commit()
+
+  def clear(self):
+    with self._lock:
+      self._conn.execute("DELETE FROM research")
+      self._conn.commit()
+
+  def stats(self):
+    with self._lock:
+      count = self._conn.execute("SELECT COUNT(*) FROM research").fetchone()[0]
+    return {"path": self.path, "topics": count, "hits": self.hits, "misses": self.misses,
+            "ttl_days": round(self.ttl_seconds / 86400, 2) if self.ttl_seconds else None}
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_default_knowledge_store():
+  global _default_store
+  with _default_store_lock:
+    if _default_store is None:
+      _default_store = KnowledgeStore()
+    return _default_store
+
+def known_research(topic, fresh = None, store = None):
+  """
+  The stored research on `topic` in the researchers' format, or None (always None with `fresh`).
+  """
+  if fresh is None:
+    fresh = env_flag("KNOWLEDGE_BYPASS")
+  if fresh:
+    return None
+  known = (store or get_default_knowledge_store()).get(topic)
+  if known is None:
+    return None
+  print(f"\nKnowledge store: reusing the {known['source']} research on '{known['topic']}' "
+        f"({known['age_seconds'] / 3600:.1f}h old) for '{topic}'")
+  return research_text(known["findings"], known["links"])
+
+def remember_research(topic, research, source, store = None):
+  if research and research.strip():
+    (store or get_default_knowledge_store()).put(topic, research, source)
+
+def print_knowledge_stats(store = None):
+  stats = (store or get_default_knowledge_store()).stats()
+  print(f"Knowledge store: research reused for {stats['hits']} topic(s), {stats['misses']} not known yet "
+        f"({stats['topics']} topics stored)")
+
+if __name__ == "__main__":
+  if len(sys.argv) > 1 and sys.argv[1] == "clear":
+    get_default_knowledge_store().clear()
+    print("Knowledge store cleared.")
+  else:
+    print(json.dumps(get_default_knowledge_store().stats(), indent=2))
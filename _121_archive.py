@@ -0,0 +1,238 @@
+"""
+## Task:
+Keep every generated summary and article in one searchable archive instead of loose .md files in
+Downloads: an append-only SQLite table with an FTS5 full-text index over theme, topic and body,
+a lookup API and CLI, and the option to serve an archived result instead of generating it again
+
+ARCHIVE_REUSE=1 (or from_archive=True) serves the latest archived result for the same theme/topic.
+
+Usage:
+  python _121_archive.py search "quantum error correction" [--mode article] [--limit 10]
+  python _121_archive.py show <id>
+  python _121_archive.py import <folder>       # index .md files written before the archive existed
+  python _121_archive.py stats
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+
+try:
+  import pysqlite3 as sqlite3
+except ImportError:
+  import sqlite3
+
+from _102_llm_cache import env_flag
+from _120_knowledge_store import topic_key
+
+DEFAULT_ARCHIVE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "bphc_agentic_ai", "archive.sqlite3")
+TITLE_LINE = re.compile(r"^#\s*(Theme|Topic):\s*(.+?)\s*$", re.MULTILINE)
+
+def fts_query(text):
+  # every word must appear (the porter stemmer matches its other forms) and FTS5's own syntax in
+  # user input can't break the query; no prefix terms, expanding them is slow on common words
+  words = re.findall(r"\w+", text.lower())
+  return " AND ".join(f'"{w}"' for w in words)
+
+class Archive:
+  """
+  Generated outputs, never updated or deleted once written. Full-text search uses FTS5
+  (or a slow LIKE scan on sqlite builds without it); lookups by theme/topic use an index.
+  """
+
+  def __init__(self, path = None):
+    self.path = path or os.environ.get("ARCHIVE_PATH") or DEFAULT_ARCHIVE_PATH
+
+    if self.path != ":memory:":
+      os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute('''
+      CREATE TABLE IF NOT EXISTS outputs (
+        id INTEGER PRIMARY KEY,
+        mode TEXT,
+        theme TEXT,
+        topic TEXT,
+        title_key TEXT,
+        body TEXT,
+        meta TEXT,
+        output_file TEXT,
+        created_at REAL
+      )''')
+    self._conn.execute("CREATE INDEX IF NOT EXISTS outputs_title ON outputs(mode, title_key, created_at)")
+    self._conn.execute('''
+      CREATE TRIGGER IF NOT EXISTS outputs_append_only BEFORE UPDATE ON outputs
+      BEGIN SELECT RAISE(ABORT, 'the archive is append-only'); END''')
+
+    try:
+      self._conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS outputs_fts USING fts5(
+          mode, theme, topic, body, content='outputs', content_rowid='id', tokenize='porter unicode61'
+        )''')
+      self._conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS outputs_fts_insert AFTER INSERT ON outputs BEGIN
+          INSERT INTO outputs_fts(rowid, mode, theme, topic, body) VALUES (new.id, new.mode, new.theme, new.topic, new.body);
+        END''')
+      self.fts = True
+    except sqlite3.OperationalError:
+      self.fts = False
+    self._conn.commit()
+
+  def add(self, mode, body, theme = None, topic = None, meta = None, output_file = None, created_at = None):
+    title = theme if mode == "summary" else topic
+    with self._lock:
+      cur = self._conn.execute(
+        "INSERT INTO outputs (mode, theme, topic, title_key, body, meta, output_file, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (mode, theme, topic, topic_key(title or ""), body, json.dumps(meta or {}), output_file, created_at or time.time()))
+      self._conn.commit()
+      return cur.lastrowid
+
+  def _rows(self, sql, params):
+    columns = ("id", "mode", "theme", "topic", "body", "meta", "output_file", "created_at")
+    with self._lock:
+      rows = self._conn.execute(sql, params).fetchall()
+    return [dict(zip(columns + ("snippet",), row), meta = json.loads(row[5])) for row in rows]
+
+  def get(self, output_id):
+    rows = self._rows("SELECT id, mode, theme, topic, body, meta, output_file, created_at FROM outputs WHERE id = ?", (output_id,))
+    return rows[0] if rows else None
+
+  def latest(self, mode, title, accept = None):
+    """
+    The newest archived output of `mode` for `title` (the theme or topic, compared normalized)
+    that `accept(meta)` agrees to, or None.
+    """
+    rows = self._rows('''
+      SELECT id, mode, theme, topic, body, meta, output_file, created_at FROM outputs
+      WHERE mode = ? AND title_key = ? ORDER BY created_at DESC LIMIT 20''', (mode, topic_key(title)))
+    return next((row for row in rows if not accept or accept(row["meta"])), None)
+
+  def search(self, query, mode = None, limit = 10):
+    """
+    Outputs matching every word of `query` in their theme, topic or body, each with a short snippet
+    around the match: those matching it in their theme/topic first, then the rest, newest first.
+    """
+    terms = fts_query(query)
+    if not terms:
+      return []
+    if not self.fts:
+      words = re.findall(r"\w+", query.lower())
+      sql = ("SELECT id, mode, theme, topic, body, meta, output_file, created_at, substr(body, 1, 120) FROM outputs WHERE "
+             + " AND ".join(["lower(coalesce(theme, '') || ' ' || coalesce(topic, '') || ' ' || body) LIKE ?"] * len(words))
+             + (" AND mode = ?" if mode else "") + " ORDER BY created_at DESC LIMIT ?")
+      return self._rows(sql, [f"%{w}%" for w in words] + ([mode] if mode else []) + [limit])
+
+    # ranking every match (bm25) scans all of them, 100s of ms for common words over a big archive;
+    # walking the index newest first stops after `limit`
+    scope = f'mode : "{mode}" AND ' if mode else ""
+    sql = '''
+      SELECT o.id, o.mode, o.theme, o.topic, o.body, o.meta, o.output_file, o.created_at,
+             snippet(outputs_fts, 3, '[', ']', ' ... ', 12)
+      FROM outputs_fts JOIN outputs o ON o.id = outputs_fts.rowid
+      WHERE outputs_fts MATCH ? ORDER BY outputs_fts.rowid DESC LIMIT ?'''
+    rows = self._rows(sql, (f"{scope}{{theme topic}} : ({terms})", limit))
+    if len(rows) < limit:
+      seen = {row["id"] for row in rows}
+      more = self._rows(sql, (f"{scope}({terms})", limit + len(seen)))
+      rows += [row for row in more if row["id"] not in seen][:limit - len(rows)]
+    return rows
+
+  def stats(self):
+    with self._lock:
+      counts = dict(self._conn.execute("SELECT mode, COUNT(*) FROM outputs GROUP BY mode").fetchall())
+    return {"path": self.path, "full_text_search": self.fts, "outputs": counts}
+
+_default_archive = None
+_default_archive_lock = threading.Lock()
+
+def get_default_archive():
+  global _default_archive
+  with _default_archive_lock:
+    if _default_archive is None:
+      _default_archive = Archive()
+    return _default_archive
+
+def archived_output(mode, title, from_archive = None, accept = None, archive = None):
+  """
+  The archived output to serve instead of generating `title` again, if that was asked for and there is one.
+  """
+  if from_archive is None:
+    from_archive = env_flag("ARCHIVE_REUSE")
+  if not from_archive:
+    return None
+  found = (archive or get_default_archive()).latest(mode, title, accept)
+  if found:
+    made = time.strftime("%Y-%m-%d %H:%M", time.localtime(found["created_at"]))
+    print(f"\nServing the archived {mode} #{found['id']} of {made} instead of generating it again")
+  return found
+
+def archive_output(mode, body, theme = None, topic = None, meta = None, output_file = None, archive = None):
+  if body and body.strip():
+    return (archive or get_default_archive()).add(mode, body, theme, topic, meta, output_file)
+
+def import_folder(folder, archive = None):
+  """
+  Archives the generated .md files in `folder` (their "# Theme:" / "# Topic:" line tells which is which).
+  """
+  archive = archive or get_default_archive()
+  added = 0
+  for name in sorted(os.listdir(folder)):
+    path = os.path.join(folder, name)
+    if not name.endswith(".md") or not os.path.isfile(path):
+      continue
+    with open(path, encoding="utf-8") as f:
+      text = f.read()
+    match = TITLE_LINE.search(text)
+    if not match:
+      continue
+    body = text[match.end():].lstrip().lstrip("-").strip()
+    kind, title = match.group(1).lower(), match.group(2)
+    if kind == "theme":
+      archive.add("summary", body, theme = title, output_file = path, created_at = os.path.getmtime(path))
+    else:
+      archive.add("article", body, topic = title, output_file = path, created_at = os.path.getmtime(path))
+    added += 1
+  return added
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description="Search the archive of generated summaries and articles.")
+  commands = parser.add_subparsers(dest="command", required=True)
+  search = commands.add_parser("search", help="full-text search over theme, topic and body")
+  search.add_argument("query")
+  search.add_argument("--mode", choices=["summary", "article"], default=None)
+  search.add_argument("--limit", type=int, default=10)
+  show = commands.add_parser("show", help="print one archived output")
+  show.add_argument("id", type=int)
+  folder = commands.add_parser("import", help="archive the generated .md files in a folder")
+  folder.add_argument("folder")
+  commands.add_parser("stats")
+  args = parser.parse_args(argv)
+
+  archive = get_default_archive()
+  if args.command == "search":
+    start = time.perf_counter()
+    rows = archive.search(args.query, args.mode, args.limit)
+    for row in rows:
+      made = time.strftime("%Y-%m-%d", time.localtime(row["created_at"]))
+      print(f"#{row['id']:<6} {made}  {row['mode']:<8} {row['theme'] or row['topic']}\n         {' '.join(row['snippet'].split())}")
+    print(f"\n{len(rows)} result(s) in {(time.perf_counter() - start) * 1000:.2f} ms")
+  elif args.command == "show":
+    row = archive.get(args.id)
+    if row is None:
+      print(f"Nothing archived as #{args.id}")
+      return 1
+    print(f"# {'Theme' if row['mode'] == 'summary' else 'Topic'}: {row['theme'] or row['topic']}\n\n{row['body']}")
+  elif args.command == "import":
+    print(f"Archived {import_folder(args.folder, archive)} file(s) from {args.folder}")
+  else:
+    print(json.dumps(archive.stats(), indent=2))
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+## Task:
+Start researching the planned topics while the Topic Planner is still writing its list: the plan is
+streamed, every numbered line is parsed as soon as it's complete, and the research on that topic
+starts right away instead of after the whole plan. If the final plan turns out different from what
+was started on (the planner revised its answer, a line changed, or there is no numbered list at all),
+the research started on the wrong topics is cancelled and its results are dropped
+
+SPECULATIVE_RESEARCH=0 turns this off; the research then starts once the plan is complete.
+"""
+
+import os
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from _105_markdown_parsing import NUMBERED_ITEM, clean_item
+from _109_streaming import MarkdownStream
+
+class ListStream(MarkdownStream):
+  """
+  Calls `on_item(position, item)` for every item of the numbered list the watched task streams, as
+  soon as its line is complete, and `on_restart()` when the task's answer starts over.
+  Nothing is printed or written.
+  """
+
+  def __init__(self, task, on_item, on_restart):
+    super().__init__(None, "", echo = False)
+    self.watch(task)
+    self.on_item = on_item
+    self.on_restart = on_restart
+    self.line = ""
+    self.items = 0
+
+  def __enter__(self):
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+    crewai_event_bus.on(LLMStreamChunkEvent)(self.on_chunk)
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+    crewai_event_bus.off(LLMStreamChunkEvent, self.on_chunk)
+    return False
+
+  def emit(self, text):
+    # the last line may still be growing, so only the lines before it are read
+    *lines, self.line = (self.line + text).split("\n")
+    for line in lines:
+      match = NUMBERED_ITEM.match(line)
+      item = clean_item(match.group(2)) if match else ""
+      if item:
+        self.items += 1
+        self.on_item(self.items, item)
+
+  def restart(self):
+    self.line = ""
+    self.items = 0
+    self.on_restart()
+
+class SpeculativeResearch:
+  """
+  Work started on the topics of a plan that's still being written. For every topic line,
+  `start(number, topic)` returns what the topic keeps (e.g. its checked out crew) and a callable
+  to run now, or None if nothing needs to run. Once the plan is final, `confirm(topics)` returns
+  {number: (kept, future or None)} for the topics that were started on the right topic; the rest is
+  cancelled - work that's already running can't be stopped, so it finishes and its result is dropped.
+  """
+
+  def __init__(self, start, max_topics = None, max_workers = 4, enabled = None):
+    if enabled is None:
+      enabled = os.environ.get("SPECULATIVE_RESEARCH", "1") != "0"
+    self.enabled = enabled
+    self.start = start
+    self.max_topics = max_topics
+    self.started = {}       # topic number -> (topic, kept, future)
+    self.confirmed = 0
+    self.discarded = 0
+    self._pool = ThreadPoolExecutor(max_workers = max(1, max_workers)) if enabled else None
+    self._lock = threading.Lock()
+
+  def watch(self, task):
+    # while active, the topics `task` streams are started on
+    if not self.enabled:
+      return nullcontext()
+    return ListStream(task, self.on_topic, self.cancel)
+
+  def on_topic(self, number, topic):
+    if self.max_topics and number > self.max_topics:
+      return
+    kept, work = self.start(number, topic)
+    future = self._pool.submit(work) if work else None
+    with self._lock:
+      self.started[number] = (topic, kept, future)
+
+  def cancel(self):
+    with self._lock:
+      started, self.started = self.started, {}
+    for topic, kept, future in started.values():
+      self._drop(future)
+
+  def _drop(self, future):
+    if future:
+      future.cancel()
+      self.discarded += 1
+
+  def confirm(self, topics):
+    with self._lock:
+      started, self.started = self.started, {}
+    confirmed = {}
+    for number, (topic, kept, future) in started.items():
+      if number <= len(topics) and topics[number - 1] == topic:
+        confirmed[number] = (kept, future)
+      else:
+        self._drop(future)
+    self.confirmed += sum(future is not None for kept, future in confirmed.values())
+    if self.confirmed or self.discarded:
+      print(f"\nSpeculative research: {self.confirmed} topic(s) researched while the plan was written"
+            + (f", {self.discarded} dropped because the plan changed" if self.discarded else ""))
+    return confirmed
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    # dropped research that's still running holds a checked out crew, so it's waited for
+    if self._pool:
+      self._pool.shutdown(wait = True, cancel_futures = True)
+    return False
@@ -0,0 +1,125 @@
+"""
+## Task:
+Route every agent to a model tier instead of running them all on gemini-2.0-flash at temperature 0.8:
+the agents that only collect or format what the others wrote (the Link Collector, the Article Prompt
+Writer's join, the Final Article Compiler and Formatter) run on a faster, cheaper model at a low
+temperature. Calls, model latency and an estimated cost are counted per tier
+
+MODEL_ROUTES (inline JSON, or the path of a JSON file) changes the table on top of the defaults, e.g.
+  {"tiers": {"fast": {"model": "gemini/gemini-2.0-flash-lite", "temperature": 0.2}},
+   "routes": {"Fact Checker": "fast", "Link Collector": "standard"}}
+A tier has a model, a temperature and the USD prices per million input/output tokens; a new tier
+starts from the "standard" one. Roles that aren't routed use the "standard" tier.
+
+Usage:
+  python _123_model_routing.py            # the routing table in effect
+"""
+
+import os
+import json
+import time
+import threading
+
+from _102_llm_cache import DelegatingLLM
+from _112_rate_limiter import estimate_tokens
+
+DEFAULT_TIER = "standard"
+DEFAULT_TIERS = {
+  "standard": {"model": "gemini/gemini-2.0-flash", "temperature": 0.8, "input_price": 0.10, "output_price": 0.40},
+  "fast": {"model": "gemini/gemini-2.0-flash-lite", "temperature": 0.2, "input_price": 0.075, "output_price": 0.30},
+}
+DEFAULT_ROUTES = {
+  "Link Collector": "fast",
+  "Article Prompt Writer": "fast",
+  "Final Article Compiler and Formatter": "fast",
+}
+
+class ModelRouting:
+  """
+  The tiers (name -> model, temperature, prices) and which tier each agent role runs on.
+  """
+
+  def __init__(self, config = None):
+    config = config or {}
+    self.tiers = {name: dict(tier) for name, tier in DEFAULT_TIERS.items()}
+    for name, tier in config.get("tiers", {}).items():
+      self.tiers.setdefault(name, dict(DEFAULT_TIERS[DEFAULT_TIER])).update(tier)
+    self.routes = dict(DEFAULT_ROUTES, **config.get("routes", {}))
+    unknown = sorted(set(self.routes.values()) - set(self.tiers))
+    if unknown:
+      raise ValueError(f"MODEL_ROUTES routes agents to undefined tier(s): {', '.join(unknown)}")
+
+  @classmethod
+  def from_env(cls):
+    spec = os.environ.get("MODEL_ROUTES", "").strip()
+    if spec and not spec.startswith("{"):
+      with open(spec, encoding="utf-8") as f:
+        spec = f.read()
+    return cls(json.loads(spec) if spec else None)
+
+  def tier_for(self, role):
+    return self.routes.get(role, DEFAULT_TIER)
+
+_routing = None
+_routing_lock = threading.Lock()
+
+def get_routing():
+  global _routing
+  with _routing_lock:
+    if _routing is None:
+      _routing = ModelRouting.from_env()
+    return _routing
+
+# per-tier counters, for the whole process
+
+_usage = {}
+_usage_lock = threading.Lock()
+
+class MeteredLLM(DelegatingLLM):
+  """
+  Counts the calls that reach the model of `tier`: how many, how long they took, their
+  (estimated) tokens and what those cost at the tier's prices.
+  """
+
+  tier: str = DEFAULT_TIER
+  input_price: float = 0.0
+  output_price: float = 0.0
+
+  def call(self, messages, **kwargs):
+    start = time.monotonic()
+    try:
+      resp = self.inner.call(messages, **kwargs)
+    except Exception:
+      self._record(time.monotonic() - start, estimate_tokens(messages), 0, failed = True)
+      raise
+    self._record(time.monotonic() - start, estimate_tokens(messages), estimate_tokens(resp))
+    return resp
+
+  def _record(self, seconds, prompt_tokens, completion_tokens, failed = False):
+    cost = (prompt_tokens * self.input_price + completion_tokens * self.output_price) / 1_000_000
+    with _usage_lock:
+      usage = _usage.setdefault(self.tier, {"model": self.model, "calls": 0, "failed": 0, "seconds": 0.0,
+                                            "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0})
+      usage["calls"] += 1
+      usage["failed"] += failed
+      usage["seconds"] += seconds
+      usage["prompt_tokens"] += prompt_tokens
+      usage["completion_tokens"] += completion_tokens
+      usage["cost"] += cost
+
+def tier_stats():
+  with _usage_lock:
+    return {tier: dict(usage) for tier, usage in _usage.items()}
+
+def print_tier_stats():
+  stats = tier_stats()
+  if not stats:
+    return
+  print("Model tiers: " + "; ".join(
+    f"{tier} ({u['model'].split('/')[-1]}) {u['calls']} call(s), {u['seconds'] / max(1, u['calls']):.1f}s avg, "
+    f"~{u['prompt_tokens'] + u['completion_tokens']} tokens, ~${u['cost']:.4f}"
+    for tier, u in sorted(stats.items())))
+
+if __name__ == "__main__":
+  routing = get_routing()
+  print(json.dumps({"tiers": routing.tiers, "routes": routing.routes, "default": DEFAULT_TIER}, indent=2))
@@ -0,0 +1,232 @@
+"""
+## Task:
+Cut the tail latency of single Gemini calls: once a call has been running longer than a learned
+percentile of the recent calls, the same request is sent a second time, whichever answer comes
+back first is used and the other one is abandoned. Hedges are capped to a share of all calls,
+so the extra spend stays bounded
+
+Opt in with LLM_HEDGE=1. HEDGE_PERCENTILE (default 95) sets how slow a call must be before it's
+hedged, HEDGE_MAX_SHARE (default 0.1) the most hedges per call, and HEDGE_MIN_SAMPLES (default 20)
+how many calls are timed before hedging starts. Streamed calls are never hedged (both copies would stream).
+Hedging sits inside the rate limiter, so only the model's latency is timed, and a duplicate needs a
+free slot of the limiter right away: while it's throttling, nothing is hedged.
+
+Usage:
+  python _124_hedged_requests.py --calls 300 --latency 0.05 --slow 0.05 --slow-factor 20
+      # the latency percentiles of a local stand-in with injected slow responses, with and without hedging
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import contextvars
+from typing import Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from _102_llm_cache import DelegatingLLM
+from _112_rate_limiter import estimate_tokens, expected_completion_tokens, is_throttle
+
+DEFAULT_PERCENTILE = 95
+DEFAULT_MAX_SHARE = 0.1
+DEFAULT_MIN_SAMPLES = 20
+
+def percentile(values, p):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+# abandoned requests keep their thread until they return, so there are plenty of them
+_pool = ThreadPoolExecutor(max_workers = 64, thread_name_prefix = "hedge")
+
+class Hedger:
+  """
+  Latencies of the last `window` calls, and when to send a duplicate request: after the
+  `percentile`-th of them, as long as there have been at most `max_share` hedges per call.
+  """
+
+  def __init__(self, percentile = None, max_share = None, min_samples = None, window = 200):
+    self.percentile = float(os.environ.get("HEDGE_PERCENTILE", DEFAULT_PERCENTILE)) if percentile is None else percentile
+    self.max_share = float(os.environ.get("HEDGE_MAX_SHARE", DEFAULT_MAX_SHARE)) if max_share is None else max_share
+    self.min_samples = int(os.environ.get("HEDGE_MIN_SAMPLES", DEFAULT_MIN_SAMPLES)) if min_samples is None else min_samples
+    self.latencies = deque(maxlen = window)
+    self.calls = 0
+    self.hedges = 0
+    self.skipped = 0
+    self.hedge_wins = 0
+    self.abandoned = 0
+    self.failed_attempts = 0
+    self._lock = threading.Lock()
+
+  def trigger(self):
+    # seconds after which the call is hedged, or None while too few calls have been timed
+    with self._lock:
+      if len(self.latencies) < self.min_samples:
+        return None
+      return percentile(self.latencies, self.percentile)
+
+  def _start(self, request):
+    started = time.monotonic()
+    future = _pool.submit(contextvars.copy_context().run, request)
+    future.add_done_callback(lambda f: self._timed(f, time.monotonic() - started))
+    return future
+
+  def _timed(self, future, seconds):
+    # every attempt that finished counts, the abandoned ones included, or the slow tail would go unseen
+    if future.cancelled():
+      return
+    with self._lock:
+      if future.exception() is None:
+        self.latencies.append(seconds)
+      else:
+        self.failed_attempts += 1
+
+  def _may_hedge(self):
+    with self._lock:
+      if self.hedges + 1 > self.max_share * self.calls:
+        return False
+      self.hedges += 1
+      return True
+
+  def call(self, request, reserve = None):
+    """
+    The answer of `request()` (a call to the model), hedged if it takes too long. `reserve()`, if given,
+    is asked before a duplicate is sent: it returns a callable that's handed the duplicate's future once
+    that's done, or None if the duplicate may not go out now.
+    """
+    with self._lock:
+      self.calls += 1
+    delay = self.trigger()
+    if delay is None:
+      started = time.monotonic()
+      resp = request()
+      with self._lock:
+        self.latencies.append(time.monotonic() - started)
+      return resp
+
+    primary = self._start(request)
+    done, _ = wait([primary], timeout = delay)
+    if done or not self._may_hedge():
+      return primary.result()
+    settle = reserve() if reserve else None
+    if reserve and settle is None:
+      with self._lock:
+        self.hedges -= 1
+        self.skipped += 1
+      return primary.result()
+
+    hedge = self._start(request)
+    if settle:
+      hedge.add_done_callback(settle)
+    pending = {primary, hedge}
+    error = None
+    while pending:
+      done, pending = wait(pending, return_when = FIRST_COMPLETED)
+      for future in done:
+        if future.exception() is not None:
+          error = future.exception()
+          continue
+        # the sync client can't interrupt a request in flight: the loser runs out and its answer is dropped
+        with self._lock:
+          self.hedge_wins += future is hedge
+          self.abandoned += len(pending)
+        for other in pending:
+          other.cancel()
+        return future.result()
+    raise error
+
+  def stats(self):
+    with self._lock:
+      return {
+        "calls": self.calls, "hedges": self.hedges, "skipped": self.skipped, "hedge_wins": self.hedge_wins,
+        "abandoned": self.abandoned,
+        "failed_attempts": self.failed_attempts,
+        "trigger_seconds": round(percentile(self.latencies, self.percentile), 3) if len(self.latencies) >= self.min_samples else None,
+      }
+
+_hedgers = []
+_hedgers_lock = threading.Lock()
+
+class HedgedLLM(DelegatingLLM):
+  """
+  Hedges the calls to the wrapped LLM (see Hedger). Each instance learns the latencies of its own model.
+  With a `limiter` (wrap the HedgedLLM in the RateLimitedLLM of that limiter), a duplicate takes a slot
+  of its own, and is only sent if one is free at once.
+  """
+
+  hedger: Any = None
+  limiter: Any = None
+
+  def __init__(self, inner, hedger = None, **kwargs):
+    super().__init__(inner, hedger = hedger or Hedger(), **kwargs)
+    with _hedgers_lock:
+      _hedgers.append(self.hedger)
+
+  def call(self, messages, **kwargs):
+    reserve = (lambda: self._reserve(messages)) if self.limiter else None
+    return self.hedger.call(lambda: self.inner.call(messages, **kwargs), reserve)
+
+  def _reserve(self, messages):
+    estimated = estimate_tokens(messages) + expected_completion_tokens(self.inner)
+    started = self.limiter.try_acquire(estimated)
+    if started is None:
+      return None
+
+    def settle(future):
+      # the slot is given back once the duplicate is done, abandoned or not
+      if future.cancelled():
+        return self.limiter.release(started, estimated)
+      error = future.exception()
+      if error is not None:
+        return self.limiter.release(started, estimated, throttled = is_throttle(error))
+      resp = future.result()
+      used = estimate_tokens(messages) + estimate_tokens(resp) if isinstance(resp, str) else None
+      self.limiter.release(started, estimated, used)
+    return settle
+
+def print_hedge_stats():
+  with _hedgers_lock:
+    stats = [h.stats() for h in _hedgers]
+  if not stats:
+    return
+  total = {key: sum(s[key] for s in stats) for key in ("calls", "hedges", "skipped", "hedge_wins", "abandoned")}
+  print(f"Hedged requests: {total['hedges']} of {total['calls']} calls hedged, the duplicate won {total['hedge_wins']} "
+        f"time(s), {total['abandoned']} answer(s) abandoned"
+        + (f", {total['skipped']} not hedged for want of a rate limiter slot" if total["skipped"] else ""))
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description="Hedging against a local stand-in LLM with injected slow responses.")
+  parser.add_argument("--calls", type=int, default=300)
+  parser.add_argument("--concurrency", type=int, default=4, help="calls made at the same time")
+  parser.add_argument("--latency", type=float, default=0.05, help="seconds a normal call takes")
+  parser.add_argument("--slow", type=float, default=0.05, help="share of calls that are slow")
+  parser.add_argument("--slow-factor", type=float, default=20, help="how many times longer a slow call takes")
+  args = parser.parse_args(argv)
+
+  from _111_offline_benchmark import LocalLLM
+
+  def measure(llm):
+    def one(i):
+      start = time.perf_counter()
+      llm.call([{"role": "user", "content": f"question {i}"}])
+      return time.perf_counter() - start
+    with ThreadPoolExecutor(max_workers = max(1, args.concurrency)) as pool:
+      return list(pool.map(one, range(args.calls)))
+
+  settings = dict(model = "local/deterministic", temperature = 0.0, latency = args.latency,
+                  slow_share = args.slow, slow_factor = args.slow_factor, size = 20)
+  plain = measure(LocalLLM(**settings))
+  hedged_llm = HedgedLLM(LocalLLM(**settings))
+  hedged = measure(hedged_llm)
+
+  for name, seconds in (("plain", plain), ("hedged", hedged)):
+    print(f"{name:7} p50 {percentile(seconds, 50):.3f}s  p95 {percentile(seconds, 95):.3f}s  "
+          f"p99 {percentile(seconds, 99):.3f}s  max {max(seconds):.3f}s  total {sum(seconds):.1f}s")
+  stats = hedged_llm.hedger.stats()
+  print(f"hedged {stats['hedges']} of {stats['calls']} calls ({stats['hedges'] / max(1, stats['calls']):.1%} extra requests), "
+        f"the duplicate won {stats['hedge_wins']}, trigger {stats['trigger_seconds']}s")
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+## Task:
+Send every Gemini call in the process through one pooled, keep-alive HTTP client instead of a client
+(and its connection and TLS setup) per LLM object: all agents, model tiers and crews share its
+connections, it speaks HTTP/2 where the `h2` package is installed, and it counts the connections it
+opened vs the requests that went out on one already open
+
+HTTP_POOL_SIZE (default 20) sets how many connections are kept open, HTTP_KEEPALIVE_SECONDS
+(default 120) how long an idle one is kept; HTTP_POOL=0 gives every LLM its own client again.
+
+Call install() once before building the LLMs: without google-genai the pool is set on LiteLLM's
+module-wide session, and that is the one change this module makes outside of the LLMs it configures.
+"""
+
+import os
+import time
+import threading
+import importlib.util
+
+DEFAULT_POOL_SIZE = 20
+DEFAULT_KEEPALIVE_SECONDS = 120
+
+def installed(module):
+  try:
+    return importlib.util.find_spec(module) is not None
+  except ModuleNotFoundError:
+    return False
+
+class ConnectionStats:
+  """
+  Requests sent, and the connections (TCP connects, TLS handshakes) opened for them: httpcore
+  traces connection setup as it happens, so a request without any went out on an open connection.
+  """
+
+  def __init__(self):
+    self.requests = 0
+    self.opened = 0
+    self.tls_handshakes = 0
+    self.setup_seconds = 0.0
+    self._lock = threading.Lock()
+
+  def on_request(self, request):
+    started = {}
+
+    def trace(event, info):
+      if event in ("connection.connect_tcp.started", "connection.start_tls.started"):
+        started[event] = time.monotonic()
+      elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+        seconds = time.monotonic() - started.pop(event.replace(".complete", ".started"), time.monotonic())
+        with self._lock:
+          if event == "connection.connect_tcp.complete":
+            self.opened += 1
+          else:
+            self.tls_handshakes += 1
+          self.setup_seconds += seconds
+
+    with self._lock:
+      self.requests += 1
+    request.extensions["trace"] = trace
+
+  def stats(self):
+    with self._lock:
+      return {"requests": self.requests, "opened": self.opened, "reused": max(0, self.requests - self.opened),
+              "tls_handshakes": self.tls_handshakes, "setup_seconds": round(self.setup_seconds, 3)}
+
+_stats = ConnectionStats()
+_client = None
+_client_lock = threading.Lock()
+_installed = False
+_install_lock = threading.Lock()
+
+def client_args():
+  # the httpx.Client settings of the pool
+  import httpx
+  size = int(os.environ.get("HTTP_POOL_SIZE", DEFAULT_POOL_SIZE))
+  return dict(
+    limits = httpx.Limits(max_connections = size, max_keepalive_connections = size,
+                          keepalive_expiry = float(os.environ.get("HTTP_KEEPALIVE_SECONDS", DEFAULT_KEEPALIVE_SECONDS))),
+    http2 = installed("h2"),
+    timeout = httpx.Timeout(600, connect = 10),    # the SDK sets its own per request; this is the fallback
+    follow_redirects = True,
+    event_hooks = {"request": [_stats.on_request]},
+  )
+
+def get_http_client():
+  global _client
+  with _client_lock:
+    if _client is None:
+      import httpx
+      _client = httpx.Client(**client_args())
+    return _client
+
+def pooled():
+  return os.environ.get("HTTP_POOL", "1") != "0"
+
+def install():
+  """
+  The process-wide part of the setup, done once: without google-genai, crewai goes through LiteLLM,
+  which sends every call through its module-wide session, so the pool becomes that session.
+  """
+  global _installed
+  with _install_lock:
+    if _installed:
+      return
+    if pooled() and not installed("google.genai") and installed("litellm"):
+      import litellm
+      litellm.client_session = get_http_client()
+    _installed = True
+
+def llm_client_settings():
+  """
+  What to add to LLM(...) to put a Gemini LLM on the shared client; {} with HTTP_POOL=0, or when
+  the LLM goes through LiteLLM (see install).
+  """
+  if not pooled():
+    return {}
+  if installed("google.genai"):
+    # crewai's native Gemini provider builds its google-genai client from these
+    from google.genai import types
+    if "httpx_client" in types.HttpOptions.model_fields:
+      return {"client_params": {"http_options": types.HttpOptions(httpx_client = get_http_client())}}
+    # older SDKs build a client of their own from the settings: kept alive and counted, but not shared
+    return {"client_params": {"http_options": types.HttpOptions(client_args = client_args())}}
+  return {}
+
+def pool_stats():
+  return dict(_stats.stats(), http2 = installed("h2"))
+
+def print_pool_stats():
+  stats = pool_stats()
+  if not stats["requests"]:
+    return
+  print(f"HTTP pool: {stats['requests']} request(s), {stats['opened']} connection(s) opened "
+        f"({stats['setup_seconds']:.2f}s of connection setup), {stats['reused']} reused, "
+        f"{'HTTP/2' if stats['http2'] else 'HTTP/1.1'}")
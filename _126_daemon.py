@@ -0,0 +1,300 @@
+"""
+## Task:
+Keep one warm background process with crewai imported, the environment checked and the LLMs, agents and
+crews built, and make `gen_summary`/`gen_article` requests to it from a thin client over a Unix socket:
+the client only imports the standard library, so a request starts in milliseconds and the answer is
+streamed back as it's written. The client starts the daemon itself the first time it's needed
+
+Usage:
+  python _126_daemon.py summary "AI in healthcare" --topics 5
+  python _126_daemon.py article "Transformers for time series" [--fresh] [--resume <run id>] [--from-archive]
+      [--output path.md]                    # where the .md goes (default: the Downloads folder)
+  python _126_daemon.py status              # the daemon's jobs and workers
+  python _126_daemon.py stop
+  python _126_daemon.py serve [--workers 2] # run the daemon in the foreground
+
+DAEMON_SOCKET sets the socket (default ~/.cache/bphc_agentic_ai/daemon.sock), DAEMON_WORKERS how many
+jobs run at the same time, DAEMON_LOG where a daemon the client started writes its output;
+DAEMON_AUTOSTART=0 stops the client from starting one. USE_DAEMON=1 makes _001_main_interface
+send its Article Title Generator / Article Generator runs to the daemon too.
+
+Protocol: the client sends one JSON line - a job as in _118_http_service's POST /jobs, or
+{"command": "status" | "stop"} - and gets JSON lines back: the job's events (status, task_started,
+task_finished, text, restart) and lastly {"event": "end", ...the job}.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import argparse
+import threading
+import subprocess
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bphc_agentic_ai")
+DEFAULT_WORKERS = 2
+STARTUP_SECONDS = 120
+
+def socket_path():
+  return os.environ.get("DAEMON_SOCKET") or os.path.join(CACHE_DIR, "daemon.sock")
+
+def log_path():
+  return os.environ.get("DAEMON_LOG") or os.path.join(CACHE_DIR, "daemon.log")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# the daemon
+
+def warm_up(session):
+  """
+  Everything a first request would otherwise wait for: the crewai import and environment
+  check, the LLMs, and the crew templates with an idle instance of each ready to run.
+  """
+  from _002_article_summarizer import build_summary_crews, build_topic_crew
+  from _003_article_generator import build_article_crew
+
+  session.llm
+  session.streaming_llm
+  for name, builder in (("summary", build_summary_crews), ("summary_topic", build_topic_crew),
+                        ("article", build_article_crew)):
+    with session.checkout(name, builder):
+      pass
+
+def make_daemon(path, jobs):
+  import socketserver
+
+  class DaemonHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+      try:
+        request = json.loads(self.rfile.readline() or b"{}")
+      except json.JSONDecodeError as e:
+        return self.send({"event": "error", "error": f"not a JSON line: {e}"})
+      command = request.get("command") if isinstance(request, dict) else None
+      if command == "status":
+        from _127_memory_profile import rss_bytes
+        rss = rss_bytes()
+        return self.send(dict(jobs.stats(), event = "status", pid = os.getpid(), rss_mib = rss and round(rss / 2**20, 1),
+                              uptime_seconds = round(time.time() - self.server.started_at, 1),
+                              jobs_list = [job.to_dict() for job in jobs.list()]))
+      if command == "stop":
+        self.send({"event": "stopping"})
+        # shutdown() waits for serve_forever, which runs on another thread
+        threading.Thread(target = self.server.shutdown, daemon = True).start()
+        return
+      if command:
+        return self.send({"event": "error", "error": f"unknown command '{command}'"})
+      self.run(request)
+
+    def run(self, request):
+      from _118_http_service import parse_job
+
+      try:
+        mode, text, options = parse_job(json.dumps(request))
+      except ValueError as e:
+        return self.send({"event": "error", "error": str(e)})
+      # the client is on this machine, so it may say where the file goes
+      if request.get("output_file"):
+        options["output_file"] = os.path.abspath(os.path.expanduser(request["output_file"]))
+      try:
+        job = jobs.submit(mode, text, options)
+      except queue.Full:
+        return self.send({"event": "error", "error": "too many jobs are waiting; try again later"})
+
+      index = 0
+      try:
+        while True:
+          events, finished = job.events_since(index, 15)
+          for event in events:
+            self.send(event)
+          index += len(events)
+          if finished and not events:
+            return self.send(dict(job.to_dict(), event = "end"))
+      except (BrokenPipeError, ConnectionResetError):
+        pass   # the client went away; the job carries on
+
+    def send(self, payload):
+      self.wfile.write(json.dumps(payload).encode("utf-8") + b"\n")
+      self.wfile.flush()
+
+  server = socketserver.ThreadingUnixStreamServer(path, DaemonHandler)
+  server.daemon_threads = True
+  server.started_at = time.time()
+  return server
+
+def claim_socket(path):
+  """
+  Whether `path` is free to serve on: a socket left over from a daemon that died is removed,
+  one a running daemon answers on isn't.
+  """
+  if not os.path.exists(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return True
+  try:
+    connect(path).close()
+    return False
+  except OSError:
+    os.unlink(path)
+    return True
+
+def serve(workers):
+  from _101_download_to_device import find_downloads_folder
+  from _108_crew_session import get_session
+  from _118_http_service import JobQueue
+
+  path = socket_path()
+  if not claim_socket(path):
+    print(f"A daemon is already running on {path}")
+    return 1
+
+  start = time.perf_counter()
+  # a missing API key or crewai install stops the daemon now instead of failing every job
+  warm_up(get_session())
+  jobs = JobQueue(workers, out_dir = os.environ.get("DAEMON_OUTPUT_DIR") or find_downloads_folder())
+  jobs.start()
+  server = make_daemon(path, jobs)
+  os.chmod(path, 0o600)
+  print(f"\nDaemon warm in {time.perf_counter() - start:.1f}s, serving on {path} with {jobs.workers} worker(s) "
+        f"(pid {os.getpid()}); results go to {jobs.out_dir}", flush=True)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    print("\nShutting down...", flush=True)
+    server.server_close()
+    if os.path.exists(path):
+      os.unlink(path)
+    jobs.stop()
+  return 0
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# the client
+
+def connect(path):
+  client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    client.connect(path)
+  except OSError:
+    client.close()
+    raise
+  return client
+
+def start_daemon(path):
+  """
+  Starts a daemon in the background and waits until it answers on `path`.
+  """
+  os.makedirs(os.path.dirname(log_path()), exist_ok=True)
+  print(f"Starting the daemon (it loads everything once; its output goes to {log_path()})...", file=sys.stderr)
+  with open(log_path(), "ab") as log:
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve"], stdin = subprocess.DEVNULL,
+                               stdout = log, stderr = subprocess.STDOUT, start_new_session = True,
+                               cwd = os.path.dirname(os.path.abspath(__file__)))
+  deadline = time.monotonic() + STARTUP_SECONDS
+  while time.monotonic() < deadline:
+    if process.poll() is not None:
+      raise RuntimeError(f"the daemon exited while starting (code {process.returncode}); see {log_path()}")
+    try:
+      return connect(path)
+    except OSError:
+      time.sleep(0.1)
+  raise RuntimeError(f"the daemon didn't start within {STARTUP_SECONDS}s; see {log_path()}")
+
+def request(payload, autostart = None):
+  """
+  Sends `payload` to the daemon (started first if need be) and yields what it answers, line by line.
+  """
+  if not hasattr(socket, "AF_UNIX"):
+    raise RuntimeError("the daemon needs Unix sockets, which this platform doesn't have")
+  if autostart is None:
+    autostart = os.environ.get("DAEMON_AUTOSTART", "1") != "0"
+  path = socket_path()
+  try:
+    client = connect(path)
+  except OSError:
+    if not autostart:
+      raise RuntimeError(f"no daemon is running on {path}; start one with: python {os.path.basename(__file__)} serve")
+    client = start_daemon(path)
+
+  with client, client.makefile("rb") as answers:
+    client.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+    for line in answers:
+      yield json.loads(line)
+
+def run_remote(mode, text, number_of_topics = None, output_file = None, fresh = None, resume = None, from_archive = None):
+  """
+  gen_summary / gen_article in the daemon: the answer is printed as it streams in.
+  Returns the path of the written file, or None.
+  """
+  payload = {"mode": mode, "theme" if mode == "summary" else "topic": text, "number_of_topics": number_of_topics,
+             "output_file": output_file, "fresh": fresh, "resume": resume, "from_archive": from_archive}
+  streamed = False
+  for event in request({k: v for k, v in payload.items() if v is not None}):
+    kind = event.get("event")
+    if kind == "text":
+      streamed = True
+      print(event["text"], end="", flush=True)
+    elif kind == "restart":
+      print("\n\n[the agent is revising its answer...]\n")
+    elif kind == "task_started":
+      print(f"\n[{event.get('agent') or 'agent'}: {event['task']}{' - ' + event['scope'] if event.get('scope') else ''}]",
+            file=sys.stderr, flush=True)
+    elif kind == "error":
+      print("\nThe daemon turned the request down:", event["error"])
+      return None
+    elif kind == "end":
+      if event["status"] == "failed":
+        print(f"\nThe run failed: {event['error']}")
+        return None
+      if event["output_file"] and not streamed:
+        # answered without streaming (a cached or archived answer): show what was written
+        with open(event["output_file"], encoding="utf-8") as f:
+          print(f.read())
+      print(f"\n\nDone in {event['run_seconds'] or 0:.1f}s (queued {event['queued_seconds'] or 0:.2f}s)"
+            + (f"; saved to {event['output_file']}" if event["output_file"] else "; nothing was written"))
+      return event["output_file"]
+  print("\nThe daemon went away before the run finished; see", log_path())
+  return None
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description="Run the article crews in a warm background daemon.")
+  commands = parser.add_subparsers(dest="command", required=True)
+
+  serve_parser = commands.add_parser("serve", help="run the daemon in the foreground")
+  serve_parser.add_argument("--workers", type=int, default=int(os.environ.get("DAEMON_WORKERS", DEFAULT_WORKERS)),
+                            help="how many jobs run at the same time")
+  commands.add_parser("status", help="the daemon's workers and jobs")
+  commands.add_parser("stop", help="stop the daemon")
+  for mode, what in (("summary", "theme"), ("article", "topic")):
+    job_parser = commands.add_parser(mode, help=f"gen_{mode} on a {what}")
+    job_parser.add_argument("text", metavar=what)
+    if mode == "summary":
+      job_parser.add_argument("--topics", type=int, dest="number_of_topics")
+    job_parser.add_argument("--output", dest="output_file")
+    job_parser.add_argument("--fresh", action="store_true", default=None)
+    job_parser.add_argument("--resume")
+    job_parser.add_argument("--from-archive", action="store_true", default=None)
+  args = parser.parse_args(argv)
+
+  if args.command == "serve":
+    return serve(args.workers)
+
+  try:
+    if args.command in ("status", "stop"):
+      # neither is worth starting a daemon for
+      for answer in request({"command": args.command}, autostart = False):
+        answer.pop("event", None)
+        print(json.dumps(answer, indent=2) if answer else "Stopping the daemon.")
+      return 0
+    options = {k: v for k, v in vars(args).items() if k != "command"}
+    return 0 if run_remote(args.command, **options) else 1
+  except RuntimeError as e:
+    print(e, file=sys.stderr)
+    return 1
+  except KeyboardInterrupt:
+    print("\nStopped following the run; it carries on in the daemon.", file=sys.stderr)
+    return 130
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+## Task:
+Watch the memory of a long interactive session: the resident set size (RSS) of the process at every
+stage of a run (each task as it finishes, and once the run's state has been released), the Python memory
+tracemalloc traces at those points, and how RSS moves from one run to the next - reported when each run ends
+
+MEMORY_PROFILE=0 turns the report off; MEMORY_PROFILE=trace adds tracemalloc, with the lines that allocated
+what a run left behind (it slows the run down noticeably). MEMORY_PROFILE_TOP (default 5) sets how many lines.
+"""
+
+import os
+import gc
+import sys
+import threading
+import tracemalloc
+
+DEFAULT_TOP = 5
+MIB = 1024 * 1024
+
+def rss_bytes():
+  """
+  The current resident set size, or None where it can't be read. Without /proc or psutil
+  this is the peak RSS instead (getrusage), which can only grow.
+  """
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  except (OSError, ValueError, IndexError):
+    pass
+  try:
+    import psutil
+    return psutil.Process().memory_info().rss
+  except ImportError:
+    pass
+  try:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+  except ImportError:
+    return None
+
+# RSS after each profiled run has released its state, for the whole process
+_history = []
+
+class MemoryProfile:
+  """
+  Samples memory at the stages of one run. Pass `listener` as a pipeline's `progress` callback
+  to get a sample whenever a task finishes; leaving the `with` block collects garbage and takes
+  the last sample, after the run's state is gone.
+  """
+
+  def __init__(self, label, mode = None):
+    mode = os.environ.get("MEMORY_PROFILE", "1") if mode is None else mode
+    self.label = label
+    self.enabled = mode != "0"
+    self.trace = mode == "trace"
+    self.stages = []          # (stage, rss, traced current, traced peak)
+    self.leftovers = []
+    self._before = None
+    self._started_tracing = False
+    self._lock = threading.Lock()
+
+  def __enter__(self):
+    if self.trace:
+      if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        self._started_tracing = True
+      gc.collect()
+      self._before = tracemalloc.take_snapshot()
+      tracemalloc.reset_peak()
+    self.mark("start")
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    gc.collect()
+    self.mark("released")
+    if self.trace:
+      after = tracemalloc.take_snapshot()
+      top = int(os.environ.get("MEMORY_PROFILE_TOP", DEFAULT_TOP))
+      self.leftovers = [stat for stat in after.compare_to(self._before, "lineno") if stat.size_diff > 0][:top]
+      # the snapshots hold a copy of every traced block; they go with the run
+      self._before = None
+      if self._started_tracing:
+        tracemalloc.stop()
+    if self.enabled:
+      _history.append(self.stages[-1][1])
+    return False
+
+  def mark(self, stage):
+    if not self.enabled:
+      return
+    current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+    with self._lock:
+      self.stages.append((stage, rss_bytes(), current, peak))
+
+  def listener(self, event):
+    # a pipeline's progress callback; the text it streams is ignored
+    if event.get("event") == "task_finished":
+      self.mark(event["task"] + (f" ({event['scope']})" if event.get("scope") else ""))
+
+  def report(self):
+    if not self.enabled or not self.stages:
+      return
+    start = self.stages[0][1]
+    print(f"\nMemory of this run ({self.label}):")
+    for stage, rss, current, peak in self.stages:
+      line = f"  {stage[:56]:56}"
+      if rss is not None:
+        line += f" RSS {rss / MIB:8.1f} MiB ({(rss - start) / MIB:+.1f})"
+      if current is not None:
+        line += f"   traced {current / MIB:7.2f} MiB, peak {peak / MIB:7.2f} MiB"
+      print(line)
+    for stat in self.leftovers:
+      frame = stat.traceback[0]
+      print(f"  left behind: {stat.size_diff / 1024:+.1f} KiB in {stat.count_diff:+d} block(s) at {frame.filename}:{frame.lineno}")
+    if len(_history) > 1 and None not in (_history[0], _history[-1]):
+      # the first runs also build the crews, so the recent runs say more about a leak
+      recent = min(10, len(_history) - 1)
+      print(f"  RSS after {len(_history)} runs: {_history[-1] / MIB:.1f} MiB, "
+            f"{(_history[-1] - _history[0]) / MIB:+.1f} MiB since the first, "
+            f"{(_history[-1] - _history[-1 - recent]) / MIB:+.1f} MiB over the last {recent}")
@@ -0,0 +1,111 @@
+"""
+## Task:
+Keep the steps both generators take around their crews in one place, so gen_summary (_002) and
+gen_article (_003) only spell out what is particular to them: opening the warm session, serving an
+archived answer, reusing earlier research, and writing, archiving and reporting on the answer
+"""
+
+import os
+
+def open_session(session = None):
+  """
+  The warm session (_108_crew_session) with its LLM built; fails fast without crewai or an API key.
+  """
+  from _106_environment import ensure_crewai
+  # the other helpers import crewai, so the version check (and one-time install) has to come first
+  ensure_crewai()
+
+  from _108_crew_session import get_session
+  session = session or get_session()
+  session.llm
+  return session
+
+def wants_stream(stream):
+  # the final answer is streamed to the console and the .md file as it's written; STREAM_OUTPUT=0 turns this off
+  if stream is None:
+    return os.environ.get("STREAM_OUTPUT", "1") != "0"
+  return stream
+
+def serve_archived(mode, title, header, output_file, prefix, from_archive = None, accept = None, echo = True):
+  """
+  If asked for, the output archived for `title` (_121_archive) is written out as is.
+  Returns the file it went to, or None if the output has to be generated.
+  """
+  from _121_archive import archived_output
+  from _109_streaming import MarkdownStream, resolve_output_file
+
+  archived = archived_output(mode, title, from_archive, accept = accept)
+  if not archived:
+    return None
+  fw = resolve_output_file(output_file, prefix)
+  MarkdownStream(fw, header, echo = echo).finish(archived["body"])
+  return fw
+
+def reusable_research(topic, fresh = None, similar_kind = None):
+  """
+  Research to use instead of researching `topic`: what either generator already found on it
+  (_120_knowledge_store), else, with `similar_kind`, a similar topic's research (_116_semantic_cache).
+  """
+  from _120_knowledge_store import known_research
+  from _116_semantic_cache import reuse
+
+  known = known_research(topic, fresh)
+  if known or similar_kind is None:
+    return known
+  match = reuse(similar_kind, topic, "research", fresh)
+  return match.result["research"] if match else None
+
+def remember(kind, text, result, research, source):
+  """
+  Keeps what a run worked out for later runs: `result` for runs on a similar `text`,
+  and `research` for either generator's runs on the same topic.
+  """
+  from _116_semantic_cache import get_default_semantic_cache
+  from _120_knowledge_store import remember_research
+
+  get_default_semantic_cache().store(kind, text, result)
+  remember_research(text, research, source)
+
+def finish_run(mode, resp, live, what, tracer, budget, checkpoint, meta = None, **title):
+  """
+  Writes the answer `resp` to the run's .md file, archives it and prints the run's statistics.
+  Returns the file, or None if there was no answer.
+  """
+  from _109_streaming import clean_output
+  from _121_archive import archive_output
+
+  # If you want to display markdown in a notebook, use display(Markdown(resp.raw.strip("`")))
+  # For a .py script, the answer has already been streamed (or is printed by live.finish below)
+  if not resp:
+    print("No data received from the LLM. Nothing to write.")
+    return None
+
+  print(f"\n\nDownloading {what} as a .md file: ")
+  live.finish(resp.raw)
+  archive_output(mode, clean_output(resp.raw), output_file = live.path, meta = dict(meta or {}, run_id = checkpoint.run_id), **title)
+
+  print("\nDownload complete! Check your downloads folder, and happy writing! :)")
+  print_run_stats(tracer, budget)
+  return live.path
+
+def print_run_stats(tracer, budget):
+  from _102_llm_cache import env_flag, print_cache_stats
+  from _112_rate_limiter import print_limiter_stats
+  from _113_context_pruning import print_context_savings
+  from _116_semantic_cache import print_semantic_cache_stats
+  from _120_knowledge_store import print_knowledge_stats
+  from _123_model_routing import print_tier_stats
+  from _124_hedged_requests import print_hedge_stats
+  from _125_http_pool import print_pool_stats
+
+  print_cache_stats()
+  print_semantic_cache_stats()
+  print_knowledge_stats()
+  print_limiter_stats()
+  print_tier_stats()
+  print_hedge_stats()
+  print_pool_stats()
+  print_context_savings(tracer.spans)
+  budget.print_report()
+  if env_flag("TRACE_SUMMARY"):
+    tracer.print_summary()
@@ -1,8 +0,0 @@
-import importlib.util
-import sys, subprocess, crewai, warnings, os
-from crewai import Agent, Task, Crew, LLM
-from random import randint
-from IPython.display import Markdown, display, display_markdown
-
-import asyncio
-import datetime
@@ -0,0 +1,21 @@
+"""
+## Task:
+Shared setup of the tests: the modules are imported from the repository root, and every test gets
+its own caches and stores (as the offline benchmark does), so nothing is read from or left in
+~/.cache/bphc_agentic_ai
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+@pytest.fixture(autouse = True)
+def isolated(tmp_path):
+  from _111_offline_benchmark import isolated_stores
+  with isolated_stores(str(tmp_path)):
+    yield tmp_path
@@ -0,0 +1,43 @@
+import json
+
+from _103_batch_runner import read_items, topic_count, slugify
+
+def write(tmp_path, name, text):
+  path = tmp_path / name
+  path.write_text(text, encoding = "utf-8")
+  return str(path)
+
+def test_csv_with_header_uses_the_theme_column(tmp_path):
+  path = write(tmp_path, "themes.csv", "id,theme,number_of_topics\n1,AI in healthcare,4\n,Quantum computing,\n\n3,,5\n")
+  assert read_items(path) == [{"text": "AI in healthcare", "number_of_topics": 4}, {"text": "Quantum computing"}]
+
+def test_csv_row_with_a_blank_first_cell_is_kept(tmp_path):
+  path = write(tmp_path, "themes.csv", "notes,topic\n,Edge AI\n  ,TinyML\n")
+  assert [item["text"] for item in read_items(path)] == ["Edge AI", "TinyML"]
+
+def test_csv_without_header_uses_the_first_column(tmp_path):
+  path = write(tmp_path, "themes.csv", "AI in healthcare,x\nRobotics\n,\n")
+  assert read_items(path) == [{"text": "AI in healthcare"}, {"text": "Robotics"}]
+
+def test_bad_topic_counts_are_left_out(tmp_path, capsys):
+  path = write(tmp_path, "themes.csv", "theme,number_of_topics\nA,0\nB,-2\nC,three\nD, 6 \n")
+  assert read_items(path) == [{"text": "A"}, {"text": "B"}, {"text": "C"}, {"text": "D", "number_of_topics": 6}]
+  out = capsys.readouterr().out
+  assert "line 2: number_of_topics '0' is less than 1" in out
+  assert "line 4: number_of_topics 'three' is not a whole number" in out
+
+def test_jsonl_items(tmp_path):
+  lines = ['"Bare theme"', json.dumps({"topic": "Edge AI"}), "", json.dumps({"theme": "Robotics", "number_of_topics": 0}),
+           json.dumps({"theme": "  "})]
+  path = write(tmp_path, "items.jsonl", "\n".join(lines))
+  assert read_items(path) == [{"text": "Bare theme"}, {"text": "Edge AI"}, {"text": "Robotics", "number_of_topics": None}]
+
+def test_topic_count():
+  assert topic_count(None, "x") is None
+  assert topic_count(" ", "x") is None
+  assert topic_count("3", "x") == 3
+  assert topic_count(1, "x") == 1
+
+def test_slugify():
+  assert slugify("AI in Healthcare: What's Next?") == "ai-in-healthcare-what-s-next"
+  assert slugify("???") == "item"
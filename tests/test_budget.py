@@ -0,0 +1,108 @@
+import types
+
+import pytest
+
+import _104_task_graph
+from _111_offline_benchmark import LocalLLM
+from _115_budget import RunBudget, BudgetExceeded, NO_PREVIOUS_REPORT, verdicts, run_fact_check
+
+def report(*entries):
+  return "Fact Check Report\n" + "\n".join(f"Checked Statement: {s}\nVerdict: {v}" for s, v in entries)
+
+def test_verdicts_are_compared_loosely():
+  text = ("# Fact Check Report\nVerdict: before any statement\n**Checked Statement:** GPUs are fast.\n**Verdict:** Accurate.\n"
+          "- Checked Statement: TPUs are cheap\n- Verdict: Needs Correction")
+  assert verdicts(text) == {"gpus are fast": "accurate", "tpus are cheap": "needs correction"}
+  assert verdicts(text) == verdicts(text.replace("**", "").lower())
+  assert verdicts("Looks fine to me.") == {}
+
+def test_agents_max_iter_follows_the_call_limit():
+  agents = [types.SimpleNamespace(max_iter = 100)]
+  RunBudget(agent_max_calls = 6).attach(types.SimpleNamespace(agents = agents, tasks = []))
+  assert agents[0].max_iter == 5
+  RunBudget(agent_max_calls = 0).attach(types.SimpleNamespace(agents = agents, tasks = []))
+  assert agents[0].max_iter == 5
+
+def scripted(monkeypatch, answers):
+  """
+  A fact-check task whose passes answer `answers` in turn (an exception is raised), and the inputs of each pass.
+  """
+  task = types.SimpleNamespace(id = "fact-check", name = "Fact Checking", description = "check", expected_output = "a report",
+                               agent = None, output = None, callback = None)
+  passes = []
+
+  def run_single_task(task, crew_settings, inputs = None):
+    passes.append(inputs)
+    answer = answers[len(passes) - 1]
+    if isinstance(answer, Exception):
+      raise answer
+    task.output = types.SimpleNamespace(raw = answer)
+    return task.output
+
+  monkeypatch.setattr(_104_task_graph, "run_single_task", run_single_task)
+  budget = RunBudget()
+  budget.attach(types.SimpleNamespace(agents = [], tasks = [task]))
+  return task, passes, budget
+
+@pytest.mark.parametrize("answers, passes, outcome", [
+  ([report(("a", "Accurate"), ("b", "Accurate"))], 1, "nothing to correct"),
+  (["Looks fine to me."], 1, "no verdicts to compare"),
+  ([report(("a", "Inaccurate")), report(("a", "Inaccurate"))], 2, "verdicts settled"),
+  ([report(("a", "Inaccurate")), report(("a", "Unclear")), report(("a", "Inaccurate"))], 3, "verdicts still changing"),
+  ([report(("a", "Inaccurate")), report(("a", "Accurate"))], 2, "nothing to correct"),
+])
+def test_fact_check_stops_when_another_pass_would_not_change_anything(monkeypatch, answers, passes, outcome):
+  task, inputs, budget = scripted(monkeypatch, answers + [AssertionError("one pass too many")])
+  output = run_fact_check(task, {}, {"topic": "GPUs"}, max_passes = 3)
+  assert output.raw == answers[passes - 1]
+  assert len(inputs) == passes
+  assert budget.fact_check == [(passes, outcome)]
+
+def test_every_pass_sees_the_report_before_it(monkeypatch):
+  first, second = report(("a", "Inaccurate")), report(("a", "Unclear"))
+  task, inputs, _ = scripted(monkeypatch, [first, second, second])
+  run_fact_check(task, {}, {"topic": "GPUs"}, max_passes = 3)
+  assert [i["previous_report"] for i in inputs] == [NO_PREVIOUS_REPORT, first, second]
+  assert all(i["topic"] == "GPUs" for i in inputs)
+
+def test_the_task_callback_only_sees_the_last_pass(monkeypatch):
+  task, _, _ = scripted(monkeypatch, [report(("a", "Inaccurate")), report(("a", "Inaccurate"))])
+  seen = []
+  task.callback = lambda output: seen.append(output.raw)
+  run_fact_check(task, {}, max_passes = 3)
+  assert seen == [report(("a", "Inaccurate"))]
+  assert task.callback is not None
+
+def test_out_of_budget_keeps_the_last_full_pass(monkeypatch):
+  first = report(("a", "Inaccurate"))
+  task, _, budget = scripted(monkeypatch, [first, BudgetExceeded("no calls left")])
+  assert run_fact_check(task, {}, max_passes = 3).raw == first
+  assert budget.fact_check == [(1, "out of budget")]
+
+def test_out_of_budget_before_the_first_pass_is_an_error(monkeypatch):
+  task, _, _ = scripted(monkeypatch, [BudgetExceeded("no calls left")])
+  with pytest.raises(BudgetExceeded):
+    run_fact_check(task, {}, max_passes = 3)
+
+class ScriptedLLM(LocalLLM):
+  # the offline benchmark's stand-in, answering the fact checker with the same corrections every time
+  def answer(self, messages, agent):
+    self.prompts.append(str(messages))
+    return report(("GPUs are cheap", "Needs Correction"))
+
+def test_fact_check_passes_run_as_separate_kickoffs():
+  from crewai import Agent, Task
+
+  llm = ScriptedLLM(model = "local/deterministic", temperature = 0.0)
+  llm.__dict__["prompts"] = []
+  agent = Agent(role = "Fact Checker", goal = "check facts", backstory = "a careful editor", llm = llm, verbose = False)
+  task = Task(description = "Check the article. Your report of the previous pass: {previous_report}",
+              expected_output = "A Fact Check Report", agent = agent)
+  budget = RunBudget()
+  budget.attach(types.SimpleNamespace(agents = [agent], tasks = [task]))
+
+  output = run_fact_check(task, dict(process = "sequential", verbose = False), max_passes = 3)
+  assert budget.fact_check == [(2, "verdicts settled")]
+  assert verdicts(output.raw) == {"gpus are cheap": "needs correction"}
+  assert len(llm.prompts) == 2
+  assert NO_PREVIOUS_REPORT in llm.prompts[0] and "GPUs are cheap" in llm.prompts[1]
@@ -0,0 +1,63 @@
+import types
+
+import pytest
+
+from _117_checkpoints import CheckpointStore, RunCheckpoint
+
+def task(name):
+  return types.SimpleNamespace(id = name + "-id", name = name, callback = None)
+
+@pytest.fixture
+def store():
+  return CheckpointStore(":memory:")
+
+def test_outputs_are_saved_as_tasks_finish(store):
+  checkpoint = RunCheckpoint("article", store = store)
+  planning, writing = task("Planning"), task("Writing")
+  checkpoint.begin("Edge AI", {"topic": "Edge AI"})
+  checkpoint.attach(types.SimpleNamespace(tasks = [planning, writing]), "crew")
+  planning.callback(types.SimpleNamespace(raw = "1. plan"))
+  writing.callback(types.SimpleNamespace(raw = "  "))      # blank outputs aren't worth resuming from
+  assert store.outputs(checkpoint.run_id) == {"crew/Planning": "1. plan"}
+
+def test_a_failed_run_resumes_with_its_outputs(store):
+  with pytest.raises(RuntimeError):
+    with RunCheckpoint("article", store = store) as checkpoint:
+      planning = task("Planning")
+      checkpoint.begin("Edge AI", {"topic": "Edge AI"})
+      checkpoint.attach(types.SimpleNamespace(tasks = [planning]))
+      checkpoint.save(planning, "1. plan")
+      raise RuntimeError("Gemini is down")
+
+  resumed = RunCheckpoint("article", "last", store = store, given = {"topic": "Edge AI"})
+  assert resumed.resumed and resumed.run_id == checkpoint.run_id
+  assert resumed.inputs == {"topic": "Edge AI"}
+  planning = task("Planning")
+  resumed.attach(types.SimpleNamespace(tasks = [planning]))
+  assert resumed.replay_for([planning, task("Writing")]) == {id(planning): "1. plan"}
+
+def test_last_only_resumes_a_run_of_the_same_inputs(store):
+  store.save_run("run-a", "article", "Edge AI", {"topic": "Edge AI"}, "failed")
+  assert not RunCheckpoint("article", "last", store = store, given = {"topic": "TinyML"}).resumed
+  assert not RunCheckpoint("summary", "last", store = store).resumed
+
+def test_a_run_is_not_resumed_for_other_inputs(store):
+  store.save_run("run-a", "article", "Edge AI", {"topic": "Edge AI"}, "failed")
+  with pytest.raises(ValueError, match = "another topic"):
+    RunCheckpoint("article", "run-a", store = store, given = {"topic": "TinyML"})
+
+def test_an_unknown_run_id_is_an_error(store):
+  with pytest.raises(ValueError, match = "no article run 'nope'"):
+    RunCheckpoint("article", "nope", store = store)
+
+def test_resume_run_is_ignored_when_inputs_are_given(store, monkeypatch):
+  store.save_run("run-a", "article", "Edge AI", {"topic": "Edge AI"}, "failed")
+  monkeypatch.setenv("RESUME_RUN", "run-a")
+  assert not RunCheckpoint("article", store = store, given = {"topic": "TinyML"}).resumed
+  assert RunCheckpoint("article", store = store).run_id == "run-a"
+
+def test_a_finished_run_is_done(store):
+  with RunCheckpoint("article", store = store) as checkpoint:
+    checkpoint.begin("Edge AI", {"topic": "Edge AI"})
+  assert store.find_run("article", checkpoint.run_id)["status"] == "done"
+  assert store.find_run("article", "last") is None
@@ -0,0 +1,86 @@
+import time
+import threading
+
+import pytest
+
+from _124_hedged_requests import Hedger, percentile
+
+def timed_hedger(**settings):
+  # a hedger that has already seen 20 calls of 10ms each
+  hedger = Hedger(**dict(dict(percentile = 95, max_share = 1.0, min_samples = 20), **settings))
+  hedger.latencies.extend([0.01] * 20)
+  return hedger
+
+def slow_first_attempt(seconds = 0.5):
+  attempts = []
+  lock = threading.Lock()
+  def request():
+    with lock:
+      attempts.append(len(attempts))
+      number = len(attempts)
+    if number == 1:
+      time.sleep(seconds)
+    return f"answer {number}"
+  return request, attempts
+
+def test_percentile():
+  assert percentile([3, 1, 2, 4], 50) == 3
+  assert percentile([1, 2, 3, 4], 100) == 4
+
+def test_no_hedging_until_enough_calls_are_timed():
+  hedger = Hedger(min_samples = 20, max_share = 1.0)
+  request, attempts = slow_first_attempt(0.05)
+  assert hedger.trigger() is None
+  assert hedger.call(request) == "answer 1"
+  assert len(attempts) == 1 and len(hedger.latencies) == 1
+
+def test_a_slow_call_is_hedged_and_the_duplicate_wins():
+  hedger = timed_hedger()
+  request, attempts = slow_first_attempt()
+  started = time.monotonic()
+  assert hedger.call(request) == "answer 2"
+  assert time.monotonic() - started < 0.4
+  stats = hedger.stats()
+  assert (stats["hedges"], stats["hedge_wins"], stats["abandoned"]) == (1, 1, 1)
+
+def test_hedges_are_capped_to_a_share_of_the_calls():
+  hedger = timed_hedger(max_share = 0.0)
+  request, attempts = slow_first_attempt(0.1)
+  assert hedger.call(request) == "answer 1"
+  assert len(attempts) == 1 and hedger.stats()["hedges"] == 0
+
+def test_no_duplicate_without_a_reserved_slot():
+  hedger = timed_hedger()
+  request, attempts = slow_first_attempt(0.1)
+  assert hedger.call(request, reserve = lambda: None) == "answer 1"
+  assert len(attempts) == 1
+  assert (hedger.stats()["hedges"], hedger.stats()["skipped"]) == (0, 1)
+
+def test_the_reserved_slot_is_settled_by_the_duplicate():
+  hedger = timed_hedger()
+  request, _ = slow_first_attempt()
+  settled = threading.Event()
+  hedger.call(request, reserve = lambda: lambda future: settled.set())
+  assert settled.wait(1)
+
+def test_an_error_is_raised_only_if_both_attempts_fail():
+  hedger = timed_hedger()
+  attempts = []
+  def request():
+    attempts.append(1)
+    time.sleep(0.1 if len(attempts) == 1 else 0)
+    raise RuntimeError(f"attempt {len(attempts)} failed")
+  with pytest.raises(RuntimeError):
+    hedger.call(request)
+  assert len(attempts) == 2
+
+def test_a_failed_duplicate_leaves_the_primary_answer():
+  hedger = timed_hedger()
+  attempts = []
+  def request():
+    attempts.append(1)
+    if len(attempts) == 1:
+      time.sleep(0.1)
+      return "primary"
+    raise RuntimeError("duplicate failed")
+  assert hedger.call(request) == "primary"
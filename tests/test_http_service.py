@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from _118_http_service import JobQueue, make_server, parse_job
+
+def test_parse_job():
+  assert parse_job(b'{"theme": " AI in healthcare ", "number_of_topics": "4", "fresh": true}') == \
+    ("summary", "AI in healthcare", {"fresh": True, "resume": None, "from_archive": None, "number_of_topics": 4})
+  assert parse_job(b'{"mode": "article", "topic": "Edge AI", "number_of_topics": 4, "fresh": false}') == \
+    ("article", "Edge AI", {"fresh": None, "resume": None, "from_archive": None})
+
+@pytest.mark.parametrize("body, error", [
+  (b"{", "not valid JSON"),
+  (b'["AI"]', "must be a JSON object"),
+  (b'{"mode": "poem", "theme": "AI"}', "mode must be one of summary, article"),
+  (b'{"theme": "   "}', "give a 'theme'"),
+  (b"", "give a 'theme'"),
+  (b'{"theme": "AI", "number_of_topics": "five"}', "number_of_topics must be a whole number"),
+])
+def test_bad_jobs_say_what_is_wrong(body, error):
+  with pytest.raises(ValueError, match = error):
+    parse_job(body)
+
+@pytest.fixture
+def service(tmp_path):
+  # the queue's workers aren't started: the tests set the jobs' state themselves
+  jobs = JobQueue(out_dir = str(tmp_path))
+  server = make_server("127.0.0.1", 0, jobs)
+  threading.Thread(target = server.serve_forever, daemon = True).start()
+  yield jobs, f"http://127.0.0.1:{server.server_port}"
+  server.shutdown()
+  server.server_close()
+
+def get(url, **headers):
+  try:
+    with urllib.request.urlopen(urllib.request.Request(url, headers = headers)) as response:
+      return response.status, response.read().decode()
+  except urllib.error.HTTPError as e:
+    return e.code, e.read().decode()
+
+def finished_job(jobs, output_file):
+  job = jobs.submit("article", "Edge AI", {})
+  job.set_status("done", output_file = output_file)
+  return job
+
+def test_result_of_a_finished_job(service, tmp_path):
+  jobs, base = service
+  path = tmp_path / "edge-ai.md"
+  path.write_text("# Topic: Edge AI\n", encoding = "utf-8")
+  job = finished_job(jobs, str(path))
+  assert get(f"{base}/jobs/{job.id}/result") == (200, "# Topic: Edge AI\n")
+
+def test_result_whose_file_is_gone(service, tmp_path):
+  jobs, base = service
+  job = finished_job(jobs, str(tmp_path / "deleted.md"))
+  status, body = get(f"{base}/jobs/{job.id}/result")
+  assert status == 410 and "no longer exists" in json.loads(body)["error"]
+
+def test_result_of_a_job_without_a_file(service):
+  jobs, base = service
+  job = finished_job(jobs, None)
+  assert get(f"{base}/jobs/{job.id}/result")[0] == 404
+
+def test_result_of_an_unfinished_job(service):
+  jobs, base = service
+  job = jobs.submit("article", "Edge AI", {})
+  assert get(f"{base}/jobs/{job.id}/result")[0] == 409
+  assert get(f"{base}/jobs/nope/result")[0] == 404
+
+def event_ids(stream):
+  return [int(line[4:]) for line in stream.splitlines() if line.startswith("id: ")]
+
+def test_events_carry_on_after_the_last_event_id(service):
+  jobs, base = service
+  job = finished_job(jobs, None)      # queued, done
+  job.emit({"event": "task_started", "task": "Planning"})
+  status, stream = get(f"{base}/jobs/{job.id}/events")
+  assert status == 200 and event_ids(stream) == [0, 1, 2]
+  assert stream.rstrip().splitlines()[-2] == "event: end"
+  assert event_ids(get(f"{base}/jobs/{job.id}/events", **{"Last-Event-ID": "1"})[1]) == [2]
+  assert event_ids(get(f"{base}/jobs/{job.id}/events", **{"Last-Event-ID": "junk"})[1]) == [0, 1, 2]
@@ -0,0 +1,31 @@
+from _120_knowledge_store import topic_key, research_findings, research_text, KnowledgeStore
+
+def test_same_topic_in_other_words_has_the_same_key():
+  assert topic_key("The Role of AI in Healthcare") == topic_key("healthcare: role of AI")
+  assert topic_key("Trends in Robotics") == topic_key("robotics trend")
+
+def test_other_topics_have_other_keys():
+  assert topic_key("AI in healthcare") != topic_key("AI in finance")
+
+def test_a_topic_of_only_stopwords_keeps_its_text():
+  assert topic_key("  What Is It  ") == "what is it"
+
+def test_findings_round_trip_through_the_researchers_format():
+  text = research_text("- GPUs are fast", ["https://a.org", "https://b.org"])
+  assert text == "### Research Findings\n- GPUs are fast\n\n### Source Links\n1. https://a.org\n2. https://b.org"
+  assert research_findings(text) == "- GPUs are fast"
+
+def test_findings_without_a_heading_are_everything_but_the_links():
+  assert research_findings("GPUs are fast.\n### Source Links\n1. https://a.org") == "GPUs are fast."
+
+def test_store_finds_a_topic_by_its_key(tmp_path):
+  store = KnowledgeStore(str(tmp_path / "knowledge.sqlite3"))
+  store.put("The Role of AI in Healthcare", research_text("- GPUs are fast", ["https://a.org"]), "article")
+  known = store.get("healthcare: role of AI")
+  assert (known["findings"], known["links"], known["source"]) == ("- GPUs are fast", ["https://a.org"], "article")
+  assert store.get("AI in finance") is None
+
+def test_research_without_findings_is_not_kept(tmp_path):
+  store = KnowledgeStore(str(tmp_path / "knowledge.sqlite3"))
+  store.put("Edge AI", "", "summary")
+  assert store.get("Edge AI") is None
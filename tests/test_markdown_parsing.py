@@ -0,0 +1,32 @@
+from _105_markdown_parsing import parse_numbered_list, split_sections, extract_sections, extract_urls, url_key
+
+def test_numbered_list_items_are_cleaned():
+  text = "Here are the topics:\n1. **Edge AI**\n2) \"Federated learning\"\n  3.  'TinyML'  \nnot an item\n4.   \n"
+  assert parse_numbered_list(text) == ["Edge AI", "Federated learning", "TinyML"]
+
+def test_numbered_list_of_nothing():
+  assert parse_numbered_list(None) == []
+  assert parse_numbered_list("no list here") == []
+
+def test_sections_split_at_headings_bold_lines_and_bare_titles():
+  text = "intro\n## Research Findings\nfinding\n**Source Links**\n1. https://a.org\nCondensed Information Points:\n- point"
+  assert split_sections(text) == [
+    (None, "intro"),
+    ("research findings", "## Research Findings\nfinding"),
+    ("source links", "**Source Links**\n1. https://a.org"),
+    ("condensed information points", "Condensed Information Points:\n- point"),
+  ]
+
+def test_extract_sections_keeps_order_and_says_when_there_are_none():
+  text = "### Source Links\nlinks\n### Research Findings\nfindings\n### Other\nx"
+  assert extract_sections(text, ["Research Findings", "Source Links"]) == "### Source Links\nlinks\n\n### Research Findings\nfindings"
+  assert extract_sections("### Other\nx", ["Source Links"]) is None
+
+def test_urls_lose_surrounding_punctuation_and_duplicates():
+  text = ("See https://example.com/page, and [the docs](https://Example.com/page/#intro). "
+          "Also (https://en.wikipedia.org/wiki/Foo_(bar)) and **https://b.org/x**; not http://localhost/x")
+  assert extract_urls(text) == ["https://example.com/page", "https://en.wikipedia.org/wiki/Foo_(bar)", "https://b.org/x"]
+
+def test_url_key_ignores_case_slash_and_fragment_only():
+  assert url_key("HTTPS://Example.com/a/#top") == url_key("https://example.com/a")
+  assert url_key("https://example.com/A") != url_key("https://example.com/a")
@@ -0,0 +1,100 @@
+import time
+import types
+
+from _112_rate_limiter import RateLimiter, is_throttle, retry_after
+
+class RateLimitError(Exception):
+  # named like litellm's, which isn't imported here
+  pass
+
+class APIError(Exception):
+  def __init__(self, code = None, status = None):
+    super().__init__(f"{code} {status}")
+    self.code = code
+    self.status = status
+
+def error_with(**fields):
+  error = Exception("error")
+  for name, value in fields.items():
+    setattr(error, name, value)
+  return error
+
+def test_throttles_by_status_and_type():
+  assert is_throttle(error_with(status_code = 429))
+  assert is_throttle(error_with(response = types.SimpleNamespace(status_code = 503)))
+  assert is_throttle(APIError(code = 429))
+  assert is_throttle(APIError(status = "RESOURCE_EXHAUSTED"))
+  assert is_throttle(APIError(status = "unavailable"))
+  assert is_throttle(RateLimitError("slow down"))
+
+def test_throttle_found_in_the_cause_chain():
+  try:
+    try:
+      raise APIError(code = 429)
+    except APIError as e:
+      raise RuntimeError("the provider failed") from e
+  except RuntimeError as e:
+    assert is_throttle(e)
+
+def test_the_error_text_does_not_count():
+  assert not is_throttle(ValueError("got 429 results"))
+  assert not is_throttle(Exception("503: the service is unavailable"))
+  assert not is_throttle(APIError(code = 404, status = "NOT_FOUND"))
+  assert not is_throttle(error_with(status_code = "429"))
+  assert not is_throttle(None)
+
+def test_a_cause_cycle_ends():
+  first, second = Exception("a"), Exception("b")
+  first.__cause__, second.__cause__ = second, first
+  assert not is_throttle(first)
+
+def test_retry_after_header():
+  assert retry_after(error_with(response = types.SimpleNamespace(headers = {"retry-after": "2.5"}))) == 2.5
+  assert retry_after(error_with(response = types.SimpleNamespace(headers = {"retry-after": "soon"}))) is None
+  assert retry_after(Exception()) is None
+
+def test_no_rate_limit_by_default():
+  limiter = RateLimiter(max_concurrency = 2)
+  assert limiter.buckets == []
+  assert limiter.stats()["rate_scale"] is None
+  started = [limiter.try_acquire(100) for _ in range(2)]
+  assert None not in started
+  assert limiter.try_acquire(100) is None      # the window is full
+  limiter.release(started[0], 100)
+  assert limiter.try_acquire(100) is not None
+
+def test_requests_per_minute_bucket():
+  limiter = RateLimiter(rpm = 60, burst_seconds = 2)
+  assert limiter.try_acquire(1) is not None
+  assert limiter.try_acquire(1) is not None
+  assert limiter.try_acquire(1) is None        # two calls' burst, refilled at one a second
+
+def test_a_throttle_halves_the_window_and_the_rate_and_pauses():
+  limiter = RateLimiter(rpm = 60, max_concurrency = 8, backoff_seconds = 0.2)
+  started = limiter.acquire(10)
+  limiter.release(started, 10, throttled = True)
+  assert limiter.window == 4
+  assert limiter.requests.scale == 0.5
+  assert limiter.try_acquire(10) is None       # paused
+  assert limiter.stats()["throttles"] == 1
+
+def test_throttles_of_calls_sent_before_the_slow_down_are_not_a_new_overload():
+  limiter = RateLimiter(max_concurrency = 8, backoff_seconds = 0)
+  first, second = limiter.acquire(10), limiter.acquire(10)
+  limiter.release(first, 10, throttled = True)
+  limiter.release(second, 10, throttled = True)
+  assert limiter.window == 4
+  assert limiter.throttles == 2
+
+def test_successes_win_the_window_back():
+  limiter = RateLimiter(max_concurrency = 4, backoff_seconds = 0)
+  limiter.release(limiter.acquire(10), 10, throttled = True)
+  for _ in range(20):
+    limiter.release(limiter.acquire(10), 10)
+  assert limiter.window == 4
+
+def test_retry_delay_from_the_provider_is_used():
+  limiter = RateLimiter(backoff_seconds = 30)
+  limiter.release(limiter.acquire(10), 10, throttled = True, delay = 0.05)
+  time.sleep(0.1)
+  assert limiter.try_acquire(10) is not None
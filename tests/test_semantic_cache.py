@@ -0,0 +1,62 @@
+import _116_semantic_cache
+from _116_semantic_cache import SemanticCache, reuse, stem
+
+def test_stem():
+  assert stem("trends") == stem("trend")
+  assert stem("applications") == stem("application")
+  assert stem("technologies") == "technology"
+  assert stem("business") == "business"
+
+def test_a_similar_theme_is_reused():
+  cache = SemanticCache(":memory:", threshold = 0.85)
+  cache.store("summary", "AI in healthcare", {"plan": "1. x"})
+  cache.store("summary", "Quantum computing", {"plan": "1. y"})
+  match = cache.lookup("summary", "AI for healthcare")
+  assert match.text == "AI in healthcare"
+  assert match.result == {"plan": "1. x"}
+  assert cache.lookup("summary", "Healthcare AI").text == "AI in healthcare"
+  assert cache.lookup("summary", "Deep sea fishing") is None
+  assert (cache.hits, cache.misses) == (2, 1)
+
+def test_compounds_written_apart_still_score():
+  cache = SemanticCache(":memory:", threshold = 0.0)
+  cache.store("summary", "AI in healthcare", {})
+  assert cache.lookup("summary", "AI for health care").score > cache.lookup("summary", "AI for wealth management").score
+
+def test_kinds_are_kept_apart():
+  cache = SemanticCache(":memory:", threshold = 0.7)
+  cache.store("summary", "AI in healthcare", {"plan": "1. x"})
+  assert cache.lookup("article", "AI in healthcare") is None
+
+def test_nothing_to_compare_is_a_miss():
+  cache = SemanticCache(":memory:")
+  assert cache.lookup("summary", "AI in healthcare") is None
+  cache.store("summary", "AI in healthcare", {})
+  assert cache.lookup("summary", "the of and") is None
+
+def test_old_entries_expire(monkeypatch):
+  cache = SemanticCache(":memory:", ttl_seconds = 60)
+  cache.store("summary", "AI in healthcare", {})
+  now = _116_semantic_cache.time.time()
+  monkeypatch.setattr(_116_semantic_cache.time, "time", lambda: now + 120)
+  assert cache.lookup("summary", "AI in healthcare") is None
+
+def test_only_the_latest_entries_are_kept():
+  cache = SemanticCache(":memory:", max_entries = 2)
+  for theme in ("Robotics", "Edge AI", "Quantum computing"):
+    cache.store("summary", theme, {})
+  assert cache.stats()["entries"] == {"summary": 2}
+
+def test_reuse_skips_fresh_runs_and_rejected_matches():
+  cache = SemanticCache(":memory:")
+  cache.store("summary", "AI in healthcare", {"number_of_topics": 5})
+  assert reuse("summary", "AI in healthcare", "plan", fresh = True, index = cache) is None
+  assert reuse("summary", "AI in healthcare", "plan", fresh = False, index = cache,
+               accept = lambda result: result["number_of_topics"] == 7) is None
+  assert reuse("summary", "AI in healthcare", "plan", fresh = False, index = cache).score > 0.99
+
+def test_bypass_from_the_environment(monkeypatch):
+  cache = SemanticCache(":memory:")
+  cache.store("summary", "AI in healthcare", {})
+  monkeypatch.setenv("SEMANTIC_CACHE_BYPASS", "1")
+  assert reuse("summary", "AI in healthcare", "plan", index = cache) is None